@@ -0,0 +1,191 @@
+"""
+Cache of authenticated principals used by dependencies.get_current_user.
+
+Resolved users are kept in a bounded in-process LRU keyed by (sub, token exp),
+so warm requests skip the users table lookup entirely. Setting
+AUTH_CACHE_REDIS=true adds a shared Redis tier so a user resolved by one
+uvicorn worker is warm in the others.
+
+Entries live for at most AUTH_CACHE_TTL_SECONDS and never beyond the token's
+own expiry. Call invalidate_user() whenever a user's role, company or status
+changes.
+
+With Redis, invalidate_user() also bumps a per-user generation counter,
+auth:gen:<sub>. Every entry records the generation it was cached under, and
+a worker only serves an entry, local or shared, while it still matches. The
+generation and the shared entry come back in one MGET per request. If Redis
+is unreachable, the local tier is served on its own.
+
+Without Redis the local tier is per process: invalidate_user() only clears
+the worker it runs in. The other workers keep a suspended, demoted or moved
+user's old principal for up to AUTH_CACHE_TTL_SECONDS. Multi-worker
+deployments should set AUTH_CACHE_REDIS=true or keep the TTL short.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from redis_client import redis_call
+from sql_models import User
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+AUTH_CACHE_REDIS = os.getenv("AUTH_CACHE_REDIS", "false").strip().lower() in ("1", "true", "yes", "on")
+# Outlives every entry, so a counter that expires and restarts at 0 can never
+# match a generation an entry still alive was cached under
+GENERATION_TTL_SECONDS = 24 * 3600
+
+# Column values copied out of the ORM row; the cached principal is rebuilt
+# from these so it never shares state with a closed or committed session.
+USER_FIELDS = (
+    "id", "company_id", "full_name", "email", "role", "business_name",
+    "location", "contact_number", "status", "created_at",
+)
+
+
+def _snapshot(user: User) -> dict:
+    return {field: getattr(user, field) for field in USER_FIELDS}
+
+
+def _to_user(values: dict) -> User:
+    return User(**values)
+
+
+def _serialize(values: dict) -> str:
+    return json.dumps({k: (str(v) if isinstance(v, UUID) else v.isoformat() if isinstance(v, datetime) else v) for k, v in values.items()})
+
+
+def _deserialize(raw: str) -> dict:
+    values = json.loads(raw)
+    for field in ("id", "company_id"):
+        if values.get(field):
+            values[field] = UUID(values[field])
+    if values.get("created_at"):
+        values["created_at"] = datetime.fromisoformat(values["created_at"])
+    return values
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, use_redis: bool = AUTH_CACHE_REDIS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries = OrderedDict()  # (sub, exp) -> (expires_at_monotonic, generation, values)
+        self._lock = threading.Lock()
+        # (sub, generation) of each thread's last miss: put() caches the user
+        # read after that miss under it, so a stale read racing an
+        # invalidation never looks current
+        self._missed = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _lifetime(self, exp: Optional[int]) -> float:
+        lifetime = self.ttl_seconds
+        if exp is not None:
+            lifetime = min(lifetime, float(exp) - time.time())
+        return lifetime
+
+    @staticmethod
+    def _redis_key(sub: str) -> str:
+        return f"auth:user:{sub}"
+
+    @staticmethod
+    def _generation_key(sub: str) -> str:
+        return f"auth:gen:{sub}"
+
+    def _shared(self, sub: str):
+        """(generation, raw shared entry) from Redis, or (None, None) without it."""
+        if not self.use_redis:
+            return None, None
+        reply = redis_call(lambda r: r.mget(self._generation_key(sub), self._redis_key(sub)))
+        if reply is None:
+            return None, None
+        generation, raw = reply
+        return int(generation or 0), raw
+
+    def get(self, sub: str, exp: Optional[int]) -> Optional[User]:
+        key = (sub, exp)
+        generation, raw = self._shared(sub)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, cached_generation, values = entry
+                if expires_at > now and (generation is None or cached_generation == generation):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _to_user(values)
+                del self._entries[key]
+
+        if raw:
+            values = _deserialize(raw)
+            if values.pop("generation", None) == generation:
+                self._store_local(key, generation, values)
+                with self._lock:
+                    self.hits += 1
+                return _to_user(values)
+
+        self._missed.last = (sub, generation)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, sub: str, exp: Optional[int], user: User) -> User:
+        """Caches the user's column values and returns a detached copy."""
+        values = _snapshot(user)
+        lifetime = self._lifetime(exp)
+        missed_sub, generation = getattr(self._missed, "last", (None, None))
+        self._missed.last = (None, None)
+        if missed_sub != sub:
+            generation = self._shared(sub)[0]
+        if lifetime > 0:
+            self._store_local((sub, exp), generation, values)
+            if self.use_redis and generation is not None:
+                shared = _serialize({**values, "generation": generation})
+                redis_call(lambda r: r.set(self._redis_key(sub), shared, ex=max(int(lifetime), 1)))
+        return _to_user(values)
+
+    def _store_local(self, key, generation, values: dict):
+        lifetime = self._lifetime(key[1])
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + lifetime, generation, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        """
+        Drops every cached token entry for the user: locally, in Redis, and
+        through the generation bump, in every other worker sharing Redis.
+        """
+        sub = str(user_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == sub]:
+                del self._entries[key]
+        if self.use_redis:
+            generation_key = self._generation_key(sub)
+            redis_call(lambda r: r.pipeline()
+                       .incr(generation_key).expire(generation_key, GENERATION_TTL_SECONDS)
+                       .delete(self._redis_key(sub)).execute())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_user(user_id) -> None:
+    principal_cache.invalidate(user_id)
@@ -3,6 +3,15 @@ from sql_models import (
     Company, Product, Client, User, Supplier, Invoice, InvoiceItem, Purchase, PurchaseItem, Expense, Lead, WhatsappLog, UploadedDoc, Setting, ScheduledWhatsappMessage
 )
 import json
+import daily_metrics
+import ledger
+import response_cache
+import whatsapp_counters  # noqa: F401  (registers its Session hooks)
+from auth_cache import invalidate_user
+from pagination import (
+    CLIENT_KEYSET, COMPANY_KEYSET, EXPENSE_KEYSET, INVOICE_KEYSET, LEAD_KEYSET,
+    PRODUCT_KEYSET, USER_KEYSET, WHATSAPP_LOG_KEYSET,
+)
 
 from models import (
     Company as PydanticCompany, 
@@ -21,16 +30,59 @@ from models import (
     Setting as PydanticSetting,
     ScheduledWhatsappMessage as PydanticScheduledWhatsappMessage
 )
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta, date
-from sqlalchemy import func
+from sqlalchemy import func, insert
+from sqlalchemy.exc import SQLAlchemyError
+import os
 from dateutil import parser
 
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "10000"))
+
+def bulk_insert(db: Session, model, rows: list):
+    """
+    Inserts [(index, values)] rows in batches of BULK_BATCH_SIZE with one
+    executemany per batch and a single commit at the end. Each batch runs in a
+    savepoint; if it fails, its rows are retried one by one so only the
+    offending rows are rejected. Rollup increments (daily_metrics) and
+    ledger postings are written in the same savepoint. Primary keys are generated here, so no
+    per-row RETURNING or refresh round trip is needed.
+
+    Returns ([(index, id)], [{"index": index, "error": message}]).
+    """
+    created, errors = [], []
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        batch = rows[start:start + BULK_BATCH_SIZE]
+        for _, values in batch:
+            if not values.get("id"):
+                values["id"] = uuid4()
+        try:
+            with db.begin_nested():
+                db.execute(insert(model), [values for _, values in batch])
+                daily_metrics.record_inserted(db, model, [values for _, values in batch])
+                response_cache.mark_written(db, model, [values for _, values in batch])
+                ledger.post_inserted(db, model, [values for _, values in batch])
+            created.extend((index, values["id"]) for index, values in batch)
+        except SQLAlchemyError:
+            for index, values in batch:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(model), [values])
+                        daily_metrics.record_inserted(db, model, [values])
+                        response_cache.mark_written(db, model, [values])
+                        ledger.post_inserted(db, model, [values])
+                    created.append((index, values["id"]))
+                except SQLAlchemyError as e:
+                    errors.append({"index": index, "error": str(getattr(e, "orig", e))})
+    db.commit()
+    return created, errors
+
 def get_company(db: Session, company_id: UUID):
     return db.query(Company).filter(Company.id == company_id).first()
 
-def get_companies(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Company).offset(skip).limit(limit).all()
+def get_companies(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    return COMPANY_KEYSET.paginate(db.query(Company), skip, limit, cursor).all()
 
 def create_company(db: Session, company: PydanticCompany):
     db_company = Company(**company.model_dump())
@@ -70,11 +122,11 @@ def get_product_by_name(db: Session, name: str, company_id: UUID, user_id: UUID
         query = query.filter(Product.user_id == user_id)
     return query.first()
 
-def get_products(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None):
+def get_products(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None, cursor: str = None):
     query = db.query(Product).filter(Product.user_id == user_id)
     if company_id:
         query = query.filter(Product.company_id == company_id)
-    return query.offset(skip).limit(limit).all()
+    return PRODUCT_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_product(db: Session, product: PydanticProduct, user_id: UUID, company_id: UUID):
     db_product = Product(**product.model_dump(exclude={'company_id', 'user_id'}), user_id=user_id, company_id=company_id)
@@ -83,6 +135,10 @@ def create_product(db: Session, product: PydanticProduct, user_id: UUID, company
     db.refresh(db_product)
     return db_product
 
+def bulk_create_products(db: Session, products: list, user_id: UUID, company_id: UUID):
+    rows = [(index, {**product.model_dump(exclude={'company_id', 'user_id'}), "user_id": user_id, "company_id": company_id}) for index, product in products]
+    return bulk_insert(db, Product, rows)
+
 def update_product(db: Session, product_id: UUID, product: PydanticProduct):
     db_product = db.query(Product).filter(Product.id == product_id).first()
     if db_product:
@@ -122,11 +178,11 @@ def get_client_by_name(db: Session, name: str):
     return db.query(Client).filter(Client.name == name).first()
 
 
-def get_clients(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None):
+def get_clients(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None, cursor: str = None):
     query = db.query(Client).filter(Client.user_id == user_id)
     if company_id:
         query = query.filter(Client.company_id == company_id)
-    return query.offset(skip).limit(limit).all()
+    return CLIENT_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_client(db: Session, client: PydanticClient, user_id: UUID, company_id: UUID):
     db_client = Client(**client.model_dump(exclude={'company_id', 'user_id'}), user_id=user_id, company_id=company_id)
@@ -135,6 +191,10 @@ def create_client(db: Session, client: PydanticClient, user_id: UUID, company_id
     db.refresh(db_client)
     return db_client
 
+def bulk_create_clients(db: Session, clients: list, user_id: UUID, company_id: UUID):
+    rows = [(index, {**client.model_dump(exclude={'company_id', 'user_id'}), "user_id": user_id, "company_id": company_id}) for index, client in clients]
+    return bulk_insert(db, Client, rows)
+
 def update_client(db: Session, client_id: UUID, client: PydanticClient):
     db_client = db.query(Client).filter(Client.id == client_id).first()
     if db_client:
@@ -154,8 +214,8 @@ def delete_client(db: Session, client_id: UUID):
 def get_user(db: Session, user_id: UUID):
     return db.query(User).filter(User.id == user_id).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    return USER_KEYSET.paginate(db.query(User), skip, limit, cursor).all()
 
 def create_user(db: Session, user: PydanticUser):
     db_user = User(**user.model_dump(exclude_none=True))
@@ -167,10 +227,15 @@ def create_user(db: Session, user: PydanticUser):
 def update_user(db: Session, user_id: UUID, user: PydanticUser):
     db_user = db.query(User).filter(User.id == user_id).first()
     if db_user:
+        changed = False
         for key, value in user.model_dump(exclude_unset=True).items():
+            changed = changed or getattr(db_user, key) != value
             setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
+        # Role / company changes must not be served from a stale cached principal
+        if changed:
+            invalidate_user(db_user.id)
     return db_user
 
 def delete_user(db: Session, user_id: UUID):
@@ -178,6 +243,7 @@ def delete_user(db: Session, user_id: UUID):
     if db_user:
         db.delete(db_user)
         db.commit()
+        invalidate_user(user_id)
     return db_user
 
 def get_supplier(db: Session, supplier_id: UUID):
@@ -212,11 +278,11 @@ def delete_supplier(db: Session, supplier_id: UUID):
 def get_invoice(db: Session, invoice_id: UUID):
     return db.query(Invoice).filter(Invoice.id == invoice_id).first()
 
-def get_invoices(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None):
+def get_invoices(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None, cursor: str = None):
     query = db.query(Invoice).filter(Invoice.user_id == user_id)
     if company_id:
         query = query.filter(Invoice.company_id == company_id)
-    return query.offset(skip).limit(limit).all()
+    return INVOICE_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_invoice(db: Session, invoice: PydanticInvoice, company_id: UUID, user_id: UUID):
     # Extract items and create the main invoice object
@@ -397,12 +463,12 @@ def get_expense(db: Session, expense_id: UUID, user_id: UUID = None, company_id:
         query = query.filter(Expense.user_id == user_id)
     return query.first()
 
-def get_expenses(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None):
+def get_expenses(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None, cursor: str = None):
     if company_id:
         query = db.query(Expense).filter(Expense.company_id == company_id)
     else:
         query = db.query(Expense).filter(Expense.user_id == user_id)
-    return query.offset(skip).limit(limit).all()
+    return EXPENSE_KEYSET.paginate(query, skip, limit, cursor).all()
 
 # crud.py mein verify karein
 def create_expense(db: Session, expense: PydanticExpense, user_id: UUID, company_id: UUID):
@@ -415,6 +481,11 @@ def create_expense(db: Session, expense: PydanticExpense, user_id: UUID, company
     db.refresh(db_expense)
     return db_expense
 
+def bulk_create_expenses(db: Session, expenses: list, user_id: UUID, company_id: UUID):
+    # No exclude_none here: executemany needs the same keys on every row
+    rows = [(index, {**expense.model_dump(exclude={'user_id', 'company_id'}), "user_id": user_id, "company_id": company_id}) for index, expense in expenses]
+    return bulk_insert(db, Expense, rows)
+
 def update_expense(db: Session, expense_id: UUID, expense: PydanticExpense, user_id: UUID = None, company_id: UUID = None):
     query = db.query(Expense).filter(Expense.id == expense_id)
     if company_id:
@@ -444,8 +515,8 @@ def delete_expense(db: Session, expense_id: UUID, user_id: UUID = None, company_
 def get_lead(db: Session, lead_id: UUID):
     return db.query(Lead).filter(Lead.id == lead_id).first()
 
-def get_leads(db: Session, user_id: UUID, skip: int = 0, limit: int = 100):
-    return db.query(Lead).filter(Lead.user_id == user_id).offset(skip).limit(limit).all()
+def get_leads(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, cursor: str = None):
+    return LEAD_KEYSET.paginate(db.query(Lead).filter(Lead.user_id == user_id), skip, limit, cursor).all()
 
 def create_lead(db: Session, lead: PydanticLead, user_id: UUID):
     db_lead = Lead(**lead.model_dump(exclude_none=True), user_id=user_id)
@@ -473,11 +544,11 @@ def delete_lead(db: Session, lead_id: UUID):
 def get_whatsapp_log(db: Session, whatsapp_log_id: UUID):
     return db.query(WhatsappLog).filter(WhatsappLog.id == whatsapp_log_id).first()
 
-def get_whatsapp_logs(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None):
+def get_whatsapp_logs(db: Session, user_id: UUID, skip: int = 0, limit: int = 100, company_id: UUID = None, cursor: str = None):
     query = db.query(WhatsappLog).filter(WhatsappLog.user_id == user_id)
     if company_id:
         query = query.filter(WhatsappLog.company_id == company_id)
-    return query.offset(skip).limit(limit).all()
+    return WHATSAPP_LOG_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_whatsapp_log(db: Session, whatsapp_log: PydanticWhatsappLog):
     db_whatsapp_log = WhatsappLog(**whatsapp_log.model_dump(exclude_none=True))
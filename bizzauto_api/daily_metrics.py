@@ -0,0 +1,208 @@
+"""
+Incrementally maintained per-company daily metrics (company_daily_metrics).
+
+Dashboards and analytics read a handful of pre-aggregated rows from this table
+instead of scanning invoices, expenses, purchases and WhatsApp logs. Each row
+holds a count and an amount for one (company_id, day, metric), where metric is
+one of:
+
+    invoice:<payment_status>   day = invoice_date, amount = total_amount
+    expense                    day = expense_date, amount = amount
+    purchase                   day = purchase_date, amount = total_amount
+    whatsapp_message           day = created_at,   amount = 0
+
+Rows are kept current by a Session flush hook: every ORM insert, update or
+delete of a tracked model (everything written through crud) upserts the
+difference it makes, in the same transaction as the write. Core bulk inserts
+call record_inserted() themselves. Records with no date land on UNDATED.
+
+Writes that bypass SQLAlchemy (SQL consoles, the Supabase client) are not
+seen; rebuild() recomputes the rollup from the raw tables, for everything or
+one company. Run it from scripts/backfill_daily_metrics.py.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import delete, event, func, inspect, insert, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.types import DateTime, String
+from sqlalchemy.orm import Session
+
+from sql_models import CompanyDailyMetric, Expense, Invoice, Purchase, WhatsappLog
+
+UNDATED = date(1970, 1, 1)
+INVOICE_PREFIX = "invoice:"
+EXPENSE = "expense"
+PURCHASE = "purchase"
+WHATSAPP_MESSAGE = "whatsapp_message"
+
+_PENDING_KEY = "daily_metrics_pending"
+
+
+class MetricSource:
+    """How one model contributes to the rollup."""
+
+    def __init__(self, model, date_field: str, amount_field: str = None, metric: str = None, status_field: str = None):
+        self.model = model
+        self.date_field = date_field
+        self.amount_field = amount_field
+        self.metric = metric
+        self.status_field = status_field
+        self.fields = [f for f in ("company_id", date_field, amount_field, status_field) if f]
+
+    def metric_for(self, values: dict) -> str:
+        if self.status_field:
+            return INVOICE_PREFIX + (values.get(self.status_field) or "")
+        return self.metric
+
+    def contribution(self, values: dict):
+        """((company_id, day, metric), amount) for a row, or None if it has no company."""
+        if not values.get("company_id"):
+            return None
+        day = values.get(self.date_field) or UNDATED
+        if isinstance(day, datetime):
+            day = day.date()
+        amount = float(values.get(self.amount_field) or 0) if self.amount_field else 0.0
+        return (values["company_id"], day, self.metric_for(values)), amount
+
+    # SQL expressions used by rebuild(). Constants are inlined rather than
+    # bound: Postgres only matches a GROUP BY expression to the select list
+    # when both are textually identical, and separate bind parameters are not.
+    def metric_expression(self):
+        if self.status_field:
+            return literal_column(f"'{INVOICE_PREFIX}'", String) + func.coalesce(getattr(self.model, self.status_field), literal_column("''"))
+        return literal_column(f"'{self.metric}'")
+
+    def day_expression(self):
+        column = getattr(self.model, self.date_field)
+        if isinstance(column.type, DateTime):
+            column = func.date(column)
+        return func.coalesce(column, literal_column(f"'{UNDATED.isoformat()}'"))
+
+    def amount_expression(self):
+        if not self.amount_field:
+            return literal_column("0.0")
+        return func.coalesce(func.sum(getattr(self.model, self.amount_field)), literal_column("0.0"))
+
+
+SOURCES = {
+    Invoice: MetricSource(Invoice, "invoice_date", "total_amount", status_field="payment_status"),
+    Expense: MetricSource(Expense, "expense_date", "amount", metric=EXPENSE),
+    Purchase: MetricSource(Purchase, "purchase_date", "total_amount", metric=PURCHASE),
+    WhatsappLog: MetricSource(WhatsappLog, "created_at", metric=WHATSAPP_MESSAGE),
+}
+
+
+def _add(deltas: dict, contribution, sign: int):
+    if contribution is None:
+        return
+    key, amount = contribution
+    count_delta, amount_delta = deltas.get(key, (0, 0.0))
+    deltas[key] = (count_delta + sign, amount_delta + sign * amount)
+
+
+def apply_deltas(connection, deltas: dict):
+    """Upserts {(company_id, day, metric): (count, amount)} increments."""
+    rows = [
+        {"company_id": company_id, "day": day, "metric": metric, "count": count, "amount": amount}
+        for (company_id, day, metric), (count, amount) in deltas.items()
+        if count or abs(amount) > 1e-9
+    ]
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    table = CompanyDailyMetric.__table__
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.company_id, table.c.day, table.c.metric],
+        set_={"count": table.c.count + stmt.excluded.count, "amount": table.c.amount + stmt.excluded.amount},
+    )
+    connection.execute(stmt, rows)
+
+
+def _loaded_values(obj, source: MetricSource) -> dict:
+    return {field: getattr(obj, field) for field in source.fields}
+
+
+def previous_values(session: Session, obj, fields) -> dict:
+    """
+    Column values of a dirty instance as they were before this flush. Call
+    from before_flush; also used by whatsapp_counters.
+    """
+    state = inspect(obj)
+    values, missing = {}, []
+    for field in fields:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        else:
+            # Expired (e.g. after a commit) and never reloaded, or assigned on
+            # an expired instance: the old value is only in the database
+            missing.append(field)
+    if missing:
+        model = type(obj)
+        columns = [getattr(model, field) for field in missing]
+        row = session.connection().execute(select(*columns).where(model.id == obj.id)).first()
+        values.update(dict(zip(missing, row)) if row else {field: None for field in missing})
+    return values
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_previous(session, flush_context, instances):
+    deltas = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.dirty:
+        source = SOURCES.get(type(obj))
+        if source and session.is_modified(obj):
+            _add(deltas, source.contribution(previous_values(session, obj, source.fields)), -1)
+    for obj in session.deleted:
+        source = SOURCES.get(type(obj))
+        if source:
+            _add(deltas, source.contribution(_loaded_values(obj, source)), -1)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, {})
+    for obj in list(session.new) + [o for o in session.dirty if type(o) in SOURCES and session.is_modified(o)]:
+        source = SOURCES.get(type(obj))
+        if source:
+            _add(deltas, source.contribution(_loaded_values(obj, source)), +1)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def record_inserted(session: Session, model, rows: list):
+    """Rollup increments for rows inserted with Core (crud.bulk_insert)."""
+    source = SOURCES.get(model)
+    if not source:
+        return
+    deltas = {}
+    for values in rows:
+        _add(deltas, source.contribution(values), +1)
+    apply_deltas(session.connection(), deltas)
+
+
+def rebuild(connection, company_id=None):
+    """
+    Recomputes the rollup from the raw tables, for all companies or one.
+    Run inside a transaction; concurrent writes to the same company while it
+    runs can be missed, so repair during quiet periods.
+    """
+    table = CompanyDailyMetric.__table__
+    wipe = delete(table)
+    if company_id:
+        wipe = wipe.where(table.c.company_id == company_id)
+    connection.execute(wipe)
+
+    for source in SOURCES.values():
+        model = source.model
+        day, metric = source.day_expression(), source.metric_expression()
+        query = (
+            select(model.company_id, day, metric, func.count(), source.amount_expression())
+            .where(model.company_id.is_not(None))
+            .group_by(model.company_id, day, metric)
+        )
+        if company_id:
+            query = query.where(model.company_id == company_id)
+        connection.execute(insert(table).from_select(["company_id", "day", "metric", "count", "amount"], query))
@@ -1,11 +1,136 @@
+import json
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+import uuid
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from supabase import create_client, Client
 from typing import Optional
 
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolStats:
+    """Thread-safe counters for connection checkouts on an instrumented pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - start, timed_out)
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Instrumented pool for asyncio engines (asyncpg / aiosqlite)."""
+
+
+# --- Connection pool configuration ---
+# DB_POOL_MODE selects how the production engine pools connections:
+#   "null"      - open a new connection per session (previous behaviour, default)
+#   "queue"     - keep a QueuePool of warm connections in this process
+#   "pgbouncer" - small QueuePool in front of PgBouncer running in transaction mode
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "null").strip().lower()
+
+
+def build_engine_options(mode: str = DB_POOL_MODE, use_async: bool = False) -> dict:
+    """Returns the create_engine keyword arguments for the given pool mode."""
+    pool_class = InstrumentedAsyncQueuePool if use_async else InstrumentedQueuePool
+
+    if mode == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": True}
+
+    if mode == "queue":
+        return {
+            "poolclass": pool_class,
+            "pool_size": _env_int("DB_POOL_SIZE", 5),
+            "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+            "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+            "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+            "pool_use_lifo": True,
+        }
+
+    if mode == "pgbouncer":
+        # PgBouncer owns the real server connections, so keep only a few client
+        # connections here and recycle them well before PgBouncer's idle timeout.
+        # Session state (SET, prepared statements) does not survive between
+        # transactions in this mode.
+        options = {
+            "poolclass": pool_class,
+            "pool_size": _env_int("DB_POOL_SIZE", 5),
+            "max_overflow": _env_int("DB_MAX_OVERFLOW", 0),
+            "pool_timeout": _env_int("DB_POOL_TIMEOUT", 10),
+            "pool_recycle": _env_int("DB_POOL_RECYCLE", 300),
+            "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", False),
+        }
+        if use_async:
+            # asyncpg caches prepared statements per connection, which breaks
+            # once PgBouncer hands the transaction to another server connection.
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        return options
+
+    raise ValueError(f"Unknown DB_POOL_MODE '{mode}'. Expected one of: null, queue, pgbouncer.")
+
+
 # --- SQLAlchemy Configuration (Optional) ---
 DATABASE_URL = os.getenv("DATABASE_URL")
 engine = None
@@ -13,9 +138,9 @@ SessionLocal = None
 
 if DATABASE_URL:
     try:
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True, poolclass=NullPool)
+        engine = create_engine(DATABASE_URL, **build_engine_options())
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        print("[OK] PostgreSQL database connected")
+        print(f"[OK] PostgreSQL database connected (pool mode: {DB_POOL_MODE})")
     except Exception as e:
         print(f"[WARN] PostgreSQL connection failed: {e}")
         engine = None
@@ -23,6 +148,82 @@ if DATABASE_URL:
 else:
     print("[WARN] DATABASE_URL not set - SQLAlchemy database features will be disabled.")
 
+
+def to_async_url(url: str) -> tuple[str, dict]:
+    """
+    Converts a sync database URL into its asyncio driver equivalent
+    (psycopg2 -> asyncpg, pysqlite -> aiosqlite).
+    Returns the URL and any connect_args the async driver needs.
+    """
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    parsed = make_url(url)
+    connect_args = {}
+
+    if parsed.get_backend_name() == "postgresql":
+        # asyncpg does not understand libpq's sslmode query parameter
+        sslmode = parsed.query.get("sslmode")
+        if sslmode:
+            parsed = parsed.difference_update_query(["sslmode"])
+            if sslmode != "disable":
+                connect_args["ssl"] = "require"
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    elif parsed.get_backend_name() == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+
+    return parsed.render_as_string(hide_password=False), connect_args
+
+
+# --- Async SQLAlchemy Configuration (Optional) ---
+# Used by async route handlers so DB waits do not block the event loop.
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_URL:
+    try:
+        async_url, async_connect_args = to_async_url(DATABASE_URL)
+        async_options = build_engine_options(use_async=True)
+        async_options["connect_args"] = {**async_connect_args, **async_options.get("connect_args", {})}
+        async_engine = create_async_engine(async_url, **async_options)
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    except Exception as e:
+        print(f"[WARN] Async PostgreSQL engine could not be created: {e}")
+        async_engine = None
+        AsyncSessionLocal = None
+
+
+async def get_async_db():
+    """Dependency to get an AsyncSession. Raises an error if DB is not configured."""
+    if not AsyncSessionLocal:
+        raise RuntimeError("Database not configured. Please set the DATABASE_URL environment variable.")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats(target_engine=None) -> dict:
+    """Returns a snapshot of the connection pool state for the given (or primary) engine."""
+    target_engine = target_engine or engine
+    if target_engine is None:
+        return {"configured": False, "mode": DB_POOL_MODE}
+
+    pool = target_engine.pool
+    stats = {
+        "configured": True,
+        "mode": DB_POOL_MODE,
+        "pool_class": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.stats.snapshot())
+    return stats
+
 Base = declarative_base()
 
 def get_db():
@@ -36,6 +237,219 @@ def get_db():
         db.close()
 
 
+# --- Row Level Security context ---
+# Tenant claims are stored on the Session and applied with a single
+# set_config(..., is_local => true) statement at the start of every transaction
+# the session opens. Transaction-local settings disappear on COMMIT/ROLLBACK,
+# and the pool rolls back every connection it gets back, so a pooled connection
+# (or a pgbouncer server connection) never carries one tenant's claims into the
+# next checkout.
+RLS_CLAIMS_KEY = "rls_claims"
+_RLS_APPLIED_KEY = "rls_claims_applied"
+
+_RLS_STATEMENT = text(
+    "SELECT set_config('request.jwt.claims', :claims, true), "
+    "set_config('app.current_user_id', :user_id, true)"
+)
+_RLS_COMPANY_STATEMENT = text(
+    "SELECT set_config('request.jwt.claims', :claims, true), "
+    "set_config('app.current_user_id', :user_id, true), "
+    "set_config('app.current_company_id', :company_id, true)"
+)
+
+
+def _apply_rls_claims(session: Session, connection, claims: dict):
+    statement = _RLS_COMPANY_STATEMENT if "company_id" in claims else _RLS_STATEMENT
+    connection.execute(statement, claims)
+    session.info[_RLS_APPLIED_KEY] = claims
+
+
+@event.listens_for(Session, "after_begin")
+def _rls_after_begin(session, transaction, connection):
+    claims = session.info.get(RLS_CLAIMS_KEY)
+    if claims:
+        _apply_rls_claims(session, connection, claims)
+
+
+def set_rls_claims(db: Session, user_id, company_id=None):
+    """
+    Scopes the session to a tenant for Row Level Security policies.
+
+    The claims apply to the transaction already in progress (if any) and are
+    re-applied automatically whenever the session begins a new one, e.g.
+    after a commit.
+    """
+    claims = {
+        "claims": json.dumps({"sub": str(user_id), "company_id": str(company_id) if company_id else None}),
+        "user_id": str(user_id),
+    }
+    if company_id:
+        claims["company_id"] = str(company_id)
+    db.info[RLS_CLAIMS_KEY] = claims
+    if db.in_transaction():
+        # connection() fires after_begin (and so applies the claims) if the
+        # transaction has not touched the database yet.
+        connection = db.connection()
+        if db.info.get(_RLS_APPLIED_KEY) is not claims:
+            _apply_rls_claims(db, connection, claims)
+
+
+def clear_rls_claims(db: Session):
+    """Stops applying tenant claims to new transactions on this session."""
+    db.info.pop(RLS_CLAIMS_KEY, None)
+    db.info.pop(_RLS_APPLIED_KEY, None)
+
+
+# --- Read Replica (Optional) ---
+# Read-only endpoints take their session from get_read_db / get_async_read_db.
+# With DATABASE_REPLICA_URL set these hand out replica sessions while the
+# replica is reachable and its replay lag is under REPLICA_MAX_LAG_SECONDS;
+# otherwise (or when no replica is configured) they fall back to the primary
+# session. The health check is cached for REPLICA_HEALTH_TTL_SECONDS so it
+# costs at most one query per interval, not one per request.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_HEALTH_TTL_SECONDS = float(os.getenv("REPLICA_HEALTH_TTL_SECONDS", "5"))
+
+# Zero when the standby has replayed everything it received, so an idle
+# primary does not look like lag.
+_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaHealth:
+    """Cached replica reachability and replication lag."""
+
+    def __init__(self, max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS, ttl_seconds: float = REPLICA_HEALTH_TTL_SECONDS):
+        self.max_lag_seconds = max_lag_seconds
+        self.ttl_seconds = ttl_seconds
+        self.target_engine = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._healthy = False
+        self._lag = None
+        self._error = None
+
+    def needs_check(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.ttl_seconds
+
+    def refresh(self) -> bool:
+        if self.target_engine is None:
+            return False
+        with self._lock:
+            if not self.needs_check():
+                return self._healthy
+            try:
+                with self.target_engine.connect() as conn:
+                    if conn.dialect.name == "postgresql":
+                        lag = float(conn.execute(_REPLICA_LAG_QUERY).scalar() or 0)
+                    else:
+                        conn.execute(text("SELECT 1"))
+                        lag = 0.0
+                self._lag, self._error = lag, None
+                self._healthy = lag <= self.max_lag_seconds
+            except exc.SQLAlchemyError as e:
+                self._lag, self._error = None, str(e)
+                self._healthy = False
+            self._checked_at = time.monotonic()
+            return self._healthy
+
+    def is_healthy(self) -> bool:
+        if self.needs_check():
+            return self.refresh()
+        return self._healthy
+
+    def mark_down(self, error=None):
+        """Routes reads to the primary until the next check interval."""
+        with self._lock:
+            self._healthy = False
+            self._error = str(error) if error else self._error
+            self._checked_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "configured": self.target_engine is not None,
+            "healthy": self._healthy,
+            "lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag_seconds,
+            "error": self._error,
+        }
+
+
+replica_engine = None
+ReplicaSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+replica_health = ReplicaHealth()
+
+if DATABASE_REPLICA_URL:
+    try:
+        replica_engine = create_engine(DATABASE_REPLICA_URL, **build_engine_options())
+        ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+        replica_url, replica_connect_args = to_async_url(DATABASE_REPLICA_URL)
+        replica_async_options = build_engine_options(use_async=True)
+        replica_async_options["connect_args"] = {**replica_connect_args, **replica_async_options.get("connect_args", {})}
+        async_replica_engine = create_async_engine(replica_url, **replica_async_options)
+        AsyncReplicaSessionLocal = async_sessionmaker(bind=async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        replica_health.target_engine = replica_engine
+        print("[OK] Read replica configured")
+    except Exception as e:
+        print(f"[WARN] Read replica could not be configured, reads will use the primary: {e}")
+        replica_engine = ReplicaSessionLocal = async_replica_engine = AsyncReplicaSessionLocal = None
+
+
+def get_read_db(primary: Session = Depends(get_db)):
+    """
+    Dependency for read-only endpoints: a replica session when the replica is
+    healthy, otherwise the request's primary session. Never write through it.
+    """
+    if ReplicaSessionLocal is None or not replica_health.is_healthy():
+        yield primary
+        return
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    except exc.OperationalError as e:
+        replica_health.mark_down(e)
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_read_db(primary: AsyncSession = Depends(get_async_db)):
+    """Async counterpart of get_read_db."""
+    if AsyncReplicaSessionLocal is None:
+        yield primary
+        return
+    healthy = await run_in_threadpool(replica_health.refresh) if replica_health.needs_check() else replica_health.is_healthy()
+    if not healthy:
+        yield primary
+        return
+    async with AsyncReplicaSessionLocal() as db:
+        try:
+            yield db
+        except exc.OperationalError as e:
+            replica_health.mark_down(e)
+            raise
+
+
+def get_read_sessionmaker():
+    """
+    Dependency for streaming responses. Their body is produced after the
+    request's dependencies have exited, so instead of a session this returns a
+    factory the response generator opens and closes itself: the replica's
+    when it is healthy, otherwise the primary's.
+    """
+    if ReplicaSessionLocal is not None and replica_health.is_healthy():
+        return ReplicaSessionLocal
+    if not SessionLocal:
+        raise RuntimeError("Database not configured. Please set the DATABASE_URL environment variable.")
+    return SessionLocal
+
+
 # --- Testing Database (SQLite) ---
 TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./test.db")
 test_engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -49,6 +463,14 @@ def get_test_db():
     finally:
         db.close()
 
+async_test_engine = create_async_engine(to_async_url(TEST_DATABASE_URL)[0], poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_test_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_test_db():
+    """Async dependency for testing database."""
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
 
 # --- Supabase Configuration (Optional) ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
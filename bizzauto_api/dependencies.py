@@ -1,8 +1,9 @@
 from fastapi import Header, HTTPException, Depends, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db, set_rls_claims
 from sql_models import User
+from auth_cache import principal_cache
 from uuid import UUID
 import os
 from jose import jwt, JWTError
@@ -26,7 +27,6 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Security(securi
             raise HTTPException(status_code=500, detail="Server misconfiguration: Missing JWT Secret")
 
         payload = jwt.decode(token, str(SUPABASE_JWT_SECRET), algorithms=[ALGORITHM], options={"verify_aud": False})
-        print(f"DEBUG: JWT Payload: {payload}")
         
         # Extract user_id and company_id
         user_id = payload.get("sub")
@@ -36,6 +36,11 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Security(securi
         if not user_id:
             print("DEBUG: Missing user_id in payload")
             raise HTTPException(status_code=401, detail="Invalid token: missing user_id")
+
+        # Warm requests are served from the principal cache without a DB round trip
+        user = principal_cache.get(user_id, payload.get("exp"))
+        if user is not None:
+            return user
             
         # Optional: Verify user exists in DB (adds latency but ensures consistency)
         user = db.query(User).filter(User.id == UUID(user_id)).first()
@@ -50,7 +55,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Security(securi
              # Ideally, we trust the token for RLS, but here we return the DB user object.
              pass
 
-        return user
+        return principal_cache.put(user_id, payload.get("exp"), user)
 
     except JWTError as e:
         print(f"DEBUG: JWT Error: {str(e)}")
@@ -68,23 +73,13 @@ def get_current_admin(user: User = Depends(get_current_user)):
 
 def set_rls_context(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     # Set the RLS context using Supabase's standard request.jwt.claims
-    # This allows auth.uid() to work in RLS policies
-    import json
-    from sqlalchemy import text
-    
-    # Construct claims object with 'sub' (subject) and 'company_id'
-    # We include 'company_id' to enable 'Tenant isolation' policies
-    claims = json.dumps({
-        "sub": str(user.id),
-        "company_id": str(user.company_id) if user.company_id else None
-    })
-    
-    # Set the claims for auth.uid() and auth.jwt()
-    db.execute(text("SET request.jwt.claims = :claims"), {"claims": claims})
-    
-    # Set app.current_user_id and app.current_company_id
-    db.execute(text("SET app.current_user_id = :user_id"), {"user_id": str(user.id)})
-    if user.company_id:
-        db.execute(text("SET app.current_company_id = :company_id"), {"company_id": str(user.company_id)})
-    
+    # (so auth.uid() works in RLS policies) plus app.current_user_id and
+    # app.current_company_id for the tenant isolation policies. All three are
+    # applied in one statement, scoped to the transaction.
+    set_rls_claims(db, user.id, user.company_id)
+    return db
+
+def set_read_rls_context(user: User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    # Same claims as set_rls_context, on the read-only session (replica when healthy)
+    set_rls_claims(db, user.id, user.company_id)
     return db
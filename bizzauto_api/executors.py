@@ -0,0 +1,93 @@
+"""
+Bounded executors for blocking work called from async endpoints.
+
+Supabase storage calls, Google Vision OCR and invoice parsing are blocking.
+Running them directly in an `async def` endpoint stalls the event loop and
+every other request on that worker, so they go through these pools instead.
+
+Every pool has a fixed number of workers plus a cap on queued jobs. Once the
+cap is reached, run() raises Overloaded instead of queueing without limit.
+Endpoints turn that into a 503, so a burst of uploads is refused instead of
+piling up in memory.
+
+    storage  Supabase storage upload / signed URL   STORAGE_EXECUTOR_WORKERS (8)
+    ocr      Vision API call + text clean-up        OCR_EXECUTOR_WORKERS (4)
+    parse    invoice text parsing                   OCR_PARSE_PROCESSES (0)
+
+Multi-page PDFs also fan their pages out over pdf_page_executor
+(OCR_PDF_PAGE_WORKERS, default 6), from inside the OCR job.
+
+With OCR_PARSE_PROCESSES=0 the parsing stays on the OCR thread. Set it above
+zero to parse in a process pool, which is worthwhile when many large
+documents compete for the GIL. Every pool lets *_EXECUTOR_PENDING jobs wait
+(default 4x its workers).
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """The pool already has its maximum number of jobs running or queued."""
+
+
+class BoundedPool:
+    def __init__(self, name: str, executor: Executor, max_workers: int, max_pending: int = None):
+        self.name = name
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else 4 * max_workers
+        # Only touched from the event loop thread
+        self.in_flight = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the pool and awaits its result."""
+        if self.in_flight >= self.max_workers + self.max_pending:
+            raise Overloaded(f"{self.name} pool is busy ({self.in_flight} jobs)")
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+
+    async def map(self, fn, items) -> list:
+        """
+        fn(item) for every item, at most max_workers at a time so one batch
+        cannot fill the queue by itself. Results keep the order of items; a
+        failed call yields its exception instead of a result.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def one(item):
+            async with semaphore:
+                return await self.run(fn, item)
+        return await asyncio.gather(*(one(item) for item in items), return_exceptions=True)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _thread_pool(name: str, default_workers: int) -> BoundedPool:
+    key = name.upper()
+    workers = _env_int(f"{key}_EXECUTOR_WORKERS", default_workers)
+    pending = _env_int(f"{key}_EXECUTOR_PENDING", 4 * workers)
+    return BoundedPool(name, ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name), workers, pending)
+
+
+storage_pool = _thread_pool("storage", 8)
+ocr_pool = _thread_pool("ocr", 4)
+
+OCR_PARSE_PROCESSES = _env_int("OCR_PARSE_PROCESSES", 0)
+parse_pool = None
+if OCR_PARSE_PROCESSES > 0:
+    # Created lazily by the executor: no processes are forked until the first parse
+    parse_pool = BoundedPool("parse", ProcessPoolExecutor(max_workers=OCR_PARSE_PROCESSES), OCR_PARSE_PROCESSES, _env_int("PARSE_EXECUTOR_PENDING", 4 * OCR_PARSE_PROCESSES))
+
+# Pages of one PDF, OCR'd concurrently from inside an OCR job (see
+# ocr_engine.detect_pdf_pages). A plain executor: it is only used from OCR
+# threads, which ocr_pool already bounds, never from the event loop.
+OCR_PDF_PAGE_WORKERS = _env_int("OCR_PDF_PAGE_WORKERS", 6)
+pdf_page_executor = ThreadPoolExecutor(max_workers=OCR_PDF_PAGE_WORKERS, thread_name_prefix="pdf-pages")
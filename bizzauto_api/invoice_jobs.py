@@ -0,0 +1,118 @@
+"""
+Asynchronous invoice-processing jobs.
+
+In async mode, /api/invoice-processing/upload-invoice stores the file in
+Supabase Storage, creates a job and returns 202 right away. The rest of the
+pipeline runs in worker.py: download, OCR, parse, then the invoice
+transaction. Throughput is bounded by the number of worker threads
+(INVOICE_JOB_WORKERS), not by HTTP timeouts.
+
+Each job is a Redis hash, invoice_job:<id>, kept for INVOICE_JOB_TTL_SECONDS.
+It holds the job's status (queued / running / done / failed), its current
+stage, a timestamp per stage reached and, once done, the invoice id. Job ids
+wait in the invoice_jobs:queue list, which the worker BLPOPs.
+"""
+import os
+import uuid
+from datetime import datetime
+
+import crud
+import ocr_processing
+from redis_client import redis_call
+
+BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "bizzauto_invoice_uploads")
+INVOICE_JOB_TTL_SECONDS = int(os.getenv("INVOICE_JOB_TTL_SECONDS", "86400"))
+INVOICE_JOB_WORKERS = int(os.getenv("INVOICE_JOB_WORKERS", "2"))
+QUEUE_KEY = "invoice_jobs:queue"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+STAGES = ("queued", "downloading", "ocr", "parsing", "saving", "done")
+
+
+def job_key(job_id) -> str:
+    return f"invoice_job:{job_id}"
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def enqueue(file_path: str, company_id, user_id, client_id=None):
+    """Creates a queued job for an uploaded file; returns its id, or None if Redis is unavailable."""
+    job_id = str(uuid.uuid4())
+    job = {
+        "status": QUEUED, "stage": "queued", "queued_at": _now(),
+        "file_path": file_path, "company_id": str(company_id), "user_id": str(user_id),
+        "client_id": str(client_id) if client_id else "",
+    }
+
+    def push(r):
+        pipe = r.pipeline(transaction=True)
+        pipe.hset(job_key(job_id), mapping=job)
+        pipe.expire(job_key(job_id), INVOICE_JOB_TTL_SECONDS)
+        pipe.rpush(QUEUE_KEY, job_id)
+        pipe.execute()
+        return job_id
+    return redis_call(push)
+
+
+def get(job_id):
+    """The job hash, {} if there is no such job, or None if Redis is unavailable."""
+    return redis_call(lambda r: r.hgetall(job_key(job_id)))
+
+
+def _update(job_id, **fields):
+    if "stage" in fields:
+        fields[f"{fields['stage']}_at"] = _now()
+    redis_call(lambda r: r.hset(job_key(job_id), mapping={k: "" if v is None else str(v) for k, v in fields.items()}))
+
+
+def status(job_id, job: dict) -> dict:
+    """Public view of a job: status, stage, progress (0..1) and stage timestamps."""
+    stage = job.get("stage", "queued")
+    return {
+        "job_id": job_id,
+        "status": job.get("status"),
+        "stage": stage,
+        "progress": round(STAGES.index(stage) / (len(STAGES) - 1), 2) if stage in STAGES else 0.0,
+        "stages": {s: job[f"{s}_at"] for s in STAGES if job.get(f"{s}_at")},
+        "invoice_id": job.get("invoice_id") or None,
+        "items_processed": int(job["items_processed"]) if job.get("items_processed") else None,
+        "error": job.get("error") or None,
+    }
+
+
+def process(job_id, supabase_client, session_factory):
+    """Runs one job to completion; failures are recorded on the job, not raised."""
+    job = get(job_id)
+    if not job:
+        print(f"⚠️ Invoice job {job_id} not found (expired or Redis unavailable)", flush=True)
+        return
+    try:
+        _update(job_id, status=RUNNING, stage="downloading")
+        file_content = supabase_client.storage.from_(BUCKET_NAME).download(job["file_path"])
+
+        _update(job_id, stage="ocr")
+        ocr_text = ocr_processing.extract_text_from_file(file_content)
+
+        _update(job_id, stage="parsing")
+        parsed_data = ocr_processing.parse_invoice_text(ocr_text)
+        if not parsed_data["line_items"]:
+            raise ValueError("Could not parse any line items from the invoice.")
+
+        _update(job_id, stage="saving")
+        db = session_factory()
+        try:
+            invoice, items_processed = crud.create_invoice_from_ocr(
+                db,
+                ocr_data=parsed_data,
+                company_id=uuid.UUID(job["company_id"]),
+                user_id=uuid.UUID(job["user_id"]),
+                client_id=uuid.UUID(job["client_id"]) if job.get("client_id") else None,
+            )
+        finally:
+            db.close()
+        _update(job_id, status=DONE, stage="done", invoice_id=invoice.id, items_processed=items_processed)
+    except Exception as e:
+        print(f"❌ Invoice job {job_id} failed: {e}", flush=True)
+        _update(job_id, status=FAILED, error=str(e))
@@ -0,0 +1,363 @@
+"""
+Invoice and inventory text parser.
+
+parse() turns OCR text into {"invoice_date", "total_amount", "line_items"}.
+The text is split into lines once: every non-empty line is stripped, upper-
+and lower-cased and split into words and comma fields a single time (Line),
+and each stage below reads those instead of re-scanning the text:
+
+    inventory    stock reports and item lists: ITEM CODE / ITEM NAME /
+                 BALANCE QUANTITY reports, CSV exports, "code, name, qty"
+                 and "code name... qty" rows. The total is the sum of the
+                 quantities.
+    fallback     "...code... quantity" rows, when no inventory row matched
+    invoice      date, total and "description qty amount" line items
+
+Patterns and keyword lists are compiled once, at import. The line-item
+patterns still run over the whole text rather than line by line: their \\s
+can cross a newline, which is how a description and its numbers that OCR
+put on separate lines still pair up. tests/fixtures/invoice_parser holds
+golden outputs; a change to them is a change in parsing, and needs
+ocr_cache.PARSER_VERSION bumped.
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A leading (?=[...]) lists the letters a match can start with, so the
+# engine skips every other position instead of trying each alternative there.
+DATE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+    r"(\d{4}[-]\d{1,2}[-]\d{1,2})",
+    r"(?=[jfmasond])((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{1,2},?\s+\d{4})",
+))
+TOTAL_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"(?=[tab])(?:Total|Amount\sDue|Balance|TOTAL)\s*[:\s]*\$?([\d,]+\.\d{2})",
+    r"TOTAL\s+([\d,]+\.\d{2})",
+))
+# Tried in order; the first one that yields an item wins. Groups are read
+# positionally as (description, quantity, amount) for all of them, so the
+# quantity-first pattern only yields rows whose description is a number.
+LINE_ITEM_PATTERNS = tuple(re.compile(pattern, re.MULTILINE | re.IGNORECASE) for pattern in (
+    # Description, Quantity, Price (comma-separated)
+    r"^(.+?)\s*,\s*(\d+(?:\.\d+)?)\s*,\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})?)$",
+    # Description [Qty|x] Quantity [@|$] Price
+    r"^(.+?)\s+(?:Qty|x|QTY)?\s*(\d+(?:\.\d+)?)\s+(?:@|\$)?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})?)$",
+    # Description Quantity Amount
+    r"^(.+?)\s+(\d+(?:\.\d+)?)\s+(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})?)$",
+    # Quantity Description Price
+    r"^(\d+(?:\.\d+)?)\s+(.+?)\s+(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})?)$",
+))
+# Description Quantity Amount, on one stripped line
+GENERAL_ITEM_PATTERN = re.compile(r"^(.+?)\s+(\d+(?:\.\d+)?)\s+(\d{1,3}(?:,\d{3})*(?:\.\d{2})|\d+(?:\.\d{2})?)$", re.IGNORECASE)
+
+ITEM_CODE_PATTERN = re.compile(r"\b\d{6,}\b")
+SMALL_NUMBER_PATTERN = re.compile(r"\b\d{1,3}\b")
+NON_NUMERIC_PATTERN = re.compile(r"[^\d.-]")
+
+CSV_HEADER = "Category,Item Code,Item Name,Quantity"
+SECTION_INDICATORS = ("IP (", "AN (", "IP:", "AN:")
+
+
+def _keywords(*words: str):
+    """Matches any of the (lower-case) words, searched in lower-cased text."""
+    return re.compile("|".join(re.escape(word) for word in words))
+
+
+# Lines / names the fallback, invoice-item and general stages never treat as items
+FALLBACK_SKIP = _keywords("total", "subtotal", "tax", "shipping", "discount", "invoice", "date", "bill", "to:", "from:", "page", "item code", "item name", "quantity")
+ITEM_SKIP = _keywords("total", "subtotal", "tax", "shipping", "discount", "amount", "payment")
+GENERAL_SKIP = _keywords("total", "subtotal", "tax", "shipping", "discount", "invoice", "date", "bill", "to:", "from:", "page")
+# Lines that do not count as content for the last-resort placeholder item
+NON_CONTENT = _keywords("item code", "item name", "quantity", "total", "subtotal", "page")
+
+
+class Line:
+    """One non-empty, stripped line of the text."""
+    __slots__ = ("text", "upper", "lower", "words", "fields")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.upper = text.upper()
+        self.lower = text.lower()
+        self.words = text.split()
+        self.fields = text.split(",")
+
+
+def split_lines(text: str) -> List[Line]:
+    return [Line(stripped) for stripped in map(str.strip, text.split("\n")) if stripped]
+
+
+def _has_digit(word: str) -> bool:
+    return not word.isalpha() and any(map(str.isdigit, word))
+
+
+def _is_code(word: str) -> bool:
+    """Looks like an item code: alphanumeric apart from - and ., with at least one digit."""
+    if word.isdecimal():
+        return True
+    return word.replace("-", "").replace(".", "").isalnum() and _has_digit(word)
+
+
+def _to_int(word: str) -> Optional[int]:
+    if word.isdecimal():
+        return int(word)
+    if not _has_digit(word):
+        return None
+    try:
+        return int(word)
+    except ValueError:
+        return None
+
+
+def _item(name: str, quantity, price: float = 0.0, total: float = 0.0) -> Dict[str, Any]:
+    return {"name": name, "quantity": quantity, "price": price, "total": total}
+
+
+def _is_inventory(text: str, lines: List[Line]) -> bool:
+    text_upper = text.upper()
+    has_item_code = "ITEM CODE" in text_upper or "ITEMCODE" in text_upper
+    has_item_name = "ITEM NAME" in text_upper or "ITEMNAME" in text_upper
+    has_balance_quantity = "BALANCE" in text_upper and "QUANTITY" in text_upper
+    has_valuation_report = "VALUATION" in text_upper or "REPORT" in text_upper
+    if has_item_code and has_item_name and (has_balance_quantity or has_valuation_report):
+        return True
+    if (has_item_code or has_item_name or has_balance_quantity or has_valuation_report) and any(s in text_upper for s in SECTION_INDICATORS):
+        return True
+
+    inventory_lines = 0
+    for line in lines:
+        if "ITEM CODE" in line.upper and "ITEM NAME" in line.upper:
+            return True
+        # "code name... qty": a code among the first three words and a small number somewhere
+        words = line.words
+        if len(words) >= 3 and any(_is_code(word) for word in words[:3]) and any(word.isdigit() and len(word) <= 4 for word in words):
+            inventory_lines += 1
+            if inventory_lines >= 2:
+                return True
+        # "code, name, qty"
+        fields = line.fields
+        if len(fields) >= 3 and fields[0].strip().replace(" ", "").isalnum() and fields[1].strip() and fields[2].strip().isdigit():
+            return True
+
+    # Runs of long numeric codes next to a comparable number of small quantities
+    codes = ITEM_CODE_PATTERN.findall(text)
+    if len(codes) >= 3:
+        quantities = SMALL_NUMBER_PATTERN.findall(text)
+        if len(quantities) >= 3 and 0.5 <= len(codes) / len(set(quantities)) <= 3.0:
+            return True
+    return False
+
+
+def _is_inventory_heading(line: Line) -> bool:
+    upper = line.upper
+    return (
+        ("ITEM CODE" in upper and "ITEM NAME" in upper and ("QUANTITY" in upper or "BALANCE" in upper))
+        or "SUBTOTAL" in upper
+        or "GRAND TOTAL" in upper
+        or ("TOTAL" in upper and "QUANTITY" in upper)
+        # Section titles such as "IP (Apple / iPhone & iPad)"
+        or ("(" in line.text and ")" in line.text and len(line.words) < 5)
+    )
+
+
+def _inventory_items(text: str, lines: List[Line]) -> List[Dict[str, Any]]:
+    items = []
+    if CSV_HEADER in text.partition("\n")[0]:
+        # Category, Item Code, Item Name, Quantity; lines[0] is the header
+        for line in lines[1:]:
+            fields = line.fields
+            if len(fields) < 4:
+                continue
+            name, quantity_str = fields[2].strip(), fields[3].strip()
+            try:
+                quantity = int(quantity_str) if quantity_str.isdigit() else 0
+            except ValueError:
+                continue
+            if name:
+                items.append(_item(name, quantity))
+        return items
+
+    for line in lines:
+        if _is_inventory_heading(line):
+            continue
+        fields = line.fields
+        if len(fields) >= 3:
+            # code, name, quantity[, price]
+            code, name, quantity_str = fields[0].strip(), fields[1].strip(), fields[2].strip()
+            price = 0.0
+            if len(fields) >= 4:
+                price_str = NON_NUMERIC_PATTERN.sub("", fields[3].strip())
+                if price_str:
+                    try:
+                        price = float(price_str)
+                    except ValueError:
+                        price = 0.0
+            if ("Total" in name and code == "") or "Total" in code:
+                continue
+            try:
+                quantity = int(quantity_str) if quantity_str.isdigit() else 0
+            except ValueError:
+                continue
+            if code:
+                items.append(_item(name or f"Item {code}", quantity, price, price * quantity if price > 0 else 0.0))
+        else:
+            # code name... quantity, e.g. "00000191    17 PM 512    1"
+            words = line.words
+            if len(words) < 3 or not _is_code(words[0]):
+                continue
+            quantity_str = words[-1] if words[-1].isdecimal() else NON_NUMERIC_PATTERN.sub("", words[-1])
+            if not quantity_str.isdigit():
+                continue
+            name = " ".join(words[1:-1])
+            if "TOTAL" not in name.upper():
+                items.append(_item(name, int(quantity_str)))
+    return items
+
+
+def _coded_rows(lines: List[Line]) -> List[Dict[str, Any]]:
+    """Rows with a code anywhere and a positive quantity last, for inventories whose rows did not parse."""
+    items = []
+    for line in lines:
+        words = line.words
+        if len(words) < 3:
+            continue
+        quantity = _to_int(words[-1])
+        if quantity is None or quantity <= 0:
+            continue
+        # A code second to last would leave only the quantity as the name
+        for i in range(len(words) - 2):
+            if _is_code(words[i]):
+                name = " ".join(words[i + 1:-1])
+                if name != words[-1]:
+                    items.append(_item(name, quantity))
+    return items
+
+
+def _fallback_items(lines: List[Line]) -> List[Dict[str, Any]]:
+    """Any word with a digit followed by a plausible quantity, the words in between being the name."""
+    items = []
+    for line in lines:
+        words = line.words
+        if len(words) < 2 or FALLBACK_SKIP.search(line.lower):
+            continue
+        numbers = None
+        for i, word in enumerate(words):
+            if not _has_digit(word):
+                continue
+            if numbers is None:
+                numbers = [_to_int(w) for w in words]
+            for j in range(i + 1, len(words)):
+                quantity = numbers[j]
+                if quantity is None or not 0 < quantity <= 10000:
+                    continue
+                name = (" ".join(words[i + 1:j]) if j > i + 1 else f"Item {word}").strip(".,;:")
+                if name and not FALLBACK_SKIP.search(name.lower()):
+                    items.append(_item(name, quantity))
+                    break
+    return items
+
+
+def _line_item(description: str, quantity_str: str, amount_str: str, skip) -> Optional[Dict[str, Any]]:
+    """An item from a description / quantity / amount match, the amount taken as the line total."""
+    try:
+        quantity = float(quantity_str) if "." in quantity_str else int(quantity_str)
+        amount = float(amount_str.replace(",", ""))
+        unit_price = round(amount / quantity, 2) if quantity != 0 else amount
+    except (ValueError, ZeroDivisionError):
+        return None
+    name = " ".join(description.split())
+    if skip.search(name.lower()) or not (quantity > 0 and amount > 0 and name):
+        return None
+    return _item(name, int(quantity) if quantity.is_integer() else quantity, unit_price, amount)
+
+
+def _invoice_items(text: str, lines: List[Line], items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for pattern in LINE_ITEM_PATTERNS:
+        for match in pattern.finditer(text):
+            item = _line_item(match.group(1), match.group(2), match.group(3), ITEM_SKIP)
+            if item:
+                items.append(item)
+        if items:
+            return items
+
+    logger.info("No line items found with primary patterns, trying general extraction.")
+    for line in lines:
+        if GENERAL_SKIP.search(line.lower):
+            continue
+        match = GENERAL_ITEM_PATTERN.search(line.text)
+        if match:
+            item = _line_item(match.group(1), match.group(2), match.group(3), GENERAL_SKIP)
+            if item:
+                items.append(item)
+    return items
+
+
+def parse(text: str) -> Dict[str, Any]:
+    """Parses OCR text into invoice_date, total_amount and line_items (see the module docstring)."""
+    logger.info(f"OCR extracted text (first 500 chars): {text[:500]}")
+    parsed_data = {"invoice_date": None, "total_amount": 0.0, "line_items": []}
+    lines = split_lines(text)
+
+    items = _inventory_items(text, lines)
+    if not items and _is_inventory(text, lines):
+        logger.info("Inventory format detected but no items parsed, trying alternative parsing strategies")
+        items = _coded_rows(lines)
+    if items:
+        logger.info(f"Found {len(items)} items using inventory parsing")
+        parsed_data["line_items"] = items
+        parsed_data["total_amount"] = calculate_inventory_total(items)
+        return parsed_data
+
+    # Whatever the fallback finds, the comma-separated item pattern below
+    # still runs and adds its matches.
+    items = _fallback_items(lines)
+
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            parsed_data["invoice_date"] = match.group(1)
+            break
+
+    for pattern in TOTAL_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            try:
+                # The last match is most likely the grand total
+                parsed_data["total_amount"] = float(matches[-1].replace(",", ""))
+                break
+            except ValueError:
+                continue
+
+    items = _invoice_items(text, lines, items)
+    logger.info(f"Line items found: {len(items)}")
+    parsed_data["line_items"] = items
+    if parsed_data["total_amount"] == 0.0 and items:
+        parsed_data["total_amount"] = sum(item["total"] for item in items)
+
+    if not items:
+        # Last resort, so the upload does not fail outright
+        content_lines = sum(1 for line in lines if not NON_CONTENT.search(line.lower))
+        if content_lines:
+            items.append(_item(f"Inventory Item - {content_lines} lines detected", 1))
+        else:
+            items.append(_item("Placeholder Item", 0))
+        logger.warning(f"No items found after all parsing attempts. Created fallback item: {items[0]}")
+    return parsed_data
+
+
+def is_inventory_format(text: str) -> bool:
+    """Whether the text looks like an inventory / stock report rather than an invoice."""
+    return _is_inventory(text, split_lines(text))
+
+
+def parse_inventory_format(text: str) -> List[Dict[str, Any]]:
+    """Inventory rows of the text (CSV export, "code, name, qty" or "code name... qty")."""
+    return _inventory_items(text, split_lines(text))
+
+
+def calculate_inventory_total(items: List[Dict[str, Any]]) -> float:
+    """Inventory reports carry no prices, so their total is the total quantity."""
+    return sum(item["quantity"] for item in items)
@@ -0,0 +1,282 @@
+"""
+General-ledger posting engine for Account / JournalEntry.
+
+Every invoice, purchase and expense written through SQLAlchemy posts balanced
+debit/credit journal entries, and the balances of the accounts involved are
+adjusted in the same transaction. A Session flush hook collects all postings
+of a flush and writes them as one executemany INSERT plus one executemany
+UPDATE of the balances; crud.bulk_insert posts its Core inserts through
+post_inserted().
+
+Posting rules (accounts are created per company on first use):
+
+    invoice   Dr Accounts Receivable (Cash once paid)   Cr Sales Revenue
+    purchase  Dr Inventory                              Cr Accounts Payable
+    expense   Dr Operating Expenses                     Cr Cash
+
+Editing a document's amount, date, status or company reverses its previous
+posting and posts the new one; deleting it posts a reversal. Entries are
+dated with the document date (today if it has none), moved to the first open
+day when that falls in a closed month (see period_close.py). Posting holds
+the company's ledger lock (lock_ledgers) until the transaction ends, so a
+period close never snapshots a month while an entry is being dated into it.
+
+Account.balance is kept on the account's normal side: debit minus credit for
+Asset and Expense accounts, credit minus debit for the others. The trial
+balance therefore reads accounts only, and an account ledger is a keyset page
+over (account_id, date, id).
+"""
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, event, exists, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from daily_metrics import previous_values
+from sql_models import Account, ClosedPeriod, Expense, Invoice, JournalEntry, Purchase
+
+ASSET, LIABILITY, EQUITY, REVENUE, EXPENSE = "Asset", "Liability", "Equity", "Revenue", "Expense"
+DEBIT_NORMAL = {ASSET, EXPENSE}
+
+# First key of the two-key pg_advisory_xact_lock taken per company
+LEDGER_LOCK_NAMESPACE = 7423002
+
+CASH = "Cash"
+ACCOUNTS_RECEIVABLE = "Accounts Receivable"
+SALES_REVENUE = "Sales Revenue"
+INVENTORY = "Inventory"
+ACCOUNTS_PAYABLE = "Accounts Payable"
+OPERATING_EXPENSES = "Operating Expenses"
+
+DEFAULT_ACCOUNTS = {
+    CASH: ASSET,
+    ACCOUNTS_RECEIVABLE: ASSET,
+    INVENTORY: ASSET,
+    ACCOUNTS_PAYABLE: LIABILITY,
+    SALES_REVENUE: REVENUE,
+    OPERATING_EXPENSES: EXPENSE,
+}
+
+_PENDING_KEY = "ledger_pending"
+
+
+class PostingRule:
+    """How one document model posts to the ledger."""
+
+    def __init__(self, model, link_field: str, date_field: str, amount_field: str, accounts, status_field: str = None):
+        self.model = model
+        self.link_field = link_field
+        self.date_field = date_field
+        self.amount_field = amount_field
+        self.accounts = accounts  # values -> (debit account, credit account)
+        self.status_field = status_field
+        self.fields = [f for f in ("company_id", "user_id", date_field, amount_field, status_field) if f]
+
+    def lines(self, values: dict):
+        """[(account name, debit, credit)] for a document."""
+        amount = float(values.get(self.amount_field) or 0)
+        if not values.get("company_id") or not amount:
+            return []
+        debit_account, credit_account = self.accounts(values)
+        return [(debit_account, amount, 0.0), (credit_account, 0.0, amount)]
+
+
+RULES = {
+    Invoice: PostingRule(
+        Invoice, "invoice_id", "invoice_date", "total_amount",
+        lambda v: (CASH if v.get("payment_status") == "paid" else ACCOUNTS_RECEIVABLE, SALES_REVENUE),
+        status_field="payment_status",
+    ),
+    Purchase: PostingRule(Purchase, "purchase_id", "purchase_date", "total_amount", lambda v: (INVENTORY, ACCOUNTS_PAYABLE)),
+    Expense: PostingRule(Expense, "expense_id", "expense_date", "amount", lambda v: (OPERATING_EXPENSES, CASH)),
+}
+
+
+class Posting:
+    """Journal lines for one document, waiting to be written."""
+
+    def __init__(self, rule: PostingRule, company_id, user_id, entry_date, document_id, lines):
+        self.rule = rule
+        self.company_id = company_id
+        self.user_id = user_id
+        self.date = entry_date
+        self.document_id = document_id
+        self.lines = lines
+
+    @classmethod
+    def for_document(cls, rule: PostingRule, values: dict, document_id=None):
+        entry_date = values.get(rule.date_field) or date.today()
+        return cls(rule, values.get("company_id"), values.get("user_id"), entry_date, document_id, rule.lines(values))
+
+    def reversal(self, document_id=None):
+        """The same lines with debit and credit swapped."""
+        lines = [(name, credit, debit) for name, debit, credit in self.lines]
+        return Posting(self.rule, self.company_id, self.user_id, self.date, document_id, lines)
+
+    def same_as(self, other) -> bool:
+        return (self.company_id, self.date, self.lines) == (other.company_id, other.date, other.lines)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(period: date) -> date:
+    return (period.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def first_open_days(connection, company_ids) -> dict:
+    """{company_id: first day after the last closed month} for companies with closed months."""
+    rows = connection.execute(
+        select(ClosedPeriod.company_id, func.max(ClosedPeriod.period))
+        .where(ClosedPeriod.company_id.in_(list(company_ids)))
+        .group_by(ClosedPeriod.company_id)
+    ).all()
+    return {company_id: next_month(period) for company_id, period in rows}
+
+
+def _lock_key(company_id) -> int:
+    """Signed 32-bit advisory lock key for a company id."""
+    return int.from_bytes(uuid.UUID(str(company_id)).bytes[:4], "big", signed=True)
+
+
+def lock_ledgers(connection, company_ids):
+    """
+    Takes the ledger lock of each company until the transaction ends, in a
+    fixed order so two transactions never wait on each other. Postgres only:
+    SQLite already serialises writers.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    for company_id in sorted(company_ids, key=str):
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+            {"namespace": LEDGER_LOCK_NAMESPACE, "key": _lock_key(company_id)},
+        )
+
+
+def _select_accounts(connection, company_id, names) -> dict:
+    rows = connection.execute(
+        select(Account.name, Account.id, Account.type).where(Account.company_id == company_id, Account.name.in_(names))
+    ).all()
+    return {name: (account_id, account_type) for name, account_id, account_type in rows}
+
+
+def _account_ids(connection, company_id, user_id, names) -> dict:
+    """
+    {name: (id, type)} for the company's posting accounts, creating missing
+    ones. A concurrent transaction may create the same account first: the
+    unique (company_id, name) index turns our insert into a no-op and the
+    re-select picks up its row.
+    """
+    accounts = _select_accounts(connection, company_id, names)
+    missing = [name for name in names if name not in accounts]
+    if missing:
+        dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+        new = [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id, "name": name, "type": DEFAULT_ACCOUNTS[name], "balance": 0.0} for name in missing]
+        connection.execute(dialect_insert(Account).on_conflict_do_nothing(index_elements=[Account.company_id, Account.name]), new)
+        accounts.update(_select_accounts(connection, company_id, missing))
+    return accounts
+
+
+def write_postings(connection, postings: list):
+    """Inserts the journal lines of `postings` and adjusts account balances, in batches."""
+    postings = [p for p in postings if p.lines]
+    if not postings:
+        return
+    entries, deltas = [], {}
+    by_company = {}
+    for posting in postings:
+        by_company.setdefault(posting.company_id, []).append(posting)
+    lock_ledgers(connection, by_company)
+    open_from = first_open_days(connection, by_company)
+    for company_id, company_postings in by_company.items():
+        names = sorted({name for p in company_postings for name, _, _ in p.lines})
+        accounts = _account_ids(connection, company_id, company_postings[0].user_id, names)
+        for posting in company_postings:
+            entry_date = max(posting.date, open_from[company_id]) if company_id in open_from else posting.date
+            for name, debit, credit in posting.lines:
+                account_id, account_type = accounts[name]
+                entries.append({
+                    "id": uuid.uuid4(), "company_id": company_id, "user_id": posting.user_id,
+                    "account_id": account_id, "invoice_id": None, "purchase_id": None, "expense_id": None,
+                    posting.rule.link_field: posting.document_id,
+                    "date": entry_date, "debit": debit, "credit": credit,
+                })
+                delta = debit - credit if account_type in DEBIT_NORMAL else credit - debit
+                deltas[account_id] = deltas.get(account_id, 0.0) + delta
+    connection.execute(insert(JournalEntry), entries)
+    balance_updates = [{"account_id": account_id, "delta": delta} for account_id, delta in deltas.items() if delta]
+    if balance_updates:
+        connection.execute(
+            update(Account).where(Account.id == bindparam("account_id")).values(balance=Account.balance + bindparam("delta")),
+            balance_updates,
+        )
+
+
+def _pending(session: Session) -> list:
+    return session.info.setdefault(_PENDING_KEY, [])
+
+
+def _values(obj, rule: PostingRule) -> dict:
+    return {field: getattr(obj, field) for field in rule.fields}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_previous(session, flush_context, instances):
+    pending = _pending(session)
+    for obj in session.dirty:
+        rule = RULES.get(type(obj))
+        if rule and session.is_modified(obj):
+            previous = Posting.for_document(rule, previous_values(session, obj, rule.fields), obj.id)
+            pending.append((obj, previous))
+    for obj in session.deleted:
+        rule = RULES.get(type(obj))
+        if rule:
+            # The document row is going away: its reversal is not linked to it
+            pending.append((None, Posting.for_document(rule, _values(obj, rule)).reversal()))
+
+
+@event.listens_for(Session, "after_flush")
+def _post_flush(session, flush_context):
+    postings = []
+    for obj, previous in session.info.pop(_PENDING_KEY, []):
+        if obj is None:
+            postings.append(previous)
+            continue
+        current = Posting.for_document(RULES[type(obj)], _values(obj, RULES[type(obj)]), obj.id)
+        if not previous.same_as(current):
+            postings += [previous.reversal(obj.id), current]
+    for obj in session.new:
+        rule = RULES.get(type(obj))
+        if rule:
+            postings.append(Posting.for_document(rule, _values(obj, rule), obj.id))
+    write_postings(session.connection(), postings)
+
+
+def post_inserted(session: Session, model, rows: list):
+    """Posts documents inserted with Core (crud.bulk_insert)."""
+    rule = RULES.get(model)
+    if rule:
+        write_postings(session.connection(), [Posting.for_document(rule, values, values["id"]) for values in rows])
+
+
+def post_missing(connection, company_id=None) -> int:
+    """
+    Posts every document that has no journal entries yet (documents created
+    before the ledger existed, or written around SQLAlchemy). Returns the
+    number of documents posted.
+    """
+    postings = []
+    for rule in RULES.values():
+        model = rule.model
+        link = getattr(JournalEntry, rule.link_field)
+        query = select(model.id, *[getattr(model, f) for f in rule.fields]).where(~exists().where(link == model.id))
+        if company_id:
+            query = query.where(model.company_id == company_id)
+        for row in connection.execute(query):
+            values = dict(zip(rule.fields, row[1:]))
+            postings.append(Posting.for_document(rule, values, row[0]))
+    write_postings(connection, postings)
+    return sum(1 for p in postings if p.lines)
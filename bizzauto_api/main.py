@@ -9,7 +9,8 @@ load_dotenv()
 
 from google.oauth2 import service_account
 from google.cloud import vision
-from fastapi import FastAPI , Depends
+from fastapi import FastAPI , Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import google.generativeai as genai
@@ -47,6 +48,8 @@ import routers.admin as admin
 import routers.api.invoice_processing as invoice_processing
 
 from database import engine, get_db, TestingSessionLocal, test_engine
+from pagination import InvalidCursor, NEXT_CURSOR_HEADER
+from migrations import run_migrations
 import sql_models
 
 app = FastAPI()
@@ -67,7 +70,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": "Invalid pagination cursor"})
+
 # ✅ Include invoice processing router
 app.include_router(
     invoice_processing.router,
@@ -81,6 +90,7 @@ async def startup_event():
     if os.getenv("TESTING") == "True":
         sql_models.Base.metadata.drop_all(bind=test_engine)
         sql_models.Base.metadata.create_all(bind=test_engine)
+        run_migrations(test_engine)
         logging.info("✅ Test database tables created successfully")
     else:
         # Gracefully handle database table creation
@@ -88,6 +98,9 @@ async def startup_event():
             if engine is not None:
                 sql_models.Base.metadata.create_all(bind=engine)
                 logging.info("✅ Database tables created successfully")
+                applied = run_migrations(engine)
+                if applied:
+                    logging.info(f"✅ Applied migrations: {', '.join(applied)}")
             else:
                 logging.warning("⚠️ Database engine not available - skipping table creation")
         except Exception as e:
@@ -0,0 +1,128 @@
+"""
+Versioned schema migrations for sql_models.
+
+Base.metadata.create_all() only creates missing tables; it never changes a
+table that already exists. Anything that has to reach existing databases
+(new indexes, new columns, backfills) ships as a migration instead.
+
+Every module in this package named mNNNN_<description>.py is one migration,
+applied once in version order and recorded in the schema_migrations table.
+A migration exposes upgrade(conn) and may set TRANSACTIONAL = False to run on
+an autocommit connection, which Postgres requires for
+CREATE INDEX CONCURRENTLY.
+
+Migrations run at startup after create_all (see main.py) and can be run or
+inspected by hand:
+
+    python -m migrations status
+    python -m migrations upgrade
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Serialises runners from several app workers starting at once (Postgres only)
+ADVISORY_LOCK_KEY = 7423001
+
+_MODULE_PATTERN = re.compile(r"^m(\d{4})_(\w+)$")
+
+
+def discover():
+    """Returns [(version, name, module)] for every migration, in version order."""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_PATTERN.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            migrations.append((int(match.group(1)), match.group(2), module))
+    return sorted(migrations, key=lambda m: m[0])
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine) -> set:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending(engine):
+    done = applied_versions(engine)
+    return [m for m in discover() if m[0] not in done]
+
+
+def _record(conn, version: int, name: str):
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+        {"version": version, "name": name, "applied_at": datetime.utcnow()},
+    )
+
+
+def _apply(engine, version: int, name: str, module):
+    if getattr(module, "TRANSACTIONAL", True):
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            _record(conn, version, name)
+    else:
+        # Each statement commits on its own; upgrade() must be safe to re-run
+        # if it is interrupted part way.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            module.upgrade(conn)
+            _record(conn, version, name)
+
+
+def run_migrations(engine) -> list:
+    """Applies every pending migration and returns the names applied."""
+    is_postgres = engine.dialect.name == "postgresql"
+    lock_conn = engine.connect() if is_postgres else None
+    applied = []
+    try:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        for version, name, module in pending(engine):
+            logger.info(f"Applying migration {version:04d}_{name}")
+            _apply(engine, version, name, module)
+            applied.append(f"{version:04d}_{name}")
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock_conn.close()
+    return applied
+
+
+def create_index(conn, name: str, table: str, columns: str, unique: bool = False):
+    """
+    Creates an index if it does not exist. On Postgres the index is built
+    CONCURRENTLY so writes to the table are not blocked; a previous
+    concurrent build that failed leaves an INVALID index behind, which is
+    dropped and rebuilt.
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    if conn.dialect.name == "postgresql":
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+    else:
+        conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def drop_index(conn, name: str):
+    """Drops an index if it exists; CONCURRENTLY on Postgres, like create_index()."""
+    concurrently = " CONCURRENTLY" if conn.dialect.name == "postgresql" else ""
+    conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {name}"))
@@ -0,0 +1,48 @@
+"""
+Command line entry point for the migration runner.
+
+    python -m migrations status [--url DATABASE_URL]
+    python -m migrations upgrade [--url DATABASE_URL]
+
+upgrade creates any missing tables first, the same way app startup does.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+import sql_models
+from migrations import applied_versions, discover, run_migrations
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="database URL (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("DATABASE_URL not set")
+        sys.exit(1)
+
+    engine = create_engine(args.url)
+    try:
+        if args.command == "status":
+            done = applied_versions(engine)
+            for version, name, _ in discover():
+                print(f"[{'x' if version in done else ' '}] {version:04d}_{name}")
+        else:
+            sql_models.Base.metadata.create_all(bind=engine)
+            applied = run_migrations(engine)
+            print("\n".join(f"Applied {name}" for name in applied) or "Database is up to date")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Per-company daily metrics rollup (see daily_metrics.py).
+
+The company_daily_metrics table itself comes from create_all. This migration
+adds whatsapp_logs.created_at, which the whatsapp_message metric is keyed on,
+and fills the rollup from the raw tables. Existing logs have no recorded send
+time, so their created_at stays NULL and rebuild() counts them on
+daily_metrics.UNDATED. Stamping them with the migration time would put the
+whole history on one day.
+"""
+from sqlalchemy import inspect, text
+
+import daily_metrics
+
+
+def upgrade(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("whatsapp_logs")}
+    if "created_at" not in columns:
+        conn.execute(text("ALTER TABLE whatsapp_logs ADD COLUMN created_at TIMESTAMP"))
+    daily_metrics.rebuild(conn)
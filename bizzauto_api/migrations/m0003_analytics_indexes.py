@@ -0,0 +1,21 @@
+"""
+Indexes for /api/admin/analytics date windows.
+
+The admin revenue trend scans company_daily_metrics by day across every
+company; its primary key leads with company_id, so it needs its own day
+index. User growth uses ix_users_created_id from m0001.
+"""
+from migrations import create_index
+
+TRANSACTIONAL = False
+
+# (name, table, columns)
+INDEXES = [
+    # admin analytics: metric LIKE 'invoice:%' AND day >= window start
+    ("ix_company_daily_metrics_day_metric", "company_daily_metrics", "day, metric"),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,22 @@
+"""
+Indexes for the general ledger (see ledger.py).
+
+The account ledger endpoint pages an account's entries by (date, id), and
+every posting looks up the company's accounts by name.
+"""
+from migrations import create_index
+
+TRANSACTIONAL = False
+
+# (name, table, columns)
+INDEXES = [
+    # GET /api/accounting/accounts/{id}/ledger: account_id, keyset on (date, id)
+    ("ix_journal_entries_account_date", "journal_entries", "account_id, date, id"),
+    # ledger._account_ids: company_id + name on every posting
+    ("ix_accounts_company_name", "accounts", "company_id, name"),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,21 @@
+"""
+Index for as-of-date ledger queries (see period_close.py).
+
+A company-wide as-of balance replays the journal entries after the nearest
+closed month by (company_id, date). The snapshot tables are new and get
+their indexes from create_all.
+"""
+from migrations import create_index
+
+TRANSACTIONAL = False
+
+# (name, table, columns)
+INDEXES = [
+    # period_close.balances_as_of / _close_month: company_id + date range
+    ("ix_journal_entries_company_date", "journal_entries", "company_id, date"),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,66 @@
+"""
+Unique (company_id, name) on accounts (see ledger._account_ids).
+
+The posting engine creates a company's accounts on first use. Two
+transactions posting a company's first documents at once could both insert
+the same account, splitting its entries and balance over two rows. Duplicates
+already in the table are merged into the account with the lowest id: its
+journal entries, balance and period snapshots absorb the others'. Then the
+unique index replaces the plain one from m0004.
+
+This runs in one transaction, and the index is not built CONCURRENTLY. On
+Postgres the table is locked first, so no duplicate can be inserted between
+the merge and the index build. The accounts table holds a few rows per
+company, so the lock is short.
+"""
+from sqlalchemy import delete, func, insert, select, text, update
+
+from sql_models import Account, AccountPeriodBalance, JournalEntry
+
+# (name, table, columns)
+INDEXES = [
+    ("uq_accounts_company_name", "accounts", "company_id, name"),
+]
+
+# Superseded by the unique index
+DROPPED = ["ix_accounts_company_name"]
+
+
+def _merge(conn, keep, duplicates):
+    ids = [keep] + duplicates
+    conn.execute(update(JournalEntry).where(JournalEntry.account_id.in_(duplicates)).values(account_id=keep))
+    balance = conn.execute(select(func.sum(Account.balance)).where(Account.id.in_(ids))).scalar() or 0.0
+    conn.execute(update(Account).where(Account.id == keep).values(balance=balance))
+
+    snapshots = conn.execute(
+        select(AccountPeriodBalance.period, AccountPeriodBalance.company_id, func.sum(AccountPeriodBalance.debit),
+               func.sum(AccountPeriodBalance.credit), func.sum(AccountPeriodBalance.closing_balance))
+        .where(AccountPeriodBalance.account_id.in_(ids))
+        .group_by(AccountPeriodBalance.period, AccountPeriodBalance.company_id)
+    ).all()
+    conn.execute(delete(AccountPeriodBalance).where(AccountPeriodBalance.account_id.in_(ids)))
+    if snapshots:
+        conn.execute(insert(AccountPeriodBalance), [
+            {"account_id": keep, "period": period, "company_id": company_id, "debit": debit, "credit": credit, "closing_balance": closing}
+            for period, company_id, debit, credit, closing in snapshots
+        ])
+    conn.execute(delete(Account).where(Account.id.in_(duplicates)))
+
+
+def upgrade(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("LOCK TABLE accounts IN SHARE ROW EXCLUSIVE MODE"))
+    duplicated = conn.execute(
+        select(Account.company_id, Account.name).where(Account.company_id.is_not(None)).group_by(Account.company_id, Account.name).having(func.count() > 1)
+    ).all()
+    for company_id, name in duplicated:
+        ids = sorted(
+            (row[0] for row in conn.execute(select(Account.id).where(Account.company_id == company_id, Account.name == name))),
+            key=str,
+        )
+        _merge(conn, ids[0], ids[1:])
+
+    for name, table, columns in INDEXES:
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    for name in DROPPED:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1,28 @@
+"""
+Newest-first order for the WhatsApp log list.
+
+crud.get_whatsapp_logs used to page by id alone, which for UUIDs is a random
+order. It now pages by (created_at, id), newest first. Logs from before
+created_at existed have no timestamp and come last. The index keeps the
+user_id [+ company_id] equality columns first, then the keyset, and
+replaces m0001's id-keyed one.
+"""
+from migrations import create_index, drop_index
+
+TRANSACTIONAL = False
+
+# (name, table, columns)
+INDEXES = [
+    # crud.get_whatsapp_logs: user_id [+ company_id], keyset on (created_at, id)
+    ("ix_whatsapp_logs_user_company_created", "whatsapp_logs", "user_id, company_id, created_at, id"),
+]
+
+# Superseded by the index above
+DROPPED = ["ix_whatsapp_logs_user_company_id"]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    for name in DROPPED:
+        drop_index(conn, name)
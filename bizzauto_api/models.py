@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Json, ConfigDict, field_serializer, Field
+from pydantic import BaseModel, Json, ConfigDict, field_serializer, Field, ValidationError
 from typing import Optional, List, Any
 from uuid import UUID
 from datetime import datetime, date
@@ -198,6 +198,19 @@ class JournalEntry(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class TrialBalanceLine(BaseModel):
+    account_id: UUID
+    name: str
+    type: str
+    debit: float = 0
+    credit: float = 0
+
+class TrialBalance(BaseModel):
+    lines: List[TrialBalanceLine]
+    total_debit: float
+    total_credit: float
+    balanced: bool
+
 class ExpenseReport(BaseModel):
     category: str
     sum: float
@@ -228,6 +241,19 @@ class InvoiceUploadResponse(BaseModel):
     items_processed: int
     file_url: str
 
+class InvoiceBatchFileResult(BaseModel):
+    filename: str
+    success: bool
+    invoice_id: Optional[UUID] = None
+    items_processed: int = 0
+    file_url: Optional[str] = None
+    error: Optional[str] = None
+
+class InvoiceBatchUploadResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[InvoiceBatchFileResult]
+
 class ProductResponse(BaseModel):
     id: UUID
     name: str
@@ -254,3 +280,30 @@ class InvoiceDetailResponse(BaseModel):
     items: List[InvoiceItemResponse]
 
     model_config = ConfigDict(from_attributes=True)
+
+class BulkRowError(BaseModel):
+    index: int
+    error: str
+
+class BulkCreateResult(BaseModel):
+    created: int
+    ids: List[UUID]
+    errors: List[BulkRowError]
+
+def validate_bulk_rows(schema, rows: List[dict], **overrides):
+    """
+    Validates each raw row against `schema`, applying `overrides` (e.g. the
+    caller's company_id) first. Returns ([(index, model)], [BulkRowError]) so
+    one bad row does not reject the whole request.
+    """
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append(BulkRowError(index=index, error="Row must be an object"))
+            continue
+        try:
+            valid.append((index, schema.model_validate({**row, **overrides})))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            errors.append(BulkRowError(index=index, error=message))
+    return valid, errors
@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for OCR text and parsed invoices.
+
+Re-uploading the same invoice (a retry after a timeout, or the same
+supplier PDF sent twice) should not cost another Vision call. Entries are
+keyed by a SHA-256 digest:
+
+    text    sha256(file bytes)  -> OCR text (after layout / clean-up)
+    parsed  sha256(OCR text)    -> parse_invoice_text result
+
+Entries also carry TEXT_VERSION or PARSER_VERSION in their key. Bump them
+whenever the text post-processing or the parser's output changes, and old
+results are simply never read again.
+
+OCR_CACHE_BACKEND selects where entries live:
+
+    redis  (default) keys ocr:<kind>:<version>:<digest> with OCR_CACHE_TTL_SECONDS.
+           Best-effort, like the other Redis caches; eviction beyond the
+           TTL is left to the server's maxmemory policy.
+    disk   one JSON file per entry under OCR_CACHE_DIR. The TTL is checked
+           on read, and the directory is kept near OCR_CACHE_MAX_BYTES by
+           evicting least-recently-used files first. App workers can share
+           the directory; each rescans it at least every
+           OCR_CACHE_SCAN_SECONDS to count the others' files.
+    off    no caching.
+
+stats() reports hits, misses and the hit rate per kind since the process
+started. Like the other caches it is best-effort: a store that fails counts
+as a miss.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import ocr_engine
+from redis_client import redis_call
+
+OCR_CACHE_BACKEND = os.getenv("OCR_CACHE_BACKEND", "redis")
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "/tmp/bizzauto_ocr_cache")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+OCR_CACHE_SCAN_SECONDS = int(os.getenv("OCR_CACHE_SCAN_SECONDS", "60"))
+
+PARSER_VERSION = "1"
+# Bump when the OCR text post-processing changes; layout and flat text never share entries
+TEXT_VERSION = ("layout" if ocr_engine.OCR_LAYOUT_ENABLED else "flat") + "-1"
+
+TEXT, PARSED = "text", "parsed"
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# does not rescan its directory on every put
+_EVICT_TO = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+def digest(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class RedisStore:
+    def get(self, key):
+        return redis_call(lambda r: r.get(f"ocr:{key}"))
+
+    def put(self, key, value: str):
+        redis_call(lambda r: r.set(f"ocr:{key}", value, ex=OCR_CACHE_TTL_SECONDS))
+
+
+class DiskStore:
+    """
+    JSON files on local disk, size-bounded with LRU eviction.
+
+    Several processes may share the directory. get() adopts files the
+    others wrote since this process last looked. put() counts its own writes
+    and rescans the directory, which includes the others' files, once that
+    estimate would pass max_bytes or scan_seconds after the last scan. It
+    then evicts down to _EVICT_TO of max_bytes. Recency is the file mtime,
+    which get() touches.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int, scan_seconds: int = OCR_CACHE_SCAN_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.scan_seconds = scan_seconds
+        self._lock = threading.Lock()
+        self._index = None  # OrderedDict filename -> size, least recently used first
+        self._size = 0
+        self._scanned_at = 0.0
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key.replace(":", "_") + ".json")
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # mtimes come from a coarse clock; within one tick this process's own order decides
+        known = {path: rank for rank, path in enumerate(self._index or ())}
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process meanwhile
+                entries.append((stat.st_mtime_ns, known.get(entry.path, -1), entry.path, stat.st_size))
+        self._index = OrderedDict((path, size) for _, _, path, size in sorted(entries))
+        self._size = sum(self._index.values())
+        self._scanned_at = time.monotonic()
+
+    def _load_index(self):
+        if self._index is None:
+            self._scan()
+
+    def _forget(self, path):
+        self._size -= self._index.pop(path, 0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            try:
+                with open(path) as f:
+                    data = f.read()
+                entry = json.loads(data)
+            except FileNotFoundError:
+                # Never written, or evicted by another process
+                self._size -= self._index.pop(path, 0)
+                return None
+            except (OSError, ValueError):
+                self._forget(path)
+                return None
+            if time.time() - entry["stored_at"] > self.ttl_seconds:
+                self._forget(path)
+                return None
+            try:
+                os.utime(path)  # keeps LRU order across processes and restarts
+            except FileNotFoundError:
+                # Evicted by another process since the read
+                self._size -= self._index.pop(path, 0)
+                return None
+            # Adopts files another process wrote since the last scan
+            self._size += len(data) - self._index.pop(path, 0)
+            self._index[path] = len(data)
+            return entry["value"]
+
+    def put(self, key, value: str):
+        path = self._path(key)
+        data = json.dumps({"stored_at": time.time(), "value": value})
+        with self._lock:
+            self._load_index()
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._size += len(data) - self._index.pop(path, 0)
+            self._index[path] = len(data)
+            if self._size <= self.max_bytes and time.monotonic() - self._scanned_at < self.scan_seconds:
+                return
+            # The other processes' files count towards max_bytes too
+            self._scan()
+            if self._size > self.max_bytes:
+                while self._size > self.max_bytes * _EVICT_TO and len(self._index) > 1:
+                    self._forget(next(iter(self._index)))
+
+
+class OcrCache:
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._counts = {TEXT: [0, 0], PARSED: [0, 0]}  # kind -> [hits, misses]
+
+    def _count(self, kind: str, hit: bool):
+        with self._lock:
+            self._counts[kind][0 if hit else 1] += 1
+
+    def _get(self, kind: str, key: str):
+        if self.store is None:
+            return None
+        try:
+            raw = self.store.get(key)
+        except OSError as e:
+            logger.warning(f"OCR cache read failed: {e}")
+            raw = None
+        self._count(kind, raw is not None)
+        return None if raw is None else json.loads(raw)
+
+    def _put(self, key: str, value):
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, json.dumps(value))
+        except OSError as e:
+            logger.warning(f"OCR cache write failed: {e}")
+
+    def get_text(self, file_content: bytes):
+        return self._get(TEXT, f"text:{TEXT_VERSION}:{digest(file_content)}")
+
+    def put_text(self, file_content: bytes, text: str):
+        self._put(f"text:{TEXT_VERSION}:{digest(file_content)}", text)
+
+    def get_parsed(self, text: str):
+        return self._get(PARSED, f"parsed:{PARSER_VERSION}:{digest(text)}")
+
+    def put_parsed(self, text: str, parsed: dict):
+        self._put(f"parsed:{PARSER_VERSION}:{digest(text)}", parsed)
+
+    def stats(self) -> dict:
+        """{kind: {"hits", "misses", "hit_rate"}} since the process started."""
+        with self._lock:
+            return {
+                kind: {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None}
+                for kind, (hits, misses) in self._counts.items()
+            }
+
+
+def _default_store():
+    if OCR_CACHE_BACKEND == "disk":
+        return DiskStore(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, OCR_CACHE_TTL_SECONDS)
+    if OCR_CACHE_BACKEND == "redis":
+        return RedisStore()
+    return None
+
+
+_cache = OcrCache(_default_store())
+
+
+def get_cache() -> OcrCache:
+    return _cache
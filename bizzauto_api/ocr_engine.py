@@ -0,0 +1,223 @@
+"""
+Shared Google Cloud Vision OCR engine.
+
+One ImageAnnotatorClient per process, created on first use under a lock and
+reused by every request and worker thread (the client is thread-safe).
+Credentials come from GOOGLE_APPLICATION_CREDENTIALS as usual, or directly
+from GOOGLE_APPLICATION_CREDENTIALS_JSON without writing a temp file or
+touching os.environ.
+
+Each image costs one Vision call. A DOCUMENT_TEXT_DETECTION response also
+carries the plain text_annotations, so when the document layout comes back
+empty the text is read from the same response instead of paying for a second
+TEXT_DETECTION call. The feature is chosen per call (OCR_DETECTION_FEATURE by
+default): "document" for dense invoices and reports, "text" for photos.
+With OCR_LAYOUT_ENABLED (the default) the text is rebuilt row by row from
+the word bounding boxes by ocr_layout, so table rows come out whole.
+
+detect_texts() sends several images per batch_annotate_images request (up to
+VISION_BATCH_SIZE, the API limit of 16) for multi-file uploads.
+detect_pdf_pages() reads PDFs through batch_annotate_files, five pages per
+request (the API limit), with the requests running concurrently.
+
+Every call is timed; get_engine().timings() returns count / total / max
+seconds per feature ("<feature>_batch" for image batches, "<feature>_pdf"
+for PDF requests), and each call is logged at INFO.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from google.cloud import vision
+
+import ocr_layout
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT, TEXT = "document", "text"
+OCR_DETECTION_FEATURE = os.getenv("OCR_DETECTION_FEATURE", DOCUMENT)
+OCR_LAYOUT_ENABLED = os.getenv("OCR_LAYOUT_ENABLED", "true").lower() == "true"
+# batch_annotate_images accepts at most 16 images per request
+VISION_BATCH_SIZE = min(int(os.getenv("VISION_BATCH_SIZE", "16")), 16)
+
+# batch_annotate_files reads at most 5 pages of a PDF per request
+VISION_PDF_PAGES_PER_REQUEST = 5
+
+FEATURE_TYPES = {
+    DOCUMENT: vision.Feature.Type.DOCUMENT_TEXT_DETECTION,
+    TEXT: vision.Feature.Type.TEXT_DETECTION,
+}
+
+
+class OcrError(Exception):
+    """Vision returned an error for the image."""
+
+
+def _build_client():
+    credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    if credentials_json and not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        from google.oauth2 import service_account
+
+        info = json.loads(credentials_json)
+        info["private_key"] = info["private_key"].replace("\\n", "\n")
+        credentials = service_account.Credentials.from_service_account_info(info)
+        logger.info("Google Vision API client initialized with JSON credentials.")
+        return vision.ImageAnnotatorClient(credentials=credentials)
+    logger.info("Google Vision API client initialized with default credentials.")
+    return vision.ImageAnnotatorClient()
+
+
+def vision_image(content: bytes = None, uri: str = None) -> vision.Image:
+    """A Vision image from raw bytes or a gs:// / https URI."""
+    if uri:
+        return vision.Image(source=vision.ImageSource(image_uri=uri))
+    return vision.Image(content=content)
+
+
+def response_text(response) -> str:
+    """
+    Full text of an annotate response: rebuilt row by row from the word
+    boxes (ocr_layout) when OCR_LAYOUT_ENABLED, else the document text, else
+    the first text annotation.
+    """
+    if response.error.message:
+        raise OcrError(f"Google Vision API error: {response.error.message}")
+    if OCR_LAYOUT_ENABLED:
+        text = ocr_layout.layout_text(response)
+        if text:
+            return text
+    if response.full_text_annotation and response.full_text_annotation.text:
+        return response.full_text_annotation.text
+    if response.text_annotations:
+        return response.text_annotations[0].description
+    return ""
+
+
+class OcrEngine:
+    def __init__(self, client_factory=_build_client):
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def record(self, feature: str, seconds: float):
+        with self._lock:
+            count, total, longest = self._timings.get(feature, (0, 0.0, 0.0))
+            self._timings[feature] = (count + 1, total + seconds, max(longest, seconds))
+        logger.info(f"OCR {feature} call took {seconds:.3f}s")
+
+    def timings(self) -> dict:
+        """{feature: {"count", "total_seconds", "max_seconds"}} since the process started."""
+        with self._lock:
+            return {
+                feature: {"count": count, "total_seconds": round(total, 3), "max_seconds": round(longest, 3)}
+                for feature, (count, total, longest) in self._timings.items()
+            }
+
+    def detect_text(self, content: bytes = None, uri: str = None, feature: Optional[str] = None) -> str:
+        """
+        Text of one image, from a single Vision call. Raises OcrError on an
+        API-reported error; credential and transport errors propagate as-is.
+        """
+        feature = feature or OCR_DETECTION_FEATURE
+        image = vision_image(content, uri)
+        client = self.client
+        started = time.perf_counter()
+        try:
+            if feature == TEXT:
+                response = client.text_detection(image=image)
+            else:
+                response = client.document_text_detection(image=image)
+        finally:
+            self.record(feature, time.perf_counter() - started)
+        return response_text(response)
+
+    def detect_texts(self, contents: list, feature: Optional[str] = None) -> list:
+        """
+        Texts of several images, VISION_BATCH_SIZE images per
+        batch_annotate_images call. Each item is the image's text, or the
+        OcrError Vision reported for that image.
+        """
+        feature = feature or OCR_DETECTION_FEATURE
+        features = [vision.Feature(type_=FEATURE_TYPES.get(feature, FEATURE_TYPES[DOCUMENT]))]
+        client = self.client
+        results = []
+        for start in range(0, len(contents), VISION_BATCH_SIZE):
+            requests = [
+                vision.AnnotateImageRequest(image=vision_image(content), features=features)
+                for content in contents[start:start + VISION_BATCH_SIZE]
+            ]
+            started = time.perf_counter()
+            try:
+                response = client.batch_annotate_images(requests=requests)
+            finally:
+                self.record(f"{feature}_batch", time.perf_counter() - started)
+            for image_response in response.responses:
+                try:
+                    results.append(response_text(image_response))
+                except OcrError as e:
+                    results.append(e)
+        return results
+
+    def _pdf_pages(self, content: bytes, pages: list, feature: str):
+        """(page texts in the order of `pages`, total pages in the PDF) from one batch_annotate_files call."""
+        request = vision.AnnotateFileRequest(
+            input_config=vision.InputConfig(content=content, mime_type="application/pdf"),
+            features=[vision.Feature(type_=FEATURE_TYPES.get(feature, FEATURE_TYPES[DOCUMENT]))],
+            pages=pages,
+        )
+        client = self.client
+        started = time.perf_counter()
+        try:
+            response = client.batch_annotate_files(requests=[request])
+        finally:
+            self.record(f"{feature}_pdf", time.perf_counter() - started)
+        file_response = response.responses[0]
+        if file_response.error.message:
+            raise OcrError(f"Google Vision API error: {file_response.error.message}")
+        return [response_text(page) for page in file_response.responses], file_response.total_pages
+
+    def detect_pdf_pages(self, content: bytes, page_count: Optional[int] = None, executor=None, feature: Optional[str] = None) -> list:
+        """
+        Text of every page of a PDF, in page order. Pages go to Vision in
+        groups of VISION_PDF_PAGES_PER_REQUEST, run concurrently on
+        `executor` when one is given. If page_count is unknown, the pages
+        Vision reads by default come first, alone, to learn total_pages.
+        """
+        feature = feature or OCR_DETECTION_FEATURE
+        size = VISION_PDF_PAGES_PER_REQUEST
+
+        def groups(first: int, last: int) -> list:
+            return [list(range(start, min(start + size, last + 1))) for start in range(first, last + 1, size)]
+
+        texts = []
+        first = 1
+        if page_count is None:
+            texts, page_count = self._pdf_pages(content, [], feature)
+            first = len(texts) + 1
+        rest = groups(first, page_count)
+
+        def read(pages: list) -> list:
+            return self._pdf_pages(content, pages, feature)[0]
+
+        for group_texts in (executor.map(read, rest) if executor else map(read, rest)):
+            texts += group_texts
+        return texts
+
+
+_engine = OcrEngine()
+
+
+def get_engine() -> OcrEngine:
+    return _engine
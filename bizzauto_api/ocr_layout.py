@@ -0,0 +1,167 @@
+"""
+Table layout from Vision word bounding boxes.
+
+Vision's plain text follows its own block order. On invoices and stock
+reports that order often splits one table row into several lines, or runs
+two columns together, and guessing the rows back from the flattened text
+(improve_ocr_text_structure) is slow and unreliable. The word coordinates
+in full_text_annotation already say where everything is. This module
+rebuilds the rows and cells from them in linear time, after the sorts:
+
+    skew     Turn the page so its text runs horizontally, by the summed
+             direction of the words' top edges. On a 1500px page, a 1
+             degree tilt moves a row by most of a line from one side to
+             the other.
+    rows     Sweep the words left to right. Each word joins the row whose
+             last word lies to its left and overlaps it vertically by at
+             least ROW_OVERLAP of the shorter height. Otherwise it starts a
+             new row. Rows follow their words rather than a fixed band, so
+             the curve left on a warped scan does not split them. The last
+             words are hashed by vertical centre, so each word only looks
+             at the rows within reach of it.
+    cells    Within a row, sort words by left edge. A new cell starts
+             wherever the horizontal gap exceeds CELL_GAP x the median
+             character width (an ordinary space is about one).
+
+layout_text() renders the rows one per line, cells separated by two
+spaces. Those lines are what parse_invoice_text and parse_inventory_format
+read.
+"""
+import math
+import os
+
+import numpy as np
+
+ROW_OVERLAP = float(os.getenv("OCR_LAYOUT_ROW_OVERLAP", "0.5"))
+CELL_GAP = float(os.getenv("OCR_LAYOUT_CELL_GAP", "2.0"))
+CELL_SEPARATOR = "  "
+
+
+def _boxes(quads: list) -> np.ndarray:
+    """
+    (n, 4) boxes x0, x1, y0, y1 of word quadrilaterals, turned so the
+    page's text runs horizontally. Vision lists a word's vertices clockwise
+    from its top-left in reading direction, so the sum of the top edges
+    gives the page's skew.
+    """
+    quads = np.asarray(quads, dtype=float).reshape(-1, 4, 2)
+    top = (quads[:, 1] - quads[:, 0]).sum(axis=0)
+    angle = np.arctan2(top[1], top[0])
+    cos, sin = np.cos(angle), np.sin(angle)
+    x = quads[..., 0] * cos + quads[..., 1] * sin
+    y = quads[..., 1] * cos - quads[..., 0] * sin
+    return np.stack([x.min(axis=1), x.max(axis=1), y.min(axis=1), y.max(axis=1)], axis=1)
+
+
+def page_words(annotation) -> list:
+    """[(boxes, texts)] per page of a full_text_annotation; boxes is (n, 4): x0, x1, y0, y1."""
+    pages = []
+    for page in annotation.pages:
+        quads, texts = [], []
+        for block in page.blocks:
+            for paragraph in block.paragraphs:
+                for word in paragraph.words:
+                    poly = word.bounding_box
+                    if poly.normalized_vertices:
+                        # Back to page proportions, so the skew angle is the real one
+                        vertices = [(v.x * (page.width or 1), v.y * (page.height or 1)) for v in poly.normalized_vertices]
+                    else:
+                        vertices = [(v.x, v.y) for v in poly.vertices]
+                    if len(vertices) != 4:
+                        continue
+                    quads.append(vertices)
+                    texts.append("".join(symbol.text for symbol in word.symbols))
+        pages.append((_boxes(quads), texts))
+    return pages
+
+
+def annotation_words(text_annotations) -> tuple:
+    """(boxes, texts) from TEXT_DETECTION's per-word text_annotations (the first one is the full text)."""
+    words = [a for a in list(text_annotations)[1:] if len(a.bounding_poly.vertices) == 4]
+    return _boxes([[(v.x, v.y) for v in a.bounding_poly.vertices] for a in words]), [a.description for a in words]
+
+
+def _row_ids(x0, x1, y0, y1, tolerance: float) -> np.ndarray:
+    """Row id of every word, numbered top to bottom by the row's first word."""
+    heights = y1 - y0
+    bucket_height = max(float(np.median(heights)), 1e-9)
+    tallest = float(heights.max())
+    x0, x1, y0, y1 = x0.tolist(), x1.tolist(), y0.tolist(), y1.tolist()
+    row_of = np.empty(len(x0), dtype=int)
+    tails = []  # (x1, y0, y1, bucket) of the last word in each row so far
+    first_centre = []
+    buckets = {}  # floor(centre / bucket_height) -> rows whose last word is centred there
+    for word in np.argsort(np.asarray(x0), kind="stable").tolist():
+        top, bottom = y0[word], y1[word]
+        centre = (top + bottom) / 2
+        # Overlapping vertically means centres closer than half the two heights
+        reach = (bottom - top + tallest) / 2
+        row, best = None, ROW_OVERLAP
+        for bucket in range(math.floor((centre - reach) / bucket_height), math.floor((centre + reach) / bucket_height) + 1):
+            for candidate in buckets.get(bucket, ()):
+                tail_x1, tail_y0, tail_y1, _ = tails[candidate]
+                if tail_x1 > x0[word] + tolerance:
+                    continue
+                overlap = (min(tail_y1, bottom) - max(tail_y0, top)) / max(min(tail_y1 - tail_y0, bottom - top), 1e-9)
+                if overlap > best or (overlap == best and (row is None or candidate < row)):
+                    row, best = candidate, overlap
+        if row is None:
+            row = len(tails)
+            tails.append(None)
+            first_centre.append(centre)
+        else:
+            buckets[tails[row][3]].discard(row)
+        bucket = math.floor(centre / bucket_height)
+        buckets.setdefault(bucket, set()).add(row)
+        tails[row] = (x1[word], top, bottom, bucket)
+        row_of[word] = row
+    rank = np.empty(len(tails), dtype=int)
+    rank[np.argsort(np.asarray(first_centre), kind="stable")] = np.arange(len(tails))
+    return rank[row_of]
+
+
+def layout_rows(boxes: np.ndarray, texts: list) -> list:
+    """Rows of one page, top to bottom: each a list of cell texts, left to right."""
+    if not len(texts):
+        return []
+    x0, x1, y0, y1 = boxes.T
+    lengths = np.fromiter((max(len(t), 1) for t in texts), dtype=float, count=len(texts))
+    char_width = float(np.median(np.maximum(x1 - x0, 1e-9) / lengths))
+
+    # Rows: each word continues the row of its vertically overlapping left neighbour
+    row_of = _row_ids(x0, x1, y0, y1, char_width)
+
+    # Cells: words in reading order, split where the gap to the previous word is wide
+    order = np.lexsort((x0, row_of))
+    rows_sorted = row_of[order]
+    gaps = x0[order][1:] - x1[order][:-1]
+    new_row = np.concatenate(([True], rows_sorted[1:] != rows_sorted[:-1]))
+    new_cell = new_row | np.concatenate(([False], gaps > CELL_GAP * char_width))
+
+    rows = []
+    for word, starts_row, starts_cell in zip(order.tolist(), new_row.tolist(), new_cell.tolist()):
+        if starts_row:
+            rows.append([])
+        if starts_cell:
+            rows[-1].append([])
+        rows[-1][-1].append(texts[word])
+    return [[" ".join(cell) for cell in row] for row in rows]
+
+
+def response_rows(response) -> list:
+    """Rows of every page of an annotate response, or [] when it has no word boxes."""
+    annotation = response.full_text_annotation
+    if annotation and annotation.pages:
+        return [row for boxes, texts in page_words(annotation) for row in layout_rows(boxes, texts)]
+    if len(response.text_annotations) > 1:
+        return layout_rows(*annotation_words(response.text_annotations))
+    return []
+
+
+def rows_text(rows: list) -> str:
+    return "\n".join(CELL_SEPARATOR.join(row) for row in rows)
+
+
+def layout_text(response) -> str:
+    """The response's text rebuilt row by row, or "" when it has no word boxes."""
+    return rows_text(response_rows(response))
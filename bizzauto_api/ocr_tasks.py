@@ -1,7 +1,8 @@
 import re
 import logging
 from typing import Dict, Any, List
-from google.cloud import vision
+
+import ocr_engine
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -93,13 +94,14 @@ def _parse_invoice_text(text: str) -> Dict[str, Any]:
     return parsed_data
 
 
-def process_invoice_image_gcp(image_data: bytes) -> Dict[str, Any]:
+def process_invoice_image_gcp(image_data: bytes = None, image_uri: str = None) -> Dict[str, Any]:
     """
-    Processes an invoice image/PDF from bytes using Google Cloud Vision API, 
-    extracts text, parses it, and returns structured data.
+    Processes an invoice image/PDF using Google Cloud Vision API (through the
+    shared OCR engine), extracts text, parses it, and returns structured data.
 
     Args:
         image_data: The invoice file content as bytes.
+        image_uri: Or a gs:// URI of an uploaded invoice (the OCR queue).
 
     Returns:
         A dictionary containing the parsed invoice data.
@@ -108,25 +110,12 @@ def process_invoice_image_gcp(image_data: bytes) -> Dict[str, Any]:
         Exception: If the Google Cloud Vision API call fails.
     """
     try:
-        # Initialize the client. Assumes GOOGLE_APPLICATION_CREDENTIALS is set in the environment.
-        client = vision.ImageAnnotatorClient()
-        
-        # Create an image object from the byte data
-        image = vision.Image(content=image_data)
+        # Photos from WhatsApp and the upload queue: plain text detection, one call
+        full_text = ocr_engine.get_engine().detect_text(image_data, uri=image_uri, feature=ocr_engine.TEXT)
 
-        # Perform text detection
-        response = client.text_detection(image=image)
-        
-        # Handle API errors
-        if response.error.message:
-            logger.error(f"Google Vision API error: {response.error.message}")
-            raise Exception(f"Google Vision API error: {response.error.message}")
-        
-        if response.text_annotations:
-            # The first annotation contains the full detected text
-            full_text = response.text_annotations[0].description
+        if full_text:
             logger.info("Successfully extracted text from image.")
-            
+
             # Parse the extracted text
             parsed_data = _parse_invoice_text(full_text)
             return parsed_data
@@ -134,7 +123,7 @@ def process_invoice_image_gcp(image_data: bytes) -> Dict[str, Any]:
             logger.warning("No text found in the image by Google Vision API.")
             # Return empty structure if no text is found
             return {"invoice_date": None, "total_amount": 0.0, "items": []}
-            
+
     except Exception as e:
         logger.error(f"An error occurred during OCR processing: {e}")
         # Re-raise the exception to be handled by the caller
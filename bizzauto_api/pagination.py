@@ -0,0 +1,136 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, so deep pages get linearly slower as a tenant grows. A keyset
+instead remembers the sort key of the last row returned and asks for rows that
+sort after it, which an index on the key answers directly.
+
+Cursors are opaque to clients: a URL-safe base64 JSON list of the last row's
+key values. List endpoints accept ?cursor= and return the cursor for the next
+page in the X-Next-Cursor response header (absent on the last page), so the
+response bodies and the legacy ?skip=&limit= parameters are unchanged.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import and_, or_, tuple_
+
+from sql_models import Company, Client, Expense, Invoice, JournalEntry, Lead, Product, User, WhatsappLog
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a ?cursor= value was not produced by this API."""
+
+
+def _dump(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _load(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is UUID:
+        return UUID(value)
+    return python_type(value)
+
+
+class Keyset:
+    """
+    A stable sort key for a list query: one or more columns ending in a unique
+    one (normally the primary key). Only the leading column may be nullable;
+    NULLs sort after every non-NULL value on all backends.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def _order_by(self):
+        lead = self.columns[0]
+        ordering = [lead.is_(None)] if lead.nullable else []
+        ordering += [c.desc() if self.descending else c.asc() for c in self.columns]
+        return ordering
+
+    def _after(self, values):
+        """Filter matching the rows that sort after the given key values."""
+        def beyond(columns, bounds):
+            if len(columns) == 1:
+                return columns[0] < bounds[0] if self.descending else columns[0] > bounds[0]
+            left, right = tuple_(*columns), tuple_(*bounds)
+            return left < right if self.descending else left > right
+
+        lead = self.columns[0]
+        if values[0] is None:
+            # Already in the trailing NULL group: page on the remaining columns
+            return and_(lead.is_(None), beyond(self.columns[1:], values[1:]))
+        condition = beyond(self.columns, values)
+        if lead.nullable:
+            condition = or_(condition, lead.is_(None))
+        return condition
+
+    def encode(self, row) -> str:
+        values = [_dump(getattr(row, column.key)) for column in self.columns]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode(self, cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise InvalidCursor(cursor)
+            return [_load(column, value) for column, value in zip(self.columns, values)]
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise InvalidCursor(cursor) from e
+
+    def paginate(self, query, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        """
+        Orders the query by the key and applies the page window. A cursor takes
+        precedence over skip.
+        """
+        query = query.order_by(*self._order_by())
+        if cursor:
+            query = query.filter(self._after(self.decode(cursor)))
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit)
+
+    def next_cursor(self, rows, limit: int) -> Optional[str]:
+        """Cursor for the page after `rows`, or None when this was the last page."""
+        if not rows or len(rows) < limit:
+            return None
+        return self.encode(rows[-1])
+
+
+def set_next_cursor(response, keyset: Keyset, rows, limit: int):
+    cursor = keyset.next_cursor(rows, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return rows
+
+
+# Newest first for dated records; UUID primary keys for the rest, which gives
+# a stable (if arbitrary) order.
+INVOICE_KEYSET = Keyset(Invoice.invoice_date, Invoice.id, descending=True)
+EXPENSE_KEYSET = Keyset(Expense.expense_date, Expense.id, descending=True)
+USER_KEYSET = Keyset(User.created_at, User.id, descending=True)
+PRODUCT_KEYSET = Keyset(Product.id)
+CLIENT_KEYSET = Keyset(Client.id)
+LEAD_KEYSET = Keyset(Lead.id)
+WHATSAPP_LOG_KEYSET = Keyset(WhatsappLog.created_at, WhatsappLog.id, descending=True)
+COMPANY_KEYSET = Keyset(Company.id)
+JOURNAL_ENTRY_KEYSET = Keyset(JournalEntry.date, JournalEntry.id)
@@ -0,0 +1,178 @@
+"""
+Monthly period close for the general ledger (see ledger.py).
+
+Closing a month writes one account_period_balances row per account: the
+month's debit/credit movement and the closing balance (on the account's
+normal side), carried forward from the previous month's snapshot. A balance
+"as of" any date then starts from the nearest snapshot at or before it and
+replays only the journal entries after that month, instead of every entry
+since the beginning.
+
+Closed months always form a contiguous run from the company's first month:
+close_through() closes every open month up to the one given, and reopen()
+reopens a month together with every later one, deleting their snapshots.
+Closing again rebuilds them from the journal. While a month is closed the
+posting engine dates new entries that fall in it on the first day after the
+last closed month (ledger.write_postings), so snapshots never go stale.
+Closing, reopening and posting all take the company's ledger lock
+(ledger.lock_ledgers) for their transaction, so an entry is never dated
+against a close that is still being written.
+
+The worker closes the previous month for every company once
+LEDGER_CLOSE_GRACE_DAYS of the new month have passed.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from ledger import DEBIT_NORMAL, lock_ledgers, month_start, next_month
+from sql_models import Account, AccountPeriodBalance, ClosedPeriod, JournalEntry
+
+LEDGER_CLOSE_GRACE_DAYS = int(os.getenv("LEDGER_CLOSE_GRACE_DAYS", "5"))
+
+
+def _signed(account_type: str, debit: float, credit: float) -> float:
+    return debit - credit if account_type in DEBIT_NORMAL else credit - debit
+
+
+def last_closed(connection, company_id):
+    """First day of the latest closed month, or None."""
+    return connection.execute(select(func.max(ClosedPeriod.period)).where(ClosedPeriod.company_id == company_id)).scalar()
+
+
+def _close_month(connection, company_id, period: date, opening: dict):
+    """Writes the snapshot rows for one month; returns {account_id: closing balance}."""
+    accounts = connection.execute(select(Account.id, Account.type).where(Account.company_id == company_id)).all()
+    movement = {
+        account_id: (debit or 0.0, credit or 0.0)
+        for account_id, debit, credit in connection.execute(
+            select(JournalEntry.account_id, func.sum(JournalEntry.debit), func.sum(JournalEntry.credit))
+            .where(JournalEntry.company_id == company_id, JournalEntry.date >= period, JournalEntry.date < next_month(period))
+            .group_by(JournalEntry.account_id)
+        )
+    }
+    closing, rows = {}, []
+    for account_id, account_type in accounts:
+        debit, credit = movement.get(account_id, (0.0, 0.0))
+        closing[account_id] = opening.get(account_id, 0.0) + _signed(account_type, debit, credit)
+        rows.append({"account_id": account_id, "period": period, "company_id": company_id, "debit": debit, "credit": credit, "closing_balance": closing[account_id]})
+    if rows:
+        connection.execute(insert(AccountPeriodBalance), rows)
+    connection.execute(insert(ClosedPeriod), [{"company_id": company_id, "period": period, "closed_at": datetime.utcnow()}])
+    return closing
+
+
+def close_through(connection, company_id, through: date) -> list:
+    """
+    Closes every open month of the company up to and including the month of
+    `through`, oldest first. Returns the periods closed.
+    """
+    through = month_start(through)
+    lock_ledgers(connection, [company_id])
+    previous = last_closed(connection, company_id)
+    if previous:
+        period = next_month(previous)
+        opening = dict(connection.execute(
+            select(AccountPeriodBalance.account_id, AccountPeriodBalance.closing_balance)
+            .where(AccountPeriodBalance.company_id == company_id, AccountPeriodBalance.period == previous)
+        ).all())
+    else:
+        first_entry = connection.execute(select(func.min(JournalEntry.date)).where(JournalEntry.company_id == company_id)).scalar()
+        period = month_start(first_entry) if first_entry else through
+        opening = {}
+
+    closed = []
+    while period <= through:
+        opening = _close_month(connection, company_id, period, opening)
+        closed.append(period)
+        period = next_month(period)
+    return closed
+
+
+def reopen(connection, company_id, period: date) -> list:
+    """
+    Reopens the month of `period` and every later closed month, deleting
+    their snapshots. Returns the periods reopened.
+
+    The later months are dropped rather than re-closed: closed months stay
+    a contiguous run, and postings are dated after the last closed month,
+    so the reopened month can only take entries once every later close is
+    gone. close_through() rebuilds the snapshots from the journal, which
+    includes any corrections. The worker calls it for every month before
+    the current one once the grace days have passed.
+    """
+    period = month_start(period)
+    lock_ledgers(connection, [company_id])
+    reopened = [row[0] for row in connection.execute(
+        select(ClosedPeriod.period).where(ClosedPeriod.company_id == company_id, ClosedPeriod.period >= period).order_by(ClosedPeriod.period)
+    )]
+    connection.execute(delete(AccountPeriodBalance).where(AccountPeriodBalance.company_id == company_id, AccountPeriodBalance.period >= period))
+    connection.execute(delete(ClosedPeriod).where(ClosedPeriod.company_id == company_id, ClosedPeriod.period >= period))
+    return reopened
+
+
+def balances_as_of(connection, company_id, as_of: date, account_id=None) -> dict:
+    """
+    {account_id: balance at the end of `as_of`} for the company's accounts
+    (or one account): the latest snapshot of a month ending on or before
+    `as_of`, plus the journal entries after it.
+    """
+    # Latest closed month that ends on or before as_of
+    snapshot_period = connection.execute(
+        select(func.max(ClosedPeriod.period))
+        .where(ClosedPeriod.company_id == company_id, ClosedPeriod.period < month_start(as_of + timedelta(days=1)))
+    ).scalar()
+
+    account_filter = [Account.id == account_id] if account_id else []
+    accounts = connection.execute(select(Account.id, Account.type).where(Account.company_id == company_id, *account_filter)).all()
+    balances = {aid: 0.0 for aid, _ in accounts}
+    tail = [JournalEntry.company_id == company_id, JournalEntry.date <= as_of]
+    if account_id:
+        tail.append(JournalEntry.account_id == account_id)
+    if snapshot_period:
+        snapshot_filter = [AccountPeriodBalance.account_id == account_id] if account_id else []
+        balances.update(connection.execute(
+            select(AccountPeriodBalance.account_id, AccountPeriodBalance.closing_balance)
+            .where(AccountPeriodBalance.company_id == company_id, AccountPeriodBalance.period == snapshot_period, *snapshot_filter)
+        ).all())
+        tail.append(JournalEntry.date >= next_month(snapshot_period))
+
+    types = dict(accounts)
+    for aid, debit, credit in connection.execute(
+        select(JournalEntry.account_id, func.sum(JournalEntry.debit), func.sum(JournalEntry.credit)).where(*tail).group_by(JournalEntry.account_id)
+    ):
+        if aid in types:
+            balances[aid] = balances.get(aid, 0.0) + _signed(types[aid], debit or 0.0, credit or 0.0)
+    return balances
+
+
+def due_period(today: date):
+    """
+    The month the worker closes on `today`: the previous month once
+    LEDGER_CLOSE_GRACE_DAYS of the current month have passed, else None.
+    """
+    if today.day <= LEDGER_CLOSE_GRACE_DAYS:
+        return None
+    return month_start(month_start(today) - timedelta(days=1))
+
+
+def ledger_companies(connection) -> list:
+    """Ids of the companies with journal entries."""
+    return [row[0] for row in connection.execute(select(JournalEntry.company_id).where(JournalEntry.company_id.is_not(None)).distinct())]
+
+
+def close_due_periods(connection, today: date) -> dict:
+    """
+    Closes the due_period() of every company with journal entries, in the
+    caller's transaction. Returns {company_id: [periods closed]}.
+    """
+    through = due_period(today)
+    if through is None:
+        return {}
+    closed = {}
+    for company_id in ledger_companies(connection):
+        periods = close_through(connection, company_id, through)
+        if periods:
+            closed[company_id] = periods
+    return closed
@@ -1,5 +1,6 @@
 import redis
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,4 +21,25 @@ def get_redis_client():
     finally:
         # Connection pool handles closing automatically usually, 
         # but explicit close can be done here if needed
-        pass 
\ No newline at end of file
+        pass 
+
+# --- Optional-Redis helper ---
+# Caches and counters treat Redis as best-effort: when it is unreachable we
+# skip it for REDIS_RETRY_SECONDS instead of paying a connect timeout per call.
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))
+_redis_unavailable_until = 0.0
+
+def redis_call(operation, default=None):
+    """
+    Runs operation(redis_client) and returns its result.
+    Returns `default` if Redis is unreachable or currently backed off.
+    """
+    global _redis_unavailable_until
+    if time.monotonic() < _redis_unavailable_until:
+        return default
+    try:
+        return operation(redis_client)
+    except redis.exceptions.RedisError as e:
+        _redis_unavailable_until = time.monotonic() + REDIS_RETRY_SECONDS
+        print(f"[WARN] Redis unavailable, retrying in {REDIS_RETRY_SECONDS:.0f}s: {e}")
+        return default
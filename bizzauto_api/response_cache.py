@@ -0,0 +1,125 @@
+"""
+Redis cache for the summary endpoints every logged-in user and UI poll hits
+(/dashboard/summary, /api/accounting/expense_report,
+/api/inventory/stock-summary).
+
+Entries are grouped per company (per user for users without a company) in one
+Redis hash, keyed inside it by endpoint, user and parameters, so dropping a
+company's cached responses is a single DEL. A Session hook collects the
+companies touched by every flush of an invoice, product, client, expense or
+WhatsApp log and drops their hashes once the transaction commits;
+crud.bulk_insert reports its Core inserts through mark_written(). Writes that
+bypass SQLAlchemy are only picked up when RESPONSE_CACHE_TTL_SECONDS runs out.
+
+A response computed while a write commits can be stored just after the
+invalidation; it lives until the next write or the TTL, which is why the TTL
+stays short. Like the auth cache, Redis is best-effort: when it is down every
+request is computed from the database.
+"""
+import json
+import os
+from datetime import date, datetime
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from redis_client import redis_call
+from sql_models import Client, Expense, Invoice, Product, WhatsappLog
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+
+# Models whose writes change a cached response
+TRACKED_MODELS = (Invoice, Product, Client, Expense, WhatsappLog)
+
+_PENDING_KEY = "response_cache_scopes"
+
+
+def scope_for(company_id=None, user_id=None) -> str:
+    return f"company:{company_id}" if company_id else f"user:{user_id}"
+
+
+def _redis_key(scope: str) -> str:
+    return f"cache:{scope}"
+
+
+def _field(name: str, user_id, params: dict) -> str:
+    return f"{name}:{user_id}:{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+
+def _default(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def get(user, name: str, params: dict = None):
+    """The cached response for this user, endpoint and parameters, or None."""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    key, field = _redis_key(scope_for(user.company_id, user.id)), _field(name, user.id, params)
+    raw = redis_call(lambda r: r.hget(key, field))
+    return json.loads(raw) if raw else None
+
+
+def put(user, name: str, value, params: dict = None):
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    key, field = _redis_key(scope_for(user.company_id, user.id)), _field(name, user.id, params)
+    payload = json.dumps(value, default=_default)
+
+    def store(r):
+        pipe = r.pipeline()
+        pipe.hset(key, field, payload)
+        pipe.expire(key, RESPONSE_CACHE_TTL_SECONDS)
+        pipe.execute()
+    redis_call(store)
+
+
+def cached(user, name: str, compute, params: dict = None):
+    """Returns the cached response, or computes, stores and returns it."""
+    value = get(user, name, params)
+    if value is None:
+        value = compute()
+        put(user, name, value, params)
+    return value
+
+
+async def cached_async(user, name: str, compute, params: dict = None):
+    """cached() for async endpoints: `compute` is awaited, Redis calls run off the event loop."""
+    value = await run_in_threadpool(get, user, name, params)
+    if value is None:
+        value = await compute()
+        await run_in_threadpool(put, user, name, value, params)
+    return value
+
+
+def invalidate(*scopes: str):
+    if scopes:
+        redis_call(lambda r: r.delete(*[_redis_key(scope) for scope in scopes]))
+
+
+def mark_written(session: Session, model, rows: list):
+    """Records Core inserts (crud.bulk_insert) so their scopes are dropped on commit."""
+    if model in TRACKED_MODELS:
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        pending.update(scope_for(values.get("company_id"), values.get("user_id")) for values in rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_scopes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            pending.add(scope_for(obj.company_id, obj.user_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # Scopes collected before a rollback are dropped here too: a spurious
+    # invalidation only costs one recomputation.
+    invalidate(*session.info.pop(_PENDING_KEY, ()))
@@ -1,34 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
+import calendar
+from datetime import date, datetime, time
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict, Any
+from sqlalchemy import extract, func, select
+from typing import List, Dict, Any, Optional
 from uuid import UUID
 
-from database import get_db
+from database import get_db, get_read_db, get_pool_stats, async_engine, replica_engine, replica_health
 from dependencies import get_current_admin
+from auth_cache import invalidate_user
+import ocr_cache
+import ocr_engine
+import whatsapp_counters
+from pagination import COMPANY_KEYSET, INVOICE_KEYSET, USER_KEYSET, set_next_cursor
 from models import User as PydanticUser, Company as PydanticCompany
-from sql_models import User, Company, Invoice, WhatsappLog, ScheduledWhatsappMessage, Purchase
+from daily_metrics import INVOICE_PREFIX
+from sql_models import User, Company, Invoice, Purchase, CompanyDailyMetric
 
 router = APIRouter()
 
 # --- Tenant Management ---
 @router.get("/tenants", response_model=List[PydanticCompany])
 def get_all_tenants(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     admin: PydanticUser = Depends(get_current_admin)
 ):
-    return db.query(Company).offset(skip).limit(limit).all()
+    rows = COMPANY_KEYSET.paginate(db.query(Company), skip, limit, cursor).all()
+    return set_next_cursor(response, COMPANY_KEYSET, rows, limit)
 
 @router.get("/users", response_model=List[PydanticUser])
 def get_all_users(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     admin: PydanticUser = Depends(get_current_admin)
 ):
-    return db.query(User).offset(skip).limit(limit).all()
+    rows = USER_KEYSET.paginate(db.query(User), skip, limit, cursor).all()
+    return set_next_cursor(response, USER_KEYSET, rows, limit)
 
 @router.post("/users/{user_id}/suspend")
 def suspend_user(
@@ -41,6 +56,7 @@ def suspend_user(
         raise HTTPException(status_code=404, detail="User not found")
     user.status = "suspended"
     db.commit()
+    invalidate_user(user.id)
     return {"message": f"User {user.email} suspended"}
 
 @router.post("/users/{user_id}/activate")
@@ -54,98 +70,103 @@ def activate_user(
         raise HTTPException(status_code=404, detail="User not found")
     user.status = "active"
     db.commit()
+    invalidate_user(user.id)
     return {"message": f"User {user.email} activated"}
 
 # --- Analytics & Usage ---
+ANALYTICS_MONTHS = 6
+
+def _month_window(today: date, months: int = ANALYTICS_MONTHS):
+    """The last `months` calendar months as [(year, month)], oldest first, ending with today's month."""
+    index = today.year * 12 + today.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - months + 1, index + 1)]
+
+def _monthly(db: Session, date_column, value, *filters, since: date):
+    """{(year, month): value} grouped in SQL over date_column >= since."""
+    year = extract("year", date_column)
+    month = extract("month", date_column)
+    rows = db.query(year, month, value).filter(date_column >= since, *filters).group_by(year, month).all()
+    return {(int(y), int(m)): v for y, m, v in rows}
+
 @router.get("/analytics")
 def get_analytics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: PydanticUser = Depends(get_current_admin)
 ):
-    total_users = db.query(User).count()
-    total_companies = db.query(Company).count()
-    total_revenue = db.query(func.sum(Invoice.total_amount)).scalar() or 0
-    active_users = db.query(User).filter(User.status == 'active').count()
-    
-    # Revenue Trend (Last 6 months)
-    # Generate last 6 months keys in order
-    from datetime import datetime, timedelta
-    revenue_trend = {}
-    current_date = datetime.now()
-    
-    # Initialize with 0 for the last 6 months
-    months_order = []
-    for i in range(5, -1, -1):
-        month_date = current_date - timedelta(days=i*30)
-        month_key = month_date.strftime("%b") # e.g., Jul, Aug
-        revenue_trend[month_key] = 0
-        months_order.append(month_key)
-
-    # Fetch invoices and aggregate
-    # Ideally filter by date in SQL: .filter(Invoice.invoice_date >= six_months_ago)
-    invoices = db.query(Invoice).all()
-    for invoice in invoices:
-        if invoice.invoice_date:
-            month = invoice.invoice_date.strftime("%b")
-            # Only add if it's in our target window (simple check)
-            if month in revenue_trend:
-                revenue_trend[month] += invoice.total_amount
-    
-    # Create list in chronological order
-    revenue_trend_list = [{"name": m, "value": revenue_trend[m]} for m in months_order]
-
-    # User Growth (Last 6 months)
-    users = db.query(User).all()
-    user_growth = {}
-    
-    # Initialize last 6 months with 0
-    from datetime import datetime, timedelta
-    current_date = datetime.now()
-    for i in range(5, -1, -1):
-        month_date = current_date - timedelta(days=i*30)
-        month_name = month_date.strftime("%b")
-        user_growth[month_name] = 0
-
-    for user in users:
-        if user.created_at:
-            month = user.created_at.strftime("%b")
-            if month in user_growth:
-                user_growth[month] += 1
-            
-    user_growth_list = [{"name": m, "value": v} for m, v in user_growth.items()] 
+    is_invoice = CompanyDailyMetric.metric.startswith(INVOICE_PREFIX)
+
+    # Totals in one statement of scalar subqueries. Revenue comes from the
+    # company_daily_metrics rollup, so invoices with no company are not counted.
+    totals = db.query(
+        select(func.count()).select_from(User).scalar_subquery().label("total_users"),
+        select(func.count()).select_from(Company).scalar_subquery().label("total_companies"),
+        select(func.coalesce(func.sum(CompanyDailyMetric.amount), 0)).where(is_invoice).scalar_subquery().label("total_revenue"),
+        select(func.count()).select_from(User).where(User.status == 'active').scalar_subquery().label("active_users"),
+    ).one()
+
+    # Last 6 calendar months, grouped by (year, month) in SQL over an indexed
+    # date range (ix_company_daily_metrics_day_metric, ix_users_created_id)
+    months = _month_window(date.today())
+    window_start = date(*months[0], 1)
+    revenue = _monthly(db, CompanyDailyMetric.day, func.sum(CompanyDailyMetric.amount), is_invoice, since=window_start)
+    signups = _monthly(db, User.created_at, func.count(), since=datetime.combine(window_start, time.min))
+
+    revenue_trend_list = [{"name": calendar.month_abbr[m], "value": revenue.get((y, m), 0)} for y, m in months]
+    user_growth_list = [{"name": calendar.month_abbr[m], "value": signups.get((y, m), 0)} for y, m in months]
 
     return {
-        "total_users": total_users,
-        "total_companies": total_companies,
-        "total_revenue": total_revenue,
-        "active_users": active_users,
+        "total_users": totals.total_users,
+        "total_companies": totals.total_companies,
+        "total_revenue": totals.total_revenue,
+        "active_users": totals.active_users,
         "revenue_trend": revenue_trend_list,
         "user_growth": user_growth_list
     }
 
 @router.get("/whatsapp-stats")
 def get_whatsapp_stats(
-    db: Session = Depends(get_db),
+    company_id: Optional[UUID] = None,
+    db: Session = Depends(get_read_db),
     admin: PydanticUser = Depends(get_current_admin)
 ):
-    total_sent = db.query(WhatsappLog).filter(WhatsappLog.status.in_(['sent', 'delivered', 'read'])).count()
-    total_failed = db.query(WhatsappLog).filter(WhatsappLog.status == 'failed').count()
-    scheduled_pending = db.query(ScheduledWhatsappMessage).filter(ScheduledWhatsappMessage.status == 'pending').count()
-    
-    return {
-        "total_sent": total_sent,
-        "total_failed": total_failed,
-        "scheduled_pending": scheduled_pending
-    }
+    """
+    Sent / failed / scheduled-pending counts, all tenants or one company.
+    Served from the Redis counters in whatsapp_counters; falls back to a
+    single aggregate query when they are not available.
+    """
+    return whatsapp_counters.stats(company_id) or whatsapp_counters.stats_from_db(db, company_id)
+
+# --- Database Diagnostics ---
+@router.get("/db/pool-stats")
+def get_db_pool_stats(admin: PydanticUser = Depends(get_current_admin)):
+    """
+    Live connection pool statistics (checked-out, overflow, checkout wait time)
+    for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW against real traffic.
+    """
+    stats = get_pool_stats()
+    stats["async"] = get_pool_stats(async_engine.sync_engine) if async_engine else {"configured": False}
+    stats["replica"] = {**get_pool_stats(replica_engine), **replica_health.snapshot()} if replica_engine else {"configured": False}
+    return stats
+
+@router.get("/ocr/stats")
+def get_ocr_stats(admin: PydanticUser = Depends(get_current_admin)):
+    """
+    OCR cache hit rates (ocr_cache) and Vision call timings (ocr_engine)
+    for this process since it started.
+    """
+    return {"cache": ocr_cache.get_cache().stats(), "vision": ocr_engine.get_engine().timings()}
 
 # --- Billing (Mock for now as Transaction model not fully defined in prompt, using Invoices as proxy) ---
 @router.get("/billing")
 def get_billing_history(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     admin: PydanticUser = Depends(get_current_admin)
 ):
     # Assuming Invoices represent billing for now, or we can add a Transaction model later
     # Returning recent invoices across all companies
-    return db.query(Invoice).order_by(Invoice.invoice_date.desc()).offset(skip).limit(limit).all()
+    rows = INVOICE_KEYSET.paginate(db.query(Invoice), skip, limit, cursor).all()
+    return set_next_cursor(response, INVOICE_KEYSET, rows, limit)
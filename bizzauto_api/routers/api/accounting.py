@@ -1,43 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 import crud
 import models
 import sql_models
-from database import SessionLocal
+import response_cache
+from exports import export_response
+import period_close
+from ledger import DEBIT_NORMAL, month_start
+from pagination import JOURNAL_ENTRY_KEYSET, set_next_cursor
+from database import get_db, get_read_db, get_read_sessionmaker
 from dependencies import get_current_user
 from sql_models import User
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/sales_summary", response_model=list[models.Invoice])
-def get_sales_summary(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_sales_summary(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     """
     Get a summary of sales for the current user.
     """
     return db.query(sql_models.Invoice).filter(sql_models.Invoice.user_id == user.id).all()
 
+@router.get("/sales_summary/export")
+def export_sales_summary(format: Literal["ndjson", "csv"] = "ndjson", session_factory=Depends(get_read_sessionmaker), user: User = Depends(get_current_user)):
+    """
+    Streams the current user's invoices as NDJSON or CSV, one row per invoice
+    (without items). Unordered, so rows go out as the scan produces them.
+    """
+    Invoice = sql_models.Invoice
+    query = select(
+        Invoice.id, Invoice.company_id, Invoice.client_id, Invoice.invoice_date,
+        Invoice.total_amount, Invoice.payment_status, Invoice.notes,
+    ).where(Invoice.user_id == user.id)
+    return export_response(session_factory, query, format, "sales_summary")
+
 @router.get("/expense_report", response_model=list[models.ExpenseReport])
 def get_expense_report(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     """
     Get a summary of expenses for the current user.
+    Served from response_cache; misses read the primary so a recompute right
+    after a write never caches replica lag.
     """
-    results = db.query(
-        sql_models.Expense.category, 
-        func.sum(sql_models.Expense.amount).label("sum")
-    ).filter(sql_models.Expense.user_id == user.id).group_by(sql_models.Expense.category).all()
-    return [models.ExpenseReport(category=category, sum=sum) for category, sum in results]
+    def compute():
+        results = db.query(
+            sql_models.Expense.category, 
+            func.sum(sql_models.Expense.amount).label("sum")
+        ).filter(sql_models.Expense.user_id == user.id).group_by(sql_models.Expense.category).all()
+        return [{"category": category, "sum": sum} for category, sum in results]
+    return response_cache.cached(user, "expense_report", compute)
 
 @router.get("/stock_report", response_model=list[models.Product])
-def get_stock_report(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_stock_report(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
     """
     Get a summary of stock for the current user.
     """
     return db.query(sql_models.Product).filter(sql_models.Product.user_id == user.id).all()
+
+@router.get("/stock_report/export")
+def export_stock_report(format: Literal["ndjson", "csv"] = "ndjson", session_factory=Depends(get_read_sessionmaker), user: User = Depends(get_current_user)):
+    """Streams the current user's products as NDJSON or CSV."""
+    Product = sql_models.Product
+    query = select(
+        Product.id, Product.company_id, Product.name, Product.sku, Product.category, Product.purchase_price,
+        Product.sale_price, Product.stock_quantity, Product.low_stock_alert, Product.unit,
+    ).where(Product.user_id == user.id)
+    return export_response(session_factory, query, format, "stock_report")
+
+@router.get("/trial_balance", response_model=models.TrialBalance)
+def get_trial_balance(as_of: Optional[date] = None, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    """
+    Trial balance of the current user's company. By default it reads the
+    running account balances kept by ledger.py (one row per account, no
+    journal scan); with as_of it starts from the nearest closed-month
+    snapshot and replays only the entries after it.
+    """
+    accounts = db.query(sql_models.Account).filter(sql_models.Account.company_id == user.company_id).order_by(sql_models.Account.type, sql_models.Account.name).all() if user.company_id else []
+    balances = period_close.balances_as_of(db.connection(), user.company_id, as_of) if as_of and accounts else {}
+    lines = []
+    for account in accounts:
+        balance = balances.get(account.id, 0.0) if as_of else (account.balance or 0)
+        # A balance on the account's normal side is a debit for Asset/Expense accounts, a credit otherwise
+        debit_side = (account.type in DEBIT_NORMAL) == (balance >= 0)
+        lines.append(models.TrialBalanceLine(
+            account_id=account.id, name=account.name, type=account.type,
+            debit=abs(balance) if debit_side else 0, credit=0 if debit_side else abs(balance),
+        ))
+    total_debit = round(sum(line.debit for line in lines), 2)
+    total_credit = round(sum(line.credit for line in lines), 2)
+    return models.TrialBalance(lines=lines, total_debit=total_debit, total_credit=total_credit, balanced=total_debit == total_credit)
+
+def _company_account(db: Session, account_id: UUID, user: User):
+    account = db.query(sql_models.Account).filter(sql_models.Account.id == account_id, sql_models.Account.company_id == user.company_id).first()
+    if account is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return account
+
+@router.get("/accounts/{account_id}/balance")
+def get_account_balance(account_id: UUID, as_of: date, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    """Balance of one account at the end of as_of, from the nearest closed-month snapshot."""
+    account = _company_account(db, account_id, user)
+    balance = period_close.balances_as_of(db.connection(), account.company_id, as_of, account_id=account.id).get(account.id, 0.0)
+    return {"account_id": account.id, "as_of": as_of, "balance": balance}
+
+@router.get("/periods")
+def get_closed_periods(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    periods = db.query(sql_models.ClosedPeriod).filter(sql_models.ClosedPeriod.company_id == user.company_id).order_by(sql_models.ClosedPeriod.period).all()
+    return [{"period": p.period, "closed_at": p.closed_at} for p in periods]
+
+@router.post("/periods/close")
+def close_periods(through: date, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """
+    Closes every open month up to and including the month of `through`,
+    writing balance snapshots. Only past months can be closed: new postings
+    are redated past the last closed month, so closing the current or a
+    future month would move the live ledger with them.
+    """
+    if not user.company_id:
+        raise HTTPException(status_code=400, detail="User has no company")
+    if month_start(through) >= month_start(date.today()):
+        raise HTTPException(status_code=400, detail="Only months before the current one can be closed")
+    closed = period_close.close_through(db.connection(), user.company_id, through)
+    db.commit()
+    return {"closed": closed}
+
+@router.post("/periods/reopen")
+def reopen_period(period: date, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """
+    Reopens the month of `period` so entries can be posted into it again.
+    Every later closed month is reopened as well, and all of their snapshots
+    are dropped. The response lists every month reopened. Closing them again
+    through /periods/close rebuilds the snapshots from the journal, and so
+    does the worker's nightly close once the grace days have passed.
+    """
+    if not user.company_id:
+        raise HTTPException(status_code=400, detail="User has no company")
+    reopened = period_close.reopen(db.connection(), user.company_id, period)
+    db.commit()
+    return {"reopened": reopened}
+
+@router.get("/accounts/{account_id}/ledger", response_model=List[models.JournalEntry])
+def get_account_ledger(account_id: UUID, response: Response, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    """One page of an account's journal entries in (date, id) order; follow X-Next-Cursor for the next page."""
+    _company_account(db, account_id, user)
+    query = db.query(sql_models.JournalEntry).filter(sql_models.JournalEntry.account_id == account_id)
+    entries = JOURNAL_ENTRY_KEYSET.paginate(query, 0, limit, cursor).all()
+    return set_next_cursor(response, JOURNAL_ENTRY_KEYSET, entries, limit)
@@ -1,14 +1,16 @@
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response, Body
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, List, Optional
 from uuid import UUID
 
-from database import get_db
-from models import Client as PydanticClient
+from database import get_db, get_read_db
+from models import Client as PydanticClient, BulkCreateResult, BulkRowError, validate_bulk_rows
 from crud import (
-    get_client, get_clients, create_client, update_client, delete_client
+    get_client, get_clients, create_client, update_client, delete_client,
+    bulk_create_clients, BULK_MAX_ROWS
 )
+from pagination import CLIENT_KEYSET, set_next_cursor
 from dependencies import set_rls_context, get_current_user
 from sql_models import User
 
@@ -16,9 +18,9 @@ router = APIRouter()
 
 @router.get("/", response_model=List[PydanticClient])
 @router.get("", response_model=List[PydanticClient])
-def read_clients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    clients = get_clients(db, user_id=user.id, skip=skip, limit=limit)
-    return clients
+def read_clients(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    clients = get_clients(db, user_id=user.id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, CLIENT_KEYSET, clients, limit)
 
 @router.get("/{client_id}", response_model=PydanticClient)
 def read_client(client_id: UUID, db: Session = Depends(set_rls_context)):
@@ -27,6 +29,19 @@ def read_client(client_id: UUID, db: Session = Depends(set_rls_context)):
         raise HTTPException(status_code=404, detail="Client not found")
     return db_client
 
+@router.post("/bulk", response_model=BulkCreateResult)
+def bulk_create_clients_route(rows: List[Any] = Body(...), db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    valid, errors = validate_bulk_rows(PydanticClient, rows, company_id=user.company_id)
+    created, insert_errors = bulk_create_clients(db, valid, user_id=user.id, company_id=user.company_id)
+    errors += [BulkRowError(**error) for error in insert_errors]
+    return BulkCreateResult(
+        created=len(created),
+        ids=[client_id for _, client_id in sorted(created)],
+        errors=sorted(errors, key=lambda e: e.index),
+    )
+
 @router.post("/", response_model=PydanticClient)
 @router.post("", response_model=PydanticClient)
 def create_client_route(client: PydanticClient, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
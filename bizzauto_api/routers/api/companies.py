@@ -1,14 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from database import get_db
+from database import get_db, get_read_db
 from models import Company as PydanticCompany
 from crud import (
     get_company, get_companies, create_company, update_company, delete_company
 )
 
+from pagination import COMPANY_KEYSET, set_next_cursor
 from dependencies import set_rls_context
 from sql_models import User
 
@@ -16,9 +17,9 @@ router = APIRouter()
 
 @router.get("/", response_model=List[PydanticCompany])
 @router.get("", response_model=List[PydanticCompany])
-def read_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    companies = get_companies(db, skip=skip, limit=limit)
-    return companies
+def read_companies(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    companies = get_companies(db, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, COMPANY_KEYSET, companies, limit)
 
 @router.get("/{company_id}", response_model=PydanticCompany)
 def read_company(company_id: UUID, db: Session = Depends(get_db)):
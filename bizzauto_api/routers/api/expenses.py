@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, Body, status
 from sqlalchemy.orm import Session
-from typing import List, Union
+from typing import Any, List, Union, Optional
 from uuid import UUID
 import json
 from pydantic import BaseModel
 
 # Imports from your project structure
 from database import get_db
-from models import Expense as PydanticExpense
+from models import Expense as PydanticExpense, BulkCreateResult, BulkRowError, validate_bulk_rows
 from crud import (
-    get_expense, get_expenses, create_expense, update_expense, delete_expense
+    get_expense, get_expenses, create_expense, update_expense, delete_expense,
+    bulk_create_expenses, BULK_MAX_ROWS
 )
-from dependencies import set_rls_context, get_current_user
+from pagination import EXPENSE_KEYSET, set_next_cursor
+from dependencies import set_rls_context, set_read_rls_context, get_current_user
 from sql_models import User
 from whatsapp_utils import send_reply
 
@@ -31,8 +33,9 @@ class ExpenseWhatsAppPayload(BaseModel):
 
 @router.get("/", response_model=List[PydanticExpense])
 @router.get("", response_model=List[PydanticExpense])
-def read_expenses(skip: int = 0, limit: int = 100, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
-    return get_expenses(db, user_id=user.id, skip=skip, limit=limit, company_id=user.company_id)
+def read_expenses(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(set_read_rls_context), user: User = Depends(get_current_user)):
+    expenses = get_expenses(db, user_id=user.id, skip=skip, limit=limit, company_id=user.company_id, cursor=cursor)
+    return set_next_cursor(response, EXPENSE_KEYSET, expenses, limit)
 
 @router.get("/{expense_id}", response_model=PydanticExpense)
 def read_expense(expense_id: UUID, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
@@ -41,6 +44,19 @@ def read_expense(expense_id: UUID, db: Session = Depends(set_rls_context), user:
         raise HTTPException(status_code=404, detail="Expense not found")
     return db_expense
 
+@router.post("/bulk", response_model=BulkCreateResult)
+def bulk_create_expenses_route(rows: List[Any] = Body(...), db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    valid, errors = validate_bulk_rows(PydanticExpense, rows, company_id=user.company_id)
+    created, insert_errors = bulk_create_expenses(db, valid, user_id=user.id, company_id=user.company_id)
+    errors += [BulkRowError(**error) for error in insert_errors]
+    return BulkCreateResult(
+        created=len(created),
+        ids=[expense_id for _, expense_id in sorted(created)],
+        errors=sorted(errors, key=lambda e: e.index),
+    )
+
 @router.post("/", response_model=PydanticExpense)
 @router.post("", response_model=PydanticExpense) # Fix for 405 Error
 def create_expense_route(expense: PydanticExpense, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID, uuid4
-from typing import List, Optional
+from typing import List, Literal, Optional
+import asyncio
 import os
 from supabase import Client
 import logging
 import traceback
 
-from database import get_db, get_supabase
+from database import get_db, get_read_db, get_async_db, get_supabase
 import crud
 from crud import get_invoices
+from pagination import INVOICE_KEYSET, set_next_cursor
 import models
+import executors
+import invoice_jobs
+import ocr_engine
 import ocr_processing
 from dependencies import get_current_user
 from sql_models import User, Company # Import Company model
@@ -22,34 +30,81 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 # It's better to rename GCS_BUCKET_NAME to SUPABASE_BUCKET_NAME in your .env file
-BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "bizzauto_invoice_uploads")
+BUCKET_NAME = invoice_jobs.BUCKET_NAME
 
 ALLOWED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
+INVOICE_BATCH_MAX_FILES = int(os.getenv("INVOICE_BATCH_MAX_FILES", "50"))
 
 
+def _resolve_company_id(company_id: Optional[UUID], user: User) -> UUID:
+    # Resolving company_id from user if not provided
+    if not company_id:
+        if user.company_id:
+            company_id = user.company_id
+        else:
+            raise HTTPException(status_code=400, detail="Company ID missing and user not associated with a company.")
+    return company_id
+
+
+async def _ensure_company(db: AsyncSession, company_id: UUID):
+    # Check if company exists, if not, create a dummy one (for testing/graceful handling)
+    company = await db.get(Company, company_id)
+    if not company:
+        logger.warning(f"Company with ID {company_id} not found. Creating a dummy company.")
+        new_company = Company(
+            id=company_id,
+            name=f"Dummy Company {company_id}",
+            email=f"dummy_{company_id}@example.com",
+            phone="N/A",
+            address="N/A"
+            # Add other required fields with default/dummy values if any
+        )
+        db.add(new_company)
+        await db.commit()
+        logger.info(f"Dummy company {new_company.name} created with ID {new_company.id}")
+
+
+def _store_invoice_file(supabase_client: Client, file_path: str, file_content: bytes, content_type: str) -> str:
+    """Uploads the file to Supabase Storage and returns a signed URL (expires in 1 hour)."""
+    bucket = supabase_client.storage.from_(BUCKET_NAME)
+    bucket.upload(path=file_path, file=file_content, file_options={"content-type": content_type})
+    signed_url_response = bucket.create_signed_url(file_path, 3600)
+    return signed_url_response.get('signedURL') or signed_url_response.get('signed_url')
+
+
+def _extract_and_parse(file_content: bytes) -> dict:
+    return ocr_processing.parse_invoice_text(ocr_processing.extract_text_from_file(file_content))
+
+
+async def _ocr_invoice(file_content: bytes) -> dict:
+    """OCR on the OCR pool; parsing there too, or on the process pool when configured."""
+    if executors.parse_pool is None:
+        return await executors.ocr_pool.run(_extract_and_parse, file_content)
+    ocr_text = await executors.ocr_pool.run(ocr_processing.extract_text_from_file, file_content)
+    return await executors.parse_pool.run(ocr_processing.parse_invoice_text, ocr_text)
+
 
 @router.post("/upload-invoice", response_model=models.InvoiceUploadResponse)
 async def upload_invoice(
+    request: Request,
     company_id: Optional[UUID] = Form(None),
     user_id: Optional[UUID] = Form(None),
     client_id: Optional[UUID] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
-    supabase_client: Client = Depends(get_supabase)
+    supabase_client: Client = Depends(get_supabase),
+    mode: Literal["sync", "async"] = "sync",
 ):
     """
     Uploads an invoice file, validates it, processes it using OCR, creates database entries,
     and updates inventory.
+    With mode=async the file is only stored and queued (see invoice_jobs.py): the
+    response is 202 with a job id to poll at /jobs/{job_id}.
     """
     try:
-        # Resolving company_id from user if not provided
-        if not company_id:
-            if user.company_id:
-                company_id = user.company_id
-            else:
-                 raise HTTPException(status_code=400, detail="Company ID missing and user not associated with a company.")
-        
+        company_id = _resolve_company_id(company_id, user)
+
         # Resolving user_id
         if not user_id:
             user_id = user.id
@@ -71,55 +126,45 @@ async def upload_invoice(
         safe_filename = f"{uuid4()}{extension.lower()}"
         file_path = f"{company_id}/{safe_filename}"
 
-        # Check if company exists, if not, create a dummy one (for testing/graceful handling)
-        company = db.query(Company).filter(Company.id == company_id).first()
-        if not company:
-            logger.warning(f"Company with ID {company_id} not found. Creating a dummy company.")
-            new_company = Company(
-                id=company_id,
-                name=f"Dummy Company {company_id}",
-                email=f"dummy_{company_id}@example.com",
-                phone="N/A",
-                address="N/A"
-                # Add other required fields with default/dummy values if any
-            )
-            db.add(new_company)
-            db.commit()
-            db.refresh(new_company)
-            logger.info(f"Dummy company {new_company.name} created with ID {new_company.id}")
+        await _ensure_company(db, company_id)
 
-        # 2. Ensure bucket exists and upload file to Supabase Storage
+        # 2. Upload to Supabase Storage and 3-4. OCR + parse, concurrently on
+        # the bounded executors: neither depends on the other, and neither
+        # blocks the event loop.
         logger.info("Reading file content...")
         file_content = await file.read()
-        
-        logger.info(f"Uploading to Supabase bucket '{BUCKET_NAME}' at path: {file_path}...")
-        supabase_client.storage.from_(BUCKET_NAME).upload(
-            path=file_path,
-            file=file_content,
-            file_options={"content-type": file.content_type}
-        )
 
-        # Generate a temporary signed URL for secure access (expires in 1 hour)
-        signed_url_response = supabase_client.storage.from_(BUCKET_NAME).create_signed_url(file_path, 3600)
-        file_url = signed_url_response.get('signedURL') or signed_url_response.get('signed_url')
-        logger.info(f"File uploaded successfully. Signed URL generated.")
+        if mode == "async":
+            # Store the file and hand the rest to worker.py; poll the status URL
+            file_url = await executors.storage_pool.run(_store_invoice_file, supabase_client, file_path, file_content, file.content_type)
+            job_id = await run_in_threadpool(invoice_jobs.enqueue, file_path, company_id, user_id, client_id)
+            if job_id is None:
+                raise HTTPException(status_code=503, detail="Invoice job queue is unavailable, please retry shortly.", headers={"Retry-After": "5"})
+            logger.info(f"Queued invoice job {job_id} for {file_path}")
+            status_url = request.url_for("get_invoice_job", job_id=job_id).path
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job_id, "status": invoice_jobs.QUEUED, "status_url": status_url, "file_url": file_url},
+                headers={"Location": status_url},
+            )
 
-        # 3. Use Google Vision API for OCR text extraction
-        logger.info("Starting OCR text extraction...")
-        ocr_text = ocr_processing.extract_text_from_file(file_content)
-        logger.info("OCR extraction completed.")
+        logger.info(f"Uploading to Supabase bucket '{BUCKET_NAME}' at path: {file_path} and starting OCR text extraction...")
+        file_url, parsed_data = await asyncio.gather(
+            executors.storage_pool.run(_store_invoice_file, supabase_client, file_path, file_content, file.content_type),
+            _ocr_invoice(file_content),
+        )
+        logger.info("File uploaded and OCR extraction completed.")
 
-        # 4. Parse OCR text
-        logger.info("Parsing OCR text...")
-        parsed_data = ocr_processing.parse_invoice_text(ocr_text)
         if not parsed_data["line_items"]:
             raise HTTPException(status_code=400, detail="Could not parse any line items from the invoice.")
         logger.info(f"Parsed {len(parsed_data['line_items'])} line items.")
 
         # 5. Create invoice and update inventory in a transaction
         logger.info("Creating invoice and updating inventory...")
-        invoice, items_processed = crud.create_invoice_from_ocr(
-            db=db,
+        # The crud transaction runs on the async connection via run_sync,
+        # so the event loop keeps serving other requests during DB waits.
+        invoice, items_processed = await db.run_sync(
+            crud.create_invoice_from_ocr,
             ocr_data=parsed_data,
             company_id=company_id,
             user_id=user_id,
@@ -137,11 +182,112 @@ async def upload_invoice(
     except HTTPException as http_exc:
         # Re-raise HTTP exceptions to be handled by FastAPI
         raise http_exc
+    except executors.Overloaded as e:
+        logger.warning(f"Rejecting invoice upload: {e}")
+        raise HTTPException(status_code=503, detail="Invoice processing is busy, please retry shortly.", headers={"Retry-After": "5"})
     except Exception as e:
         logger.error(f"❌ An unexpected error occurred in upload_invoice: {str(e)}")
         logger.error(traceback.format_exc()) # This will print the full traceback
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
 
+@router.post("/upload-invoices", response_model=models.InvoiceBatchUploadResponse)
+async def upload_invoices(
+    company_id: Optional[UUID] = Form(None),
+    user_id: Optional[UUID] = Form(None),
+    client_id: Optional[UUID] = Form(None),
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+    supabase_client: Client = Depends(get_supabase)
+):
+    """
+    Uploads a stack of invoice files at once and returns a result per file;
+    one bad file does not fail the others.
+
+    Storage uploads and OCR run concurrently. Vision gets the files in
+    batch_annotate_images requests of up to 16 images, and those batches and
+    the parsing run in parallel on the executors, so the wall-clock time is
+    close to the slowest batch rather than the sum. Invoices are then created
+    one file at a time, each in its own transaction: files of one company
+    update the same products' stock, which concurrent transactions would race on.
+    """
+    if len(files) > INVOICE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {INVOICE_BATCH_MAX_FILES} files per upload.")
+    company_id = _resolve_company_id(company_id, user)
+    user_id = user_id or user.id
+    await _ensure_company(db, company_id)
+    logger.info(f"Received batch upload of {len(files)} files for company: {company_id}")
+
+    results = [models.InvoiceBatchFileResult(filename=file.filename or "", success=False) for file in files]
+    accepted = []  # (index in files, storage path, content, content type)
+    for i, file in enumerate(files):
+        _, extension = os.path.splitext(file.filename or "")
+        if extension.lower() not in ALLOWED_EXTENSIONS:
+            results[i].error = f"Invalid file type. Allowed types are: {', '.join(ALLOWED_EXTENSIONS)}"
+            continue
+        accepted.append((i, f"{company_id}/{uuid4()}{extension.lower()}", await file.read(), file.content_type))
+
+    contents = [content for _, _, content, _ in accepted]
+    batch_size = ocr_engine.VISION_BATCH_SIZE
+    chunks = [contents[start:start + batch_size] for start in range(0, len(contents), batch_size)]
+    file_urls, chunk_texts = await asyncio.gather(
+        executors.storage_pool.map(
+            lambda upload: _store_invoice_file(supabase_client, *upload),
+            [(path, content, content_type) for _, path, content, content_type in accepted],
+        ),
+        executors.ocr_pool.map(ocr_processing.extract_texts_from_files, chunks),
+    )
+    texts = []
+    for chunk, chunk_result in zip(chunks, chunk_texts):
+        texts += [chunk_result] * len(chunk) if isinstance(chunk_result, Exception) else chunk_result
+
+    parse_pool = executors.parse_pool or executors.ocr_pool
+    parsed = {}
+    to_parse = [n for n, text in enumerate(texts) if not isinstance(text, Exception)]
+    for n, parsed_data in zip(to_parse, await parse_pool.map(ocr_processing.parse_invoice_text, [texts[n] for n in to_parse])):
+        parsed[n] = parsed_data
+
+    for n, (i, _, _, _) in enumerate(accepted):
+        result = results[i]
+        parsed_data = parsed.get(n, texts[n])
+        if isinstance(file_urls[n], Exception):
+            result.error = f"Storage upload failed: {file_urls[n]}"
+        elif isinstance(parsed_data, Exception):
+            result.error = f"OCR failed: {parsed_data}"
+        elif not parsed_data["line_items"]:
+            result.error = "Could not parse any line items from the invoice."
+        else:
+            result.file_url = file_urls[n]
+            try:
+                invoice, items_processed = await db.run_sync(
+                    crud.create_invoice_from_ocr,
+                    ocr_data=parsed_data,
+                    company_id=company_id,
+                    user_id=user_id,
+                    client_id=client_id
+                )
+                result.success, result.invoice_id, result.items_processed = True, invoice.id, items_processed
+            except Exception as e:
+                logger.error(f"❌ Creating the invoice for {result.filename} failed: {e}")
+                result.error = f"Could not create the invoice: {e}"
+
+    succeeded = sum(1 for result in results if result.success)
+    logger.info(f"Batch upload finished: {succeeded} of {len(files)} invoices created.")
+    return models.InvoiceBatchUploadResponse(succeeded=succeeded, failed=len(files) - succeeded, results=results)
+
+@router.get("/jobs/{job_id}")
+def get_invoice_job(job_id: UUID, user: User = Depends(get_current_user)):
+    """
+    Status of an async invoice upload: status, current stage, progress,
+    per-stage timestamps and, once done, the invoice id.
+    """
+    job = invoice_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=503, detail="Invoice job store is unavailable, please retry shortly.", headers={"Retry-After": "5"})
+    if not job or (job.get("user_id") != str(user.id) and job.get("company_id") != str(user.company_id)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return invoice_jobs.status(str(job_id), job)
+
 @router.get("/invoice/{invoice_id}", response_model=models.InvoiceDetailResponse)
 def get_invoice_details(
     invoice_id: UUID,
@@ -263,9 +409,11 @@ def delete_manual_invoice(
 
 @router.get("/invoices", response_model=List[models.Invoice])
 def read_invoices(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db), 
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -274,5 +422,5 @@ def read_invoices(
     if not user or not user.company_id:
         raise HTTPException(status_code=403, detail="User not associated with a company.")
         
-    invoices = get_invoices(db, user_id=user.id, company_id=user.company_id, skip=skip, limit=limit)
-    return invoices
+    invoices = get_invoices(db, user_id=user.id, company_id=user.company_id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, INVOICE_KEYSET, invoices, limit)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from database import get_db
@@ -8,16 +8,17 @@ from models import Invoice as PydanticInvoice, InvoiceCreate
 from crud import (
     get_invoice, get_invoices, create_invoice, update_invoice, delete_invoice
 )
-from dependencies import set_rls_context, get_current_user
+from pagination import INVOICE_KEYSET, set_next_cursor
+from dependencies import set_rls_context, set_read_rls_context, get_current_user
 from sql_models import User
 
 router = APIRouter()
 
 @router.get("/", response_model=List[PydanticInvoice])
 @router.get("", response_model=List[PydanticInvoice])
-def read_invoices(skip: int = 0, limit: int = 100, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
-    db_invoices = get_invoices(db, user_id=user.id, skip=skip, limit=limit)
-    return db_invoices
+def read_invoices(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(set_read_rls_context), user: User = Depends(get_current_user)):
+    db_invoices = get_invoices(db, user_id=user.id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, INVOICE_KEYSET, db_invoices, limit)
 
 @router.get("/{invoice_id}", response_model=PydanticInvoice)
 def read_invoice(invoice_id: UUID, db: Session = Depends(set_rls_context)):
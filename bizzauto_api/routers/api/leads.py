@@ -1,22 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from database import get_db
+from database import get_read_db
 from models import Lead as PydanticLead
 from crud import (
     get_lead, get_leads, create_lead, update_lead, delete_lead
 )
+from pagination import LEAD_KEYSET, set_next_cursor
 from dependencies import set_rls_context, get_current_user
 from sql_models import User
 
 router = APIRouter()
 
 @router.get("/", response_model=List[PydanticLead])
-def read_leads(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    leads = get_leads(db, user_id=user.id, skip=skip, limit=limit)
-    return leads
+def read_leads(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    leads = get_leads(db, user_id=user.id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, LEAD_KEYSET, leads, limit)
 
 @router.get("/{lead_id}", response_model=PydanticLead)
 def read_lead(lead_id: UUID, db: Session = Depends(set_rls_context)):
@@ -7,7 +7,8 @@ import json
 import traceback
 from fastapi import APIRouter, HTTPException, Request, Depends, Response, status
 from sqlalchemy.orm import Session
-from database import SessionLocal, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SessionLocal, get_db, get_async_db
 from crud import create_whatsapp_log, get_companies, get_whatsapp_logs, update_whatsapp_log, get_whatsapp_log_by_whatsapp_message_id, create_scheduled_whatsapp_message
 from models import WhatsappLog as PydanticWhatsappLog
 from models import ScheduledWhatsappMessage as PydanticScheduledWhatsappMessage
@@ -170,7 +171,7 @@ class SendMessageRequest(BaseModel):
 async def send_meta_whatsapp_message(
     request: SendMessageRequest,
     response: Response,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user)
 ):
     try:
@@ -186,7 +187,7 @@ async def send_meta_whatsapp_message(
                 scheduled_at=datetime.utcnow(),
                 status='pending'  # Will update to 'sent' after successful delivery
             )
-            created_message = create_scheduled_whatsapp_message(db, new_message, user.id)
+            created_message = await db.run_sync(create_scheduled_whatsapp_message, new_message, user.id)
             print(f"✅ Message saved to DB as pending for {request.to}")
         except Exception as db_e:
             print(f"⚠️ Failed to save message to DB initially: {db_e}")
@@ -201,10 +202,10 @@ async def send_meta_whatsapp_message(
             # Update status to 'sent' in database
             try:
                 from sql_models import ScheduledWhatsappMessage
-                db_message = db.query(ScheduledWhatsappMessage).filter(ScheduledWhatsappMessage.id == created_message.id).first()
+                db_message = await db.get(ScheduledWhatsappMessage, created_message.id)
                 if db_message:
                     db_message.status = 'sent'
-                    db.commit()
+                    await db.commit()
                     print(f"✅ Message status updated to 'sent' for {request.to}")
             except Exception as update_e:
                 print(f"⚠️ Failed to update message status: {update_e}")
@@ -215,10 +216,10 @@ async def send_meta_whatsapp_message(
             # Update status to 'failed' in database
             try:
                 from sql_models import ScheduledWhatsappMessage
-                db_message = db.query(ScheduledWhatsappMessage).filter(ScheduledWhatsappMessage.id == created_message.id).first()
+                db_message = await db.get(ScheduledWhatsappMessage, created_message.id)
                 if db_message:
                     db_message.status = 'failed'
-                    db.commit()
+                    await db.commit()
                     print(f"✅ Message status updated to 'failed' for {request.to}")
             except Exception as update_e:
                 print(f"⚠️ Failed to update message status to failed: {update_e}")
@@ -1,23 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response, Body
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, List, Optional
 from uuid import UUID
 
 from database import get_db
-from models import Product as PydanticProduct
+from models import Product as PydanticProduct, BulkCreateResult, BulkRowError, validate_bulk_rows
 from crud import (
-    get_product, get_products, create_product, update_product, delete_product
+    get_product, get_products, create_product, update_product, delete_product,
+    bulk_create_products, BULK_MAX_ROWS
 )
-from dependencies import set_rls_context, get_current_user
+from pagination import PRODUCT_KEYSET, set_next_cursor
+from dependencies import set_rls_context, set_read_rls_context, get_current_user
 from sql_models import User
 
 router = APIRouter()
 
 @router.get("/", response_model=List[PydanticProduct])
 @router.get("", response_model=List[PydanticProduct])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
-    products = get_products(db, user_id=user.id, skip=skip, limit=limit)
-    return products
+def read_products(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(set_read_rls_context), user: User = Depends(get_current_user)):
+    products = get_products(db, user_id=user.id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, PRODUCT_KEYSET, products, limit)
 
 @router.get("/{product_id}", response_model=PydanticProduct)
 def read_product(product_id: UUID, db: Session = Depends(set_rls_context)):
@@ -26,6 +28,19 @@ def read_product(product_id: UUID, db: Session = Depends(set_rls_context)):
         raise HTTPException(status_code=404, detail="Product not found")
     return db_product
 
+@router.post("/bulk", response_model=BulkCreateResult)
+def bulk_create_products_route(rows: List[Any] = Body(...), db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    valid, errors = validate_bulk_rows(PydanticProduct, rows, company_id=user.company_id)
+    created, insert_errors = bulk_create_products(db, valid, user_id=user.id, company_id=user.company_id)
+    errors += [BulkRowError(**error) for error in insert_errors]
+    return BulkCreateResult(
+        created=len(created),
+        ids=[product_id for _, product_id in sorted(created)],
+        errors=sorted(errors, key=lambda e: e.index),
+    )
+
 @router.post("/", response_model=PydanticProduct)
 @router.post("", response_model=PydanticProduct)
 def create_product_route(product: PydanticProduct, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
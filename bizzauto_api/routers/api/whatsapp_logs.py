@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from database import get_db
@@ -8,16 +8,17 @@ from models import WhatsappLog as PydanticWhatsappLog
 from crud import (
     get_whatsapp_log, get_whatsapp_logs, create_whatsapp_log, update_whatsapp_log, delete_whatsapp_log
 )
-from dependencies import set_rls_context, get_current_user
+from pagination import WHATSAPP_LOG_KEYSET, set_next_cursor
+from dependencies import set_rls_context, set_read_rls_context, get_current_user
 from sql_models import User
 
 router = APIRouter()
 
 @router.get("/", response_model=List[PydanticWhatsappLog])
 @router.get("", response_model=List[PydanticWhatsappLog])
-def read_whatsapp_logs(skip: int = 0, limit: int = 100, db: Session = Depends(set_rls_context), user: User = Depends(get_current_user)):
-    whatsapp_logs = get_whatsapp_logs(db, user_id=user.id, skip=skip, limit=limit)
-    return whatsapp_logs
+def read_whatsapp_logs(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(set_read_rls_context), user: User = Depends(get_current_user)):
+    whatsapp_logs = get_whatsapp_logs(db, user_id=user.id, skip=skip, limit=limit, cursor=cursor)
+    return set_next_cursor(response, WHATSAPP_LOG_KEYSET, whatsapp_logs, limit)
 
 @router.get("/{whatsapp_log_id}", response_model=PydanticWhatsappLog)
 def read_whatsapp_log(whatsapp_log_id: UUID, db: Session = Depends(set_rls_context)):
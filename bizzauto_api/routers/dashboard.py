@@ -1,55 +1,120 @@
+import calendar
+
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-from crud import get_invoices, get_clients, get_products, get_whatsapp_logs
-from datetime import datetime
-from dependencies import get_current_user, set_rls_context
-from sql_models import User
+from sqlalchemy import extract, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import response_cache
+from database import get_async_db
+from dependencies import get_current_user
+from daily_metrics import INVOICE_PREFIX, UNDATED, WHATSAPP_MESSAGE
+from sql_models import User, Invoice, Client, Product, WhatsappLog, CompanyDailyMetric
 
 router = APIRouter()
 
+def _scoped(model, user: User):
+    """
+    Filter clauses for the dashboard's scope: the whole company, as in the
+    company_daily_metrics rollup, or the user's own rows when they have no
+    company. Every figure of one summary shares that scope.
+    """
+    if user.company_id:
+        return [model.company_id == user.company_id]
+    return [model.user_id == user.id]
+
+def _count_scoped(model, user: User, *extra):
+    return select(func.count()).select_from(model).where(*_scoped(model, user), *extra).scalar_subquery()
+
+async def _rollup_buckets(db: AsyncSession, company_id):
+    """
+    Invoice (year, month, status, amount, count) buckets and the WhatsApp
+    message count from company_daily_metrics: one small GROUP BY, whatever the
+    tenant size.
+    """
+    metric = CompanyDailyMetric.metric
+    year = extract("year", CompanyDailyMetric.day)
+    month = extract("month", CompanyDailyMetric.day)
+    rows = (await db.execute(
+        select(year, month, metric, func.sum(CompanyDailyMetric.amount), func.sum(CompanyDailyMetric.count))
+        .where(CompanyDailyMetric.company_id == company_id)
+        .where(metric.startswith(INVOICE_PREFIX) | (metric == WHATSAPP_MESSAGE))
+        .group_by(year, month, metric)
+        .order_by(year, month)
+    )).all()
+
+    buckets, messages_sent = [], 0
+    for bucket_year, bucket_month, name, amount, count in rows:
+        if name == WHATSAPP_MESSAGE:
+            messages_sent += count
+            continue
+        if (bucket_year, bucket_month) == (UNDATED.year, UNDATED.month):
+            bucket_year = bucket_month = None
+        buckets.append((bucket_year, bucket_month, name[len(INVOICE_PREFIX):] or None, amount, count))
+    return buckets, messages_sent
+
+async def _live_buckets(db: AsyncSession, user: User):
+    """Invoice (year, month, status, amount, count) buckets from the invoices table."""
+    year = extract("year", Invoice.invoice_date)
+    month = extract("month", Invoice.invoice_date)
+    return (await db.execute(
+        select(year, month, Invoice.payment_status, func.coalesce(func.sum(Invoice.total_amount), 0), func.count())
+        .where(*_scoped(Invoice, user))
+        .group_by(year, month, Invoice.payment_status)
+        .order_by(year, month)
+    )).all()
+
 @router.get("/summary")
-async def get_dashboard_summary(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_dashboard_summary(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """
+    Served from response_cache and dropped whenever the company's invoices,
+    products, clients or logs change. Misses read the primary, so a recompute
+    right after a write never caches replica lag.
+    """
+    print(f"Dashboard Access - User: {current_user.id}, Company: {current_user.company_id}")
+    return await response_cache.cached_async(current_user, "dashboard_summary", lambda: _summary(db, current_user))
+
+async def _summary(db: AsyncSession, current_user: User):
     company_id = current_user.company_id
-    print(f"Dashboard Access - User: {current_user.id}, Company: {company_id}")
-    
-    invoices = get_invoices(db, user_id=current_user.id, skip=0, limit=1000, company_id=company_id)
-    print(f"Fetched {len(invoices)} invoices for company {company_id}")
-    
-    clients = get_clients(db, user_id=current_user.id, skip=0, limit=1000, company_id=company_id)
-    products = get_products(db, user_id=current_user.id, skip=0, limit=1000, company_id=company_id)
-    whatsapp_logs = get_whatsapp_logs(db, user_id=current_user.id, skip=0, limit=1000, company_id=company_id)
-
-    total_revenue = sum(i.total_amount for i in invoices if i.payment_status == 'paid')
-    pending_payments = sum(i.total_amount for i in invoices if i.payment_status != 'paid')
-    active_clients = len(clients)
-    low_stock_items = sum(1 for p in products if p.stock_quantity < p.low_stock_alert)
-    messages_sent = len(whatsapp_logs)
 
-    revenue_trend = {}
-    for invoice in invoices:
-        month = invoice.invoice_date.strftime("%b")
-        if month not in revenue_trend:
-            revenue_trend[month] = 0
-        revenue_trend[month] += invoice.total_amount
+    # Row counts in one statement of scalar subqueries
+    counts = (await db.execute(select(
+        _count_scoped(Client, current_user).label("active_clients"),
+        _count_scoped(Product, current_user, Product.stock_quantity < Product.low_stock_alert).label("low_stock_items"),
+        *([] if company_id else [_count_scoped(WhatsappLog, current_user).label("messages_sent")]),
+    ))).one()
 
-    revenue_trend_list = [{"month": m, "value": v} for m, v in revenue_trend.items()]
+    # Invoice totals per (year, month, status). Company users read the
+    # pre-aggregated rollup, which is company-wide like the counts above;
+    # users without a company fall back to aggregating their own invoices.
+    if company_id:
+        buckets, messages_sent = await _rollup_buckets(db, company_id)
+    else:
+        buckets = await _live_buckets(db, current_user)
+        messages_sent = counts.messages_sent
 
+    total_revenue = 0
+    pending_payments = 0
+    revenue_trend = {}
     payment_status = {}
-    for invoice in invoices:
-        status = invoice.payment_status
-        if status not in payment_status:
-            payment_status[status] = 0
-        payment_status[status] += 1
-        
+    for bucket_year, bucket_month, status, amount, count in buckets:
+        if status == 'paid':
+            total_revenue += amount
+        else:
+            pending_payments += amount
+        if bucket_month is not None:
+            # Labelled by month name only, so the same month of different years shares a point
+            label = calendar.month_abbr[int(bucket_month)]
+            revenue_trend[label] = revenue_trend.get(label, 0) + amount
+        payment_status[status] = payment_status.get(status, 0) + count
+
+    revenue_trend_list = [{"month": m, "value": v} for m, v in revenue_trend.items()]
     payment_status_list = [{"name": s, "value": v} for s, v in payment_status.items()]
 
     return {
         "stats": {
             "total_revenue": total_revenue,
             "pending_payments": pending_payments,
-            "active_clients": active_clients,
-            "low_stock_items": low_stock_items,
+            "active_clients": counts.active_clients,
+            "low_stock_items": counts.low_stock_items,
             "messages_sent": messages_sent,
         },
         "revenue_trend": revenue_trend_list,
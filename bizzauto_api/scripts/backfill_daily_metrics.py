@@ -0,0 +1,51 @@
+"""
+Rebuilds company_daily_metrics from the raw invoice, expense, purchase and
+WhatsApp log tables.
+
+The rollup is maintained on every write made through SQLAlchemy; run this
+after writes that bypassed it (SQL consoles, the Supabase client) or to
+repair drift.
+
+    python scripts/backfill_daily_metrics.py                  # every company
+    python scripts/backfill_daily_metrics.py --company <uuid>
+"""
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, func, select
+
+import daily_metrics
+from sql_models import CompanyDailyMetric
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="database URL (defaults to DATABASE_URL)")
+    parser.add_argument("--company", type=uuid.UUID, help="rebuild a single company")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("DATABASE_URL not set")
+        sys.exit(1)
+
+    engine = create_engine(args.url)
+    try:
+        with engine.begin() as conn:
+            daily_metrics.rebuild(conn, args.company)
+            query = select(func.count()).select_from(CompanyDailyMetric)
+            if args.company:
+                query = query.where(CompanyDailyMetric.company_id == args.company)
+            rows = conn.execute(query).scalar()
+        print(f"Rebuilt company_daily_metrics: {rows} rows")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Posts journal entries for invoices, purchases and expenses that have none:
+documents created before the posting engine (ledger.py) existed, or written
+around SQLAlchemy.
+
+    python scripts/backfill_ledger.py                  # every company
+    python scripts/backfill_ledger.py --company <uuid>
+
+Safe to re-run: documents that already have entries are skipped.
+"""
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+import ledger
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="database URL (defaults to DATABASE_URL)")
+    parser.add_argument("--company", type=uuid.UUID, help="backfill a single company")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("DATABASE_URL not set")
+        sys.exit(1)
+
+    engine = create_engine(args.url)
+    try:
+        with engine.begin() as conn:
+            posted = ledger.post_missing(conn, args.company)
+        print(f"Posted {posted} documents to the ledger")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
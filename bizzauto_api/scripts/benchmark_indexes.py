@@ -0,0 +1,178 @@
+"""
+Before/after timings for the hot-path index pack (migrations/m0001).
+
+Builds a multi-tenant dataset without the indexes, times the queries each
+index is meant to serve, applies the migration and times them again.
+
+    python scripts/benchmark_indexes.py                      # throwaway SQLite file
+    python scripts/benchmark_indexes.py --url postgresql://... --companies 200
+
+Point --url at a scratch database only: tables are created and filled with
+generated rows.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import sql_models
+from migrations.m0001_hot_path_indexes import INDEXES, upgrade
+from pagination import INVOICE_KEYSET
+from sql_models import (
+    Client, Company, Expense, Invoice, InvoiceItem, Lead, Product,
+    ScheduledWhatsappMessage, User, WhatsappLog,
+)
+
+
+def seed(engine, companies: int, scale: int):
+    rng = random.Random(42)
+    tenants = []
+    start = date(2023, 1, 1)
+    with engine.begin() as conn:
+        for c in range(companies):
+            company_id, user_id = uuid.uuid4(), uuid.uuid4()
+            tenants.append((company_id, user_id))
+            conn.execute(insert(Company), [{"id": company_id, "name": f"Company {c}"}])
+            conn.execute(insert(User), [{
+                "id": user_id, "company_id": company_id, "email": f"owner{c}@bench.test",
+                "full_name": f"Owner {c}", "role": "user", "created_at": datetime(2023, 1, 1) + timedelta(hours=c),
+            }])
+
+            products = [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id, "name": f"Product {p}",
+                         "stock_quantity": rng.randint(0, 100)} for p in range(2 * scale)]
+            conn.execute(insert(Product), products)
+            conn.execute(insert(Client), [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id,
+                                           "name": f"Client {n}"} for n in range(scale)])
+            conn.execute(insert(Lead), [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id,
+                                         "name": f"Lead {n}"} for n in range(scale)])
+
+            invoices = [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id,
+                         "invoice_date": start + timedelta(days=rng.randint(0, 700)),
+                         "total_amount": rng.uniform(10, 500), "payment_status": rng.choice(["paid", "unpaid"])}
+                        for _ in range(10 * scale)]
+            conn.execute(insert(Invoice), invoices)
+            conn.execute(insert(InvoiceItem), [{"id": uuid.uuid4(), "invoice_id": inv["id"], "user_id": user_id,
+                                                "product_id": rng.choice(products)["id"], "quantity": 1}
+                                               for inv in invoices for _ in range(2)])
+            conn.execute(insert(Expense), [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id,
+                                            "title": "Expense", "amount": rng.uniform(5, 100),
+                                            "expense_date": start + timedelta(days=rng.randint(0, 700))}
+                                           for _ in range(4 * scale)])
+            conn.execute(insert(WhatsappLog), [{"id": uuid.uuid4(), "company_id": company_id, "user_id": user_id,
+                                                "phone": f"92300{rng.randint(0, scale):07d}", "message": "hi",
+                                                "status": rng.choice(["sent", "delivered", "read", "failed"])}
+                                               for _ in range(20 * scale)])
+            conn.execute(insert(ScheduledWhatsappMessage), [{
+                "id": uuid.uuid4(), "company_id": company_id, "user_id": user_id, "phone": "923000000000",
+                "message": "reminder", "status": "sent" if n % 20 else "pending",
+                "scheduled_at": datetime(2023, 1, 1) + timedelta(hours=n),
+            } for n in range(2 * scale)])
+    return tenants
+
+
+def benchmark_queries(tenants):
+    """(index name, description, callable(db)) for every index in the pack."""
+    company_id, user_id = tenants[len(tenants) // 2]
+
+    def invoices_deep_page(db):
+        page = crud.get_invoices(db, user_id=user_id, company_id=company_id, limit=50)
+        for _ in range(5):
+            page = crud.get_invoices(db, user_id=user_id, company_id=company_id, limit=50,
+                                     cursor=INVOICE_KEYSET.next_cursor(page, 50))
+
+    def first_invoice_item(db):
+        invoice = db.query(Invoice.id).filter(Invoice.company_id == company_id).first()
+        db.query(InvoiceItem).filter(InvoiceItem.invoice_id == invoice.id).all()
+
+    return [
+        ("ix_products_user_company_id", "get_products page", lambda db: crud.get_products(db, user_id=user_id, company_id=company_id, limit=50)),
+        ("ix_products_company_lower_name", "find_product_by_name", lambda db: crud.find_product_by_name(db, "product 7", company_id)),
+        ("ix_clients_user_company_id", "get_clients page", lambda db: crud.get_clients(db, user_id=user_id, company_id=company_id, limit=50)),
+        ("ix_invoices_user_company_date", "get_invoices 6 cursor pages", invoices_deep_page),
+        ("ix_invoices_company_date", "company invoices since date", lambda db: db.query(func.sum(Invoice.total_amount)).filter(Invoice.company_id == company_id, Invoice.invoice_date >= date(2024, 6, 1)).scalar()),
+        ("ix_expenses_company_date", "get_expenses by company", lambda db: crud.get_expenses(db, user_id=user_id, company_id=company_id, limit=50)),
+        ("ix_expenses_user_date", "get_expenses by user", lambda db: crud.get_expenses(db, user_id=user_id, limit=50)),
+        ("ix_leads_user_id", "get_leads page", lambda db: crud.get_leads(db, user_id=user_id, limit=50)),
+        ("ix_whatsapp_logs_user_company_id", "get_whatsapp_logs page", lambda db: crud.get_whatsapp_logs(db, user_id=user_id, company_id=company_id, limit=50)),
+        ("ix_whatsapp_logs_company_phone", "logs for one phone", lambda db: db.query(WhatsappLog).filter(WhatsappLog.company_id == company_id, WhatsappLog.phone == "923000000007").all()),
+        ("ix_whatsapp_logs_status", "failed message count", lambda db: db.query(WhatsappLog).filter(WhatsappLog.status == "failed").count()),
+        ("ix_scheduled_whatsapp_status_at", "due scheduled messages", lambda db: crud.get_pending_scheduled_whatsapp_messages(db)),
+        ("ix_scheduled_whatsapp_user_at", "get_scheduled_whatsapp_messages", lambda db: crud.get_scheduled_whatsapp_messages(db, user_id=user_id, limit=50)),
+        ("ix_users_created_id", "admin users page", lambda db: crud.get_users(db, limit=50)),
+        ("ix_users_company_id", "users of a company", lambda db: db.query(User).filter(User.company_id == company_id).all()),
+        ("ix_invoice_items_invoice_id", "items of an invoice", first_invoice_item),
+        ("ix_purchase_items_purchase_id", "(FK join index, no benchmark rows)", None),
+        ("ix_journal_entries_account_id", "(FK join index, no benchmark rows)", None),
+    ]
+
+
+def time_query(SessionLocal, fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            fn(db)
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="scratch database URL (default: temporary SQLite file)")
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--scale", type=int, default=100, help="rows per tenant multiplier")
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.url
+    if not url:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    engine = create_engine(url)
+    SessionLocal = sessionmaker(bind=engine)
+
+    sql_models.Base.metadata.drop_all(bind=engine)
+    sql_models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name, _, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    print(f"Seeding {args.companies} companies at scale {args.scale}...", flush=True)
+    tenants = seed(engine, args.companies, args.scale)
+    queries = benchmark_queries(tenants)
+    assert [q[0] for q in queries] == [i[0] for i in INDEXES], "benchmark must cover every index"
+
+    before = {name: time_query(SessionLocal, fn, args.repeat) for name, _, fn in queries if fn}
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        upgrade(conn)
+        conn.execute(text("ANALYZE"))
+
+    after = {name: time_query(SessionLocal, fn, args.repeat) for name, _, fn in queries if fn}
+
+    print(f"\n{'index':34} {'query':34} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, description, fn in queries:
+        if not fn:
+            print(f"{name:34} {description:34}")
+            continue
+        print(f"{name:34} {description:34} {before[name]:10.2f} {after[name]:10.2f} {before[name] / after[name]:7.1f}x")
+
+    engine.dispose()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Throughput and peak memory of the OCR text parsers on a synthetic corpus.
+
+Generates OCR-like text in three shapes, each at several lengths:
+
+    retail_invoice     supplier header, "description qty amount" rows (some
+                       wrapped onto a second line), subtotal / tax / total
+    stock_csv          "code, name, qty, value" stock report with a total row
+    valuation_report   STOCK VALUATION REPORT pages with IP ( / AN ( sections,
+                       rows often split over two lines as Vision returns them
+
+and times every parser on every document: the median of --repeat samples,
+reported as lines/sec, plus the peak memory one call allocates
+(tracemalloc). The corpus only depends on --seed, so runs on different
+commits parse the same text.
+
+    python scripts/benchmark_ocr_parsing.py --output before.json
+    git checkout my-branch
+    python scripts/benchmark_ocr_parsing.py --compare before.json
+
+Results go to --output (or stdout) as JSON, the table to stderr. With
+--compare, cases slower than --threshold x the baseline are listed and the
+exit status is 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Time the parser, not the parse cache
+os.environ["OCR_CACHE_BACKEND"] = "off"
+
+import invoice_parser
+import ocr_processing
+import ocr_tasks
+
+# The parsers log every document at INFO; keep that out of the output (the
+# messages are still built, as in production)
+logging.disable(logging.WARNING)
+
+FUNCTIONS = {
+    "ocr_processing.improve_ocr_text_structure": ocr_processing.improve_ocr_text_structure,
+    "invoice_parser.is_inventory_format": invoice_parser.is_inventory_format,
+    "invoice_parser.parse_inventory_format": invoice_parser.parse_inventory_format,
+    "ocr_processing.parse_invoice_text": ocr_processing.parse_invoice_text,
+    "ocr_tasks._parse_invoice_text": ocr_tasks._parse_invoice_text,
+}
+
+ADJECTIVES = ["Blue", "Red", "Steel", "Copper", "Premium", "Heavy Duty", "Organic", "Compact", "Wireless", "Matte"]
+NOUNS = ["Widget", "Bracket", "Cable", "Hinge", "Coffee Beans", "Paper Cups", "Charger", "Screen Guard", "Bolt", "Tape"]
+SIZES = ["", "", " 1m", " 500ml", " M8", " 12oz", " 2L", " XL"]
+PHONES = [("IP (Apple / iPhone & iPad)", ["15 PM 256", "15 Pro 128", "14 Plus 128", "iPad Air 64", "17 PM 512"]),
+          ("AN (Android Phones)", ["Galaxy S24", "Pixel 8 Pro", "Redmi Note 13", "Galaxy A15", "Nothing Phone 2"])]
+
+
+def product_name(rng) -> str:
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}{rng.choice(SIZES)}"
+
+
+def retail_invoice(rng, lines: int) -> str:
+    header = [
+        "ACME Supplies Ltd., 12 Harbour Road",
+        f"INVOICE #{rng.randint(10000, 99999)}   Date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024",
+        "Bill To: Corner Shop",
+        "Description  Qty  Amount",
+    ]
+    body, subtotal = [], 0.0
+    while len(header) + len(body) + 3 < lines:
+        quantity = rng.randint(1, 50)
+        amount = round(quantity * rng.uniform(0.5, 120), 2)
+        subtotal += amount
+        shape = rng.random()
+        if shape < 0.1 and len(header) + len(body) + 4 < lines:
+            # Description wrapped by OCR
+            body += [f"{product_name(rng)} (pack of", f"{rng.randint(2, 24)})  {quantity}  {amount:,.2f}"]
+        elif shape < 0.3:
+            body.append(f"{product_name(rng)} x {quantity} @ {amount:,.2f}")
+        else:
+            body.append(f"{product_name(rng)}  {quantity}  {amount:,.2f}")
+    tax = round(subtotal * 0.1, 2)
+    footer = [f"Subtotal: {subtotal:,.2f}", f"Tax: {tax:,.2f}", f"Total: {subtotal + tax:,.2f}"]
+    return "\n".join(header + body + footer)
+
+
+def stock_csv(rng, lines: int) -> str:
+    rows, total = ["ITEM CODE, ITEM NAME, BALANCE QUANTITY, VALUE"], 0
+    while len(rows) + 1 < lines:
+        quantity = rng.randint(0, 500)
+        total += quantity
+        name = product_name(rng) if rng.random() > 0.02 else ""
+        value = f", {rng.uniform(0.1, 90):.2f}" if rng.random() > 0.1 else ""
+        rows.append(f"{rng.choice('ABCK')}{rng.randint(100, 9999)}, {name}, {quantity}{value}")
+    rows.append(f"Total, , {total}")
+    return "\n".join(rows)
+
+
+def valuation_report(rng, lines: int) -> str:
+    rows, grand_total, page, next_page_at = [], 0, 0, 0
+    while len(rows) + 1 < lines:
+        if len(rows) >= next_page_at:
+            page += 1
+            next_page_at += 60
+            rows += ["STOCK VALUATION REPORT", f"As at 31/01/2024   Page {page}", "ITEM CODE   ITEM NAME   BALANCE QUANTITY"]
+        section, models = rng.choice(PHONES)
+        rows.append(section)
+        subtotal = 0
+        for _ in range(rng.randint(3, 12)):
+            code, model, quantity = f"{rng.randint(100, 99999):08d}", rng.choice(models), rng.randint(0, 40)
+            subtotal += quantity
+            split = rng.random()
+            if split < 0.2:
+                rows += [code, f"{model}   {quantity}"]
+            elif split < 0.3:
+                head, _, tail = model.rpartition(" ")
+                rows += [f"{code}   {head}", f"{tail}   {quantity}"]
+            else:
+                rows.append(f"{code}   {model}   {quantity}")
+        rows.append(f"Subtotal   {subtotal}")
+        grand_total += subtotal
+    rows = rows[:lines - 1]
+    rows.append(f"GRAND TOTAL   {grand_total}")
+    return "\n".join(rows)
+
+
+CORPORA = {"retail_invoice": retail_invoice, "stock_csv": stock_csv, "valuation_report": valuation_report}
+
+
+def time_call(fn, text: str, repeat: int, min_time: float) -> float:
+    """Median seconds per call; each sample loops until it lasts min_time."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(text)
+        if time.perf_counter() - started >= min_time:
+            break
+        number *= 10
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(text)
+        samples.append((time.perf_counter() - started) / number)
+    return statistics.median(samples)
+
+
+def peak_memory(fn, text: str) -> int:
+    """Peak bytes allocated during one call."""
+    tracemalloc.start()
+    try:
+        fn(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat: int, min_time: float, seed: int) -> list:
+    results = []
+    for corpus, generate in CORPORA.items():
+        for size in sizes:
+            text = generate(random.Random(f"{seed}:{corpus}:{size}"), size)
+            line_count = text.count("\n") + 1
+            for name, fn in FUNCTIONS.items():
+                seconds = time_call(fn, text, repeat, min_time)
+                results.append({
+                    "function": name, "corpus": corpus, "lines": line_count, "bytes": len(text.encode("utf-8")),
+                    "seconds": seconds, "lines_per_sec": round(line_count / seconds, 1),
+                    "peak_kib": round(peak_memory(fn, text) / 1024, 1),
+                })
+                print(f"{name:44} {corpus:17} {line_count:6} lines {line_count / seconds:14,.0f} lines/s "
+                      f"{results[-1]['peak_kib']:10,.1f} KiB", file=sys.stderr, flush=True)
+    return results
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Cases slower than threshold x the baseline, printing every ratio."""
+    before = {(r["function"], r["corpus"], r["lines"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'}:\n{'function':44} {'corpus':17} {'lines':>6} {'time':>8}", file=sys.stderr)
+    for result in results:
+        old = before.get((result["function"], result["corpus"], result["lines"]))
+        if not old:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{result['function']:44} {result['corpus']:17} {result['lines']:6} {ratio:7.2f}x{flag}", file=sys.stderr)
+        if flag:
+            regressions.append({**result, "baseline_seconds": old["seconds"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="document lengths in lines, comma-separated")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per timing sample")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = {
+        "benchmark": "ocr_parsing",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "params": {"sizes": sizes, "repeat": args.repeat, "min_time": args.min_time, "seed": args.seed},
+        "results": run(sizes, args.repeat, args.min_time, args.seed),
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
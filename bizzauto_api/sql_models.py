@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, ForeignKey, Date, DateTime
+from sqlalchemy import Column, String, Float, Integer, ForeignKey, Date, DateTime, Index, func
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
@@ -208,6 +208,7 @@ class WhatsappLog(Base):
     phone = Column(String, nullable=True)
     message = Column(String, nullable=True)
     status = Column(String, default='sent')
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     company = relationship("Company", back_populates="whatsapp_logs")
 
@@ -268,6 +269,24 @@ class JournalEntry(Base):
     purchase = relationship("Purchase", back_populates="journal_entries")
     expense = relationship("Expense", back_populates="journal_entries")
 
+class AccountPeriodBalance(Base):
+    """Closing balance of an account for a closed month (see period_close.py)."""
+    __tablename__ = "account_period_balances"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    period = Column(Date, primary_key=True)  # first day of the month
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"))
+    debit = Column(Float, nullable=False, default=0)  # movement within the month
+    credit = Column(Float, nullable=False, default=0)
+    closing_balance = Column(Float, nullable=False, default=0)  # on the account's normal side
+
+class ClosedPeriod(Base):
+    __tablename__ = "closed_periods"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    period = Column(Date, primary_key=True)  # first day of the month
+    closed_at = Column(DateTime, default=datetime.utcnow)
+
 class Setting(Base):
     __tablename__ = "settings"
 
@@ -278,6 +297,16 @@ class Setting(Base):
 
     user = relationship("User", back_populates="settings")
 
+class CompanyDailyMetric(Base):
+    """Per-company daily rollup maintained by daily_metrics.py."""
+    __tablename__ = "company_daily_metrics"
+
+    company_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    metric = Column(String, primary_key=True)  # invoice:<status>, expense, purchase, whatsapp_message
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0)
+
 class ContactMessage(Base):
     __tablename__ = "contact_messages"
 
@@ -288,3 +317,32 @@ class ContactMessage(Base):
     subject = Column(String)
     message = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# --- Hot-path indexes ---
+# Declared here so create_all builds them on fresh databases; existing
+# databases get them from migrations/m0001_hot_path_indexes.py (m0003 for
+# analytics, m0004 and m0005 for the ledger). Keep the two in step.
+Index("ix_products_user_company_id", Product.user_id, Product.company_id, Product.id)
+Index("ix_products_company_lower_name", Product.company_id, func.lower(Product.name))
+Index("ix_clients_user_company_id", Client.user_id, Client.company_id, Client.id)
+Index("ix_invoices_user_company_date", Invoice.user_id, Invoice.company_id, Invoice.invoice_date, Invoice.id)
+Index("ix_invoices_company_date", Invoice.company_id, Invoice.invoice_date, Invoice.id)
+Index("ix_expenses_company_date", Expense.company_id, Expense.expense_date, Expense.id)
+Index("ix_expenses_user_date", Expense.user_id, Expense.expense_date, Expense.id)
+Index("ix_leads_user_id", Lead.user_id, Lead.id)
+Index("ix_whatsapp_logs_user_company_created", WhatsappLog.user_id, WhatsappLog.company_id, WhatsappLog.created_at, WhatsappLog.id)
+Index("ix_whatsapp_logs_company_phone", WhatsappLog.company_id, WhatsappLog.phone)
+Index("ix_whatsapp_logs_status", WhatsappLog.status)
+Index("ix_scheduled_whatsapp_status_at", ScheduledWhatsappMessage.status, ScheduledWhatsappMessage.scheduled_at)
+Index("ix_scheduled_whatsapp_user_at", ScheduledWhatsappMessage.user_id, ScheduledWhatsappMessage.scheduled_at)
+Index("ix_users_created_id", User.created_at, User.id)
+Index("ix_users_company_id", User.company_id)
+Index("ix_invoice_items_invoice_id", InvoiceItem.invoice_id)
+Index("ix_purchase_items_purchase_id", PurchaseItem.purchase_id)
+Index("ix_journal_entries_account_id", JournalEntry.account_id)
+Index("ix_company_daily_metrics_day_metric", CompanyDailyMetric.day, CompanyDailyMetric.metric)
+Index("ix_journal_entries_account_date", JournalEntry.account_id, JournalEntry.date, JournalEntry.id)
+Index("uq_accounts_company_name", Account.company_id, Account.name, unique=True)
+Index("ix_journal_entries_company_date", JournalEntry.company_id, JournalEntry.date)
+Index("ix_account_period_balances_company_period", AccountPeriodBalance.company_id, AccountPeriodBalance.period)
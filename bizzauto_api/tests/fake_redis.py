@@ -0,0 +1,82 @@
+"""In-memory stand-in for the redis_client commands the caches and counters use."""
+import fnmatch
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.values = {}
+        self.lists = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = str(value)
+
+    def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+    def incr(self, key, amount=1):
+        self.values[key] = str(int(self.values.get(key, 0)) + amount)
+        return int(self.values[key])
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        bucket = self.hashes.setdefault(key, {})
+        if field is not None:
+            bucket[field] = str(value)
+        for k, v in (mapping or {}).items():
+            bucket[k] = str(v)
+
+    def hincrby(self, key, field, amount=1):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + amount)
+        return int(bucket[field])
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(str(v) for v in values)
+        return len(self.lists[key])
+
+    def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+            self.values.pop(key, None)
+            self.lists.pop(key, None)
+
+    def scan_iter(self, match="*"):
+        return [key for key in list(self.hashes) + list(self.values) if fnmatch.fnmatchcase(key, match)]
+
+    # Commands run immediately; execute() returns their results in order
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._results = []
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._results.append(command(*args, **kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results, self._results = self._results, []
+        return results
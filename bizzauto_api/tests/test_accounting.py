@@ -6,7 +6,14 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from fastapi.testclient import TestClient
 from main import app
-from database import get_db, TestingSessionLocal, test_engine
+from database import get_db, get_read_sessionmaker, TestingSessionLocal, test_engine
+from dependencies import get_current_user
+from uuid import uuid4
+from datetime import date
+import csv
+import io
+import json
+import exports
 import sql_models
 import pytest
 
@@ -25,6 +32,7 @@ def client_fixture(session):
     def override_get_db():
         yield session
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: sql_models.User(id=uuid4(), company_id=uuid4(), email="user@test.com", role="user")
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
@@ -33,4 +41,44 @@ def client_fixture(session):
 def test_read_sales_summary(client):
     response = client.get("/api/accounting/sales_summary")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
\ No newline at end of file
+    assert isinstance(response.json(), list)
+
+
+@pytest.fixture(name="owner")
+def owner_fixture(client, session):
+    owner = sql_models.User(id=uuid4(), company_id=uuid4(), email="owner@test.com", role="user")
+    app.dependency_overrides[get_current_user] = lambda: owner
+    app.dependency_overrides[get_read_sessionmaker] = lambda: TestingSessionLocal
+    session.add_all([
+        sql_models.Invoice(company_id=owner.company_id, user_id=owner.id, invoice_date=date(2025, 1, i + 1), total_amount=10.0 * i, notes='say "hi", ok')
+        for i in range(5)
+    ])
+    session.add(sql_models.Invoice(company_id=owner.company_id, user_id=uuid4(), total_amount=1.0))  # someone else's
+    session.commit()
+    return owner
+
+
+def test_export_sales_summary_ndjson(client, owner):
+    response = client.get("/api/accounting/sales_summary/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["total_amount"] for row in rows) == [0.0, 10.0, 20.0, 30.0, 40.0]
+    assert rows[0]["company_id"] == str(owner.company_id)
+    assert "items" not in rows[0]
+
+
+def test_export_sales_summary_csv(client, owner):
+    response = client.get("/api/accounting/sales_summary/export", params={"format": "csv"})
+    assert 'filename="sales_summary.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert rows[0]["notes"] == 'say "hi", ok'
+    assert client.get("/api/accounting/stock_report/export", params={"format": "xml"}).status_code == 422
+
+
+def test_export_streams_in_batches(owner, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    query = sql_models.Invoice.__table__.select().where(sql_models.Invoice.user_id == owner.id)
+    chunks = list(exports.stream_rows(TestingSessionLocal, query, "ndjson"))
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
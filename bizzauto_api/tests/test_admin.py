@@ -50,6 +50,38 @@ def test_admin_analytics(client):
     assert "total_users" in data
     assert "total_revenue" in data
 
+def test_admin_analytics_buckets_calendar_months(client, session, monkeypatch):
+    import routers.admin as admin
+    from datetime import date, datetime
+
+    class FixedDate(date):
+        @classmethod
+        def today(cls):
+            return cls(2025, 3, 15)
+    monkeypatch.setattr(admin, "date", FixedDate)
+
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    session.add(company)
+    session.add_all([
+        sql_models.User(id=uuid4(), company_id=company.id, email="a@test.com", status="active", created_at=datetime(2025, 3, 1)),
+        sql_models.User(id=uuid4(), company_id=company.id, email="b@test.com", status="inactive", created_at=datetime(2024, 3, 1)),  # a year earlier
+        sql_models.User(id=uuid4(), company_id=company.id, email="c@test.com", status="inactive", created_at=datetime(2024, 10, 31)),
+        sql_models.Invoice(company_id=company.id, invoice_date=date(2025, 1, 31), total_amount=100.0),
+        sql_models.Invoice(company_id=company.id, invoice_date=date(2024, 1, 31), total_amount=40.0),  # outside the window
+        sql_models.Invoice(company_id=company.id, invoice_date=date(2024, 10, 1), total_amount=5.0),
+    ])
+    session.commit()
+
+    data = client.get("/api/admin/analytics").json()
+    assert data["total_users"] == 3
+    assert data["active_users"] == 1
+    assert data["total_revenue"] == 145.0
+    assert data["revenue_trend"] == [
+        {"name": "Oct", "value": 5.0}, {"name": "Nov", "value": 0}, {"name": "Dec", "value": 0},
+        {"name": "Jan", "value": 100.0}, {"name": "Feb", "value": 0}, {"name": "Mar", "value": 0},
+    ]
+    assert [point["value"] for point in data["user_growth"]] == [1, 0, 0, 0, 0, 1]
+
 def test_admin_whatsapp_stats(client):
     response = client.get("/api/admin/whatsapp-stats")
     assert response.status_code == 200
@@ -60,3 +92,10 @@ def test_admin_users_list(client):
     response = client.get("/api/admin/users")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_admin_db_pool_stats(client):
+    response = client.get("/api/admin/db/pool-stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert "mode" in data
+    assert "configured" in data
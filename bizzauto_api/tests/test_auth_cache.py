@@ -0,0 +1,147 @@
+import sys
+import os
+import time
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from auth_cache import PrincipalCache, principal_cache
+from fake_redis import FakeRedis
+import redis_client
+from database import TestingSessionLocal, test_engine
+import dependencies
+import sql_models
+import pytest
+
+SECRET = "test-secret"
+
+def make_user(**kwargs):
+    return sql_models.User(id=uuid4(), company_id=uuid4(), email="user@test.com", full_name="User", role="user", **kwargs)
+
+
+def test_cache_returns_detached_copy():
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=False)
+    user = make_user()
+    exp = int(time.time()) + 3600
+
+    assert cache.get(str(user.id), exp) is None
+    cache.put(str(user.id), exp, user)
+
+    cached = cache.get(str(user.id), exp)
+    assert cached is not user
+    assert cached.id == user.id
+    assert cached.company_id == user.company_id
+    assert cached.role == "user"
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PrincipalCache(max_entries=2, ttl_seconds=60, use_redis=False)
+    exp = int(time.time()) + 3600
+    users = [make_user() for _ in range(3)]
+
+    cache.put(str(users[0].id), exp, users[0])
+    cache.put(str(users[1].id), exp, users[1])
+    cache.get(str(users[0].id), exp)  # users[1] is now least recently used
+    cache.put(str(users[2].id), exp, users[2])
+
+    assert cache.get(str(users[0].id), exp) is not None
+    assert cache.get(str(users[1].id), exp) is None
+    assert cache.get(str(users[2].id), exp) is not None
+
+
+def test_cache_respects_token_expiry():
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=False)
+    user = make_user()
+    expired = int(time.time()) - 1
+
+    cache.put(str(user.id), expired, user)
+    assert cache.get(str(user.id), expired) is None
+
+
+def test_invalidate_drops_every_token_for_user():
+    cache = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=False)
+    user = make_user()
+    now = int(time.time())
+
+    cache.put(str(user.id), now + 100, user)
+    cache.put(str(user.id), now + 200, user)
+    cache.invalidate(user.id)
+
+    assert cache.get(str(user.id), now + 100) is None
+    assert cache.get(str(user.id), now + 200) is None
+
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", fake)
+    monkeypatch.setattr(redis_client, "_redis_unavailable_until", 0.0)
+    return fake
+
+
+def test_invalidate_reaches_other_workers(redis):
+    # Two uvicorn workers sharing Redis
+    first = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=True)
+    second = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=True)
+    user = make_user()
+    exp = int(time.time()) + 3600
+
+    assert first.get(str(user.id), exp) is None
+    first.put(str(user.id), exp, user)
+    assert second.get(str(user.id), exp).role == "user"  # from Redis, now cached locally too
+
+    # Suspended through the first worker: the second's local entry is stale now
+    first.invalidate(user.id)
+    assert second.get(str(user.id), exp) is None
+    assert first.get(str(user.id), exp) is None
+
+    user.status = "suspended"
+    second.put(str(user.id), exp, user)
+    assert first.get(str(user.id), exp).status == "suspended"
+
+
+def test_read_racing_an_invalidation_is_not_cached_as_current(redis):
+    first = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=True)
+    second = PrincipalCache(max_entries=10, ttl_seconds=60, use_redis=True)
+    user = make_user()
+    exp = int(time.time()) + 3600
+
+    assert first.get(str(user.id), exp) is None
+    # While the first worker reads the user row, the second demotes the user
+    second.invalidate(user.id)
+    first.put(str(user.id), exp, user)  # the row read before the change
+
+    assert first.get(str(user.id), exp) is None
+    assert second.get(str(user.id), exp) is None
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+
+def test_get_current_user_skips_db_when_warm(session, monkeypatch):
+    monkeypatch.setattr(dependencies, "SUPABASE_JWT_SECRET", SECRET)
+    principal_cache.clear()
+    user = make_user()
+    session.add(user)
+    session.commit()
+
+    token = jwt.encode({"sub": str(user.id), "exp": int(time.time()) + 3600}, SECRET, algorithm="HS256")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    first = dependencies.get_current_user(credentials, session)
+    assert first.id == user.id
+
+    # A warm request must not touch the session at all
+    second = dependencies.get_current_user(credentials, None)
+    assert second.id == user.id
+    principal_cache.clear()
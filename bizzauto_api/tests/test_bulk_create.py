@@ -0,0 +1,93 @@
+import sys
+import os
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from database import get_db, TestingSessionLocal, test_engine
+from dependencies import get_current_user, set_rls_context
+import crud
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[set_rls_context] = lambda: session
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def test_bulk_create_products_reports_row_errors(client, session, user):
+    duplicate_id = str(uuid4())
+    rows = [
+        {"name": "Tea", "sale_price": 120, "stock_quantity": 10},
+        {"sale_price": 50},  # missing name
+        {"name": "Sugar", "id": duplicate_id},
+        {"name": "Sugar again", "id": duplicate_id},  # primary key clash
+        "not an object",
+        {"name": "Milk", "stock_quantity": "lots"},
+    ]
+    response = client.post("/api/products/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["created"] == 2
+    assert [error["index"] for error in data["errors"]] == [1, 3, 4, 5]
+    assert "name" in data["errors"][0]["error"]
+
+    products = session.query(sql_models.Product).filter(sql_models.Product.company_id == user.company_id).all()
+    assert sorted(p.name for p in products) == ["Sugar", "Tea"]
+    assert {str(p.id) for p in products} == set(data["ids"])
+    assert all(p.user_id == user.id for p in products)
+
+
+def test_bulk_create_clients_and_expenses(client, session, user):
+    response = client.post("/api/clients/bulk", json=[{"name": f"Client {i}"} for i in range(25)])
+    assert response.json()["created"] == 25
+
+    response = client.post("/api/expenses/bulk", json=[
+        {"title": "Rent", "amount": 1000, "expense_date": "2025-01-01"},
+        {"title": "Power", "amount": 200, "notes": "January"},
+    ])
+    assert response.json() == {"created": 2, "ids": response.json()["ids"], "errors": []}
+    assert session.query(sql_models.Expense).filter(sql_models.Expense.company_id == user.company_id).count() == 2
+
+
+def test_bulk_insert_batches_in_one_commit(session, user, monkeypatch):
+    monkeypatch.setattr(crud, "BULK_BATCH_SIZE", 3)
+    commits = []
+    monkeypatch.setattr(session, "commit", lambda: commits.append(1) or type(session).commit(session))
+
+    created, errors = crud.bulk_insert(session, sql_models.Client, [(i, {"name": f"C{i}", "company_id": user.company_id}) for i in range(10)])
+
+    assert [index for index, _ in created] == list(range(10))
+    assert errors == []
+    assert commits == [1]
+    assert session.query(sql_models.Client).count() == 10
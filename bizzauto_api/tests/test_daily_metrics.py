@@ -0,0 +1,101 @@
+import sys
+import os
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import TestingSessionLocal, test_engine
+from models import Expense as PydanticExpense
+import crud
+import daily_metrics
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="user")
+def user_fixture(session):
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    return user
+
+
+def rollup(session):
+    rows = session.query(sql_models.CompanyDailyMetric).all()
+    return {(r.company_id, r.day, r.metric): (r.count, round(r.amount, 2)) for r in rows if r.count}
+
+
+def assert_matches_rebuild(session):
+    incremental = rollup(session)
+    daily_metrics.rebuild(session.connection())
+    session.commit()
+    assert incremental == rollup(session)
+    return incremental
+
+
+def test_rollup_follows_orm_writes(session, user):
+    paid = sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=100.0, payment_status="paid")
+    unpaid = sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=40.0)
+    undated = sql_models.Purchase(company_id=user.company_id, user_id=user.id, total_amount=7.5)
+    session.add_all([paid, unpaid, undated, sql_models.WhatsappLog(company_id=user.company_id, user_id=user.id, phone="1", message="hi")])
+    session.commit()
+
+    metrics = assert_matches_rebuild(session)
+    assert metrics[(user.company_id, date(2025, 1, 10), "invoice:paid")] == (1, 100.0)
+    assert metrics[(user.company_id, date(2025, 1, 10), "invoice:unpaid")] == (1, 40.0)
+    assert metrics[(user.company_id, daily_metrics.UNDATED, "purchase")] == (1, 7.5)
+
+    # Status change and re-dating on an expired instance move the row between buckets
+    unpaid.payment_status = "paid"
+    unpaid.invoice_date = date(2025, 2, 1)
+    session.commit()
+    metrics = assert_matches_rebuild(session)
+    assert (user.company_id, date(2025, 1, 10), "invoice:unpaid") not in metrics
+    assert metrics[(user.company_id, date(2025, 2, 1), "invoice:paid")] == (1, 40.0)
+
+    crud.delete_invoice(session, paid.id)
+    metrics = assert_matches_rebuild(session)
+    assert (user.company_id, date(2025, 1, 10), "invoice:paid") not in metrics
+
+
+def test_rollup_follows_crud_and_bulk_writes(session, user):
+    expense = crud.create_expense(session, PydanticExpense(title="Rent", amount=1000, expense_date=date(2025, 3, 1)), user.id, user.company_id)
+    crud.bulk_create_expenses(session, [
+        (0, PydanticExpense(title="Power", amount=200, expense_date=date(2025, 3, 1))),
+        (1, PydanticExpense(title="Misc", amount=5, expense_date=date(2025, 3, 2))),
+    ], user.id, user.company_id)
+    crud.update_expense(session, expense.id, PydanticExpense(title="Rent", amount=900), company_id=user.company_id)
+
+    metrics = assert_matches_rebuild(session)
+    assert metrics[(user.company_id, date(2025, 3, 1), "expense")] == (2, 1100.0)
+    assert metrics[(user.company_id, date(2025, 3, 2), "expense")] == (1, 5.0)
+
+
+def test_rebuild_repairs_one_company(session, user):
+    other = sql_models.Company(id=uuid4(), name="Other Co")
+    session.add_all([
+        other,
+        sql_models.Expense(company_id=user.company_id, user_id=user.id, title="A", amount=10, expense_date=date(2025, 1, 1)),
+        sql_models.Expense(company_id=other.id, user_id=user.id, title="B", amount=20, expense_date=date(2025, 1, 1)),
+    ])
+    session.commit()
+    # Drift: writes that bypassed the ORM
+    session.query(sql_models.CompanyDailyMetric).update({"amount": 0})
+    session.commit()
+
+    daily_metrics.rebuild(session.connection(), user.company_id)
+    session.commit()
+    metrics = rollup(session)
+    assert metrics[(user.company_id, date(2025, 1, 1), "expense")] == (1, 10.0)
+    assert metrics[(other.id, date(2025, 1, 1), "expense")] == (1, 0.0)
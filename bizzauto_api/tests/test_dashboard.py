@@ -0,0 +1,112 @@
+import sys
+import os
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import event
+from database import get_async_db, get_async_test_db, async_test_engine, TestingSessionLocal, test_engine
+from dependencies import get_current_user
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    # Create the table
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    # Drop the table
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    app.dependency_overrides[get_async_db] = get_async_test_db
+
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def test_dashboard_summary(client, session, user):
+    session.add_all([
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=100.0, payment_status="paid"),
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 20), total_amount=50.0, payment_status="unpaid"),
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 2, 5), total_amount=25.0, payment_status="paid"),
+        sql_models.Client(company_id=user.company_id, user_id=user.id, name="Client A"),
+        sql_models.Product(company_id=user.company_id, user_id=user.id, name="Low", stock_quantity=1, low_stock_alert=5),
+        sql_models.Product(company_id=user.company_id, user_id=user.id, name="Plenty", stock_quantity=50, low_stock_alert=5),
+        sql_models.WhatsappLog(company_id=user.company_id, user_id=user.id, phone="923001234567", message="hi"),
+    ])
+    session.commit()
+
+    response = client.get("/dashboard/summary")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["stats"] == {
+        "total_revenue": 125.0,
+        "pending_payments": 50.0,
+        "active_clients": 1,
+        "low_stock_items": 1,
+        "messages_sent": 1,
+    }
+    assert {"month": "Jan", "value": 150.0} in data["revenue_trend"]
+    assert {"name": "paid", "value": 2} in data["payment_status"]
+
+
+def test_dashboard_summary_counts_the_whole_company(client, session, user):
+    colleague = sql_models.User(id=uuid4(), company_id=user.company_id, email="clerk@test.com", full_name="Clerk", role="user")
+    other_company = sql_models.Company(id=uuid4(), name="Other Co")
+    session.add_all([colleague, other_company])
+    session.add_all([
+        sql_models.Invoice(company_id=user.company_id, user_id=colleague.id, invoice_date=date(2025, 1, 10), total_amount=40.0, payment_status="paid"),
+        sql_models.Client(company_id=user.company_id, user_id=user.id, name="Mine"),
+        sql_models.Client(company_id=user.company_id, user_id=colleague.id, name="Colleague's"),
+        sql_models.Client(company_id=other_company.id, user_id=uuid4(), name="Elsewhere"),
+        sql_models.Product(company_id=user.company_id, user_id=colleague.id, name="Low", stock_quantity=1, low_stock_alert=5),
+    ])
+    session.commit()
+
+    stats = client.get("/dashboard/summary").json()["stats"]
+    # The colleague's invoice is in the revenue, so their clients and products are counted too
+    assert (stats["total_revenue"], stats["active_clients"], stats["low_stock_items"]) == (40.0, 2, 1)
+
+
+def test_dashboard_summary_is_sql_aggregated(client, session, user):
+    session.add_all([sql_models.Client(company_id=user.company_id, user_id=user.id, name=f"Client {i}") for i in range(1005)])
+    session.add_all([
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2024, 1, 5), total_amount=10.0, payment_status="paid"),
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 3, 5), total_amount=5.0, payment_status="paid"),
+    ])
+    session.commit()
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/dashboard/summary")
+    finally:
+        event.remove(async_test_engine.sync_engine, "before_cursor_execute", record)
+
+    data = response.json()
+    assert data["stats"]["active_clients"] == 1005  # no longer capped at 1,000 rows
+    assert data["stats"]["total_revenue"] == 15.0
+    assert data["revenue_trend"] == [{"month": "Jan", "value": 10.0}, {"month": "Mar", "value": 5.0}]
+    assert len(statements) == 2
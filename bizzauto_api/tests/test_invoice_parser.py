@@ -0,0 +1,42 @@
+import sys
+import os
+import glob
+import json
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import invoice_parser
+import pytest
+
+# Each <name>.txt is OCR text; <name>.json is what the parser returned for it
+# before the single-pass rewrite. If a parsing change is deliberate,
+# regenerate the JSON with invoice_parser.parse and bump ocr_cache.PARSER_VERSION.
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "invoice_parser")
+CASES = sorted(os.path.basename(path)[:-4] for path in glob.glob(os.path.join(FIXTURES, "*.txt")))
+
+
+def read_case(name):
+    with open(os.path.join(FIXTURES, f"{name}.txt")) as f:
+        text = f.read()
+    with open(os.path.join(FIXTURES, f"{name}.json")) as f:
+        expected = json.load(f)
+    return text, expected
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_parse_matches_golden_output(name):
+    text, expected = read_case(name)
+    assert json.loads(json.dumps(invoice_parser.parse(text))) == expected
+
+
+def test_golden_cases_cover_inventory_and_invoice_paths():
+    inventory = {name for name in CASES if invoice_parser.parse_inventory_format(read_case(name)[0])}
+    assert {"inventory_report", "inventory_csv", "inventory_comma"} <= inventory
+    assert {"simple_invoice", "layout_table", "flat_split_columns", "empty"}.isdisjoint(inventory)
+
+
+def test_description_and_numbers_on_separate_lines_still_pair_up():
+    # OCR put each column on its own lines: the item pattern matches across them
+    text, _ = read_case("flat_split_columns")
+    assert invoice_parser.parse(text)["line_items"][0] == {"name": "Steel Cable", "quantity": 2, "price": 2.5, "total": 5.0}
@@ -0,0 +1,185 @@
+import sys
+import os
+import threading
+from uuid import UUID, uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from database import get_async_db, get_async_test_db, get_supabase, TestingSessionLocal, test_engine
+from dependencies import get_current_user
+from fake_redis import FakeRedis
+import executors
+import invoice_jobs
+import ocr_engine
+import ocr_processing
+import redis_client
+import sql_models
+import pytest
+
+PARSED = {
+    "invoice_date": "2025-01-10",
+    "total_amount": 10.0,
+    "line_items": [{"name": "Widget", "quantity": 2, "price": 5.0, "total": 10.0}],
+}
+
+
+class FakeBucket:
+    def __init__(self, ocr_started):
+        self.ocr_started = ocr_started
+        self.wait_for_ocr = True
+        self.overlapped = False
+        self.files = {}
+
+    def upload(self, path, file, file_options):
+        # Only returns True if OCR starts while the upload is still in progress
+        if self.wait_for_ocr:
+            self.overlapped = self.ocr_started.wait(timeout=5)
+        self.files[path] = file
+
+    def download(self, path):
+        return self.files[path]
+
+    def create_signed_url(self, path, expires_in):
+        return {"signedURL": f"https://storage.test/{path}"}
+
+
+class FakeSupabase:
+    def __init__(self, bucket):
+        self.storage = self
+        self.bucket = bucket
+
+    def from_(self, name):
+        return self.bucket
+
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="bucket")
+def bucket_fixture(monkeypatch):
+    ocr_started = threading.Event()
+    bucket = FakeBucket(ocr_started)
+
+    def fake_extract(file_content):
+        ocr_started.set()
+        return "Widget 2 5.00"
+
+    monkeypatch.setattr(ocr_processing, "extract_text_from_file", fake_extract)
+    monkeypatch.setattr(ocr_processing, "parse_invoice_text", lambda text: dict(PARSED))
+    return bucket
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", fake)
+    monkeypatch.setattr(redis_client, "_redis_unavailable_until", 0.0)
+    return fake
+
+@pytest.fixture(name="client")
+def client_fixture(session, bucket, redis):
+    app.dependency_overrides[get_async_db] = get_async_test_db
+    app.dependency_overrides[get_supabase] = lambda: FakeSupabase(bucket)
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def upload(client, **params):
+    return client.post("/api/invoice-processing/upload-invoice", params=params, files={"file": ("invoice.png", b"\x89PNG fake", "image/png")})
+
+
+def test_upload_runs_storage_and_ocr_concurrently(client, session, user, bucket):
+    response = upload(client)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["items_processed"] == 1
+    assert body["file_url"].startswith(f"https://storage.test/{user.company_id}/")
+    assert bucket.overlapped
+    assert session.get(sql_models.Invoice, UUID(body["invoice_id"])) is not None
+
+
+def test_upload_is_refused_when_the_ocr_pool_is_full(client, user, bucket, monkeypatch):
+    monkeypatch.setattr(executors.ocr_pool, "in_flight", executors.ocr_pool.max_workers + executors.ocr_pool.max_pending)
+    response = upload(client)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_async_upload_queues_a_job_the_worker_completes(client, session, user, bucket, redis):
+    bucket.wait_for_ocr = False
+    response = upload(client, mode="async")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    status_url = response.headers["Location"]
+    assert status_url == f"/api/invoice-processing/jobs/{job_id}"
+    assert client.get(status_url).json()["stage"] == "queued"
+
+    # What a worker thread does after BLPOP
+    assert redis.lpop(invoice_jobs.QUEUE_KEY) == job_id
+    invoice_jobs.process(job_id, FakeSupabase(bucket), TestingSessionLocal)
+
+    status = client.get(status_url).json()
+    assert (status["status"], status["stage"], status["progress"], status["items_processed"]) == ("done", "done", 1.0, 1)
+    assert set(status["stages"]) == set(invoice_jobs.STAGES)
+    assert session.get(sql_models.Invoice, UUID(status["invoice_id"])) is not None
+
+    other = sql_models.User(id=uuid4(), company_id=uuid4(), email="other@test.com", role="user")
+    app.dependency_overrides[get_current_user] = lambda: other
+    assert client.get(status_url).status_code == 404
+
+
+def test_failed_job_records_the_error(client, user, bucket, redis, monkeypatch):
+    bucket.wait_for_ocr = False
+    monkeypatch.setattr(ocr_processing, "parse_invoice_text", lambda text: {"line_items": []})
+    job_id = upload(client, mode="async").json()["job_id"]
+    invoice_jobs.process(job_id, FakeSupabase(bucket), TestingSessionLocal)
+
+    status = client.get(f"/api/invoice-processing/jobs/{job_id}").json()
+    assert (status["status"], status["stage"], status["invoice_id"]) == ("failed", "parsing", None)
+    assert "line items" in status["error"]
+
+
+def test_multi_file_upload_batches_ocr_and_reports_each_file(client, session, user, bucket, monkeypatch):
+    bucket.wait_for_ocr = False
+    monkeypatch.setattr(ocr_engine, "VISION_BATCH_SIZE", 2)
+    batches = []
+
+    def fake_extract_many(files):
+        batches.append(len(files))
+        return [file_content.decode() for file_content in files]
+
+    monkeypatch.setattr(ocr_processing, "extract_texts_from_files", fake_extract_many)
+    monkeypatch.setattr(ocr_processing, "parse_invoice_text", lambda text: dict(PARSED) if text != "blank" else {"line_items": []})
+    files = [("files", (f"invoice{i}.jpg", f"invoice {i}".encode(), "image/jpeg")) for i in range(4)]
+    files += [("files", ("blank.png", b"blank", "image/png")), ("files", ("notes.txt", b"hi", "text/plain"))]
+
+    response = client.post("/api/invoice-processing/upload-invoices", files=files)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (4, 2)
+    assert sorted(batches) == [1, 2, 2]
+    assert [r["filename"] for r in body["results"]] == ["invoice0.jpg", "invoice1.jpg", "invoice2.jpg", "invoice3.jpg", "blank.png", "notes.txt"]
+    assert all(r["success"] and r["items_processed"] == 1 for r in body["results"][:4])
+    assert body["results"][4]["error"] == "Could not parse any line items from the invoice."
+    assert body["results"][5]["error"].startswith("Invalid file type")
+    assert len(bucket.files) == 5
+    assert session.query(sql_models.Invoice).count() == 4
@@ -0,0 +1,159 @@
+import sys
+import os
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import func, insert
+from database import get_db, TestingSessionLocal, test_engine
+from dependencies import get_current_user, set_rls_context
+from models import Expense as PydanticExpense
+import crud
+import ledger
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[set_rls_context] = lambda: session
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def balances(session, company_id):
+    accounts = session.query(sql_models.Account).filter(sql_models.Account.company_id == company_id).all()
+    return {account.name: round(account.balance, 2) for account in accounts}
+
+
+def test_postings_keep_balances_and_trial_balance(client, session, user):
+    invoice = sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=100.0)
+    purchase = sql_models.Purchase(company_id=user.company_id, user_id=user.id, purchase_date=date(2025, 1, 5), total_amount=40.0)
+    session.add_all([invoice, purchase])
+    session.commit()
+    crud.create_expense(session, PydanticExpense(title="Rent", amount=25, expense_date=date(2025, 1, 15)), user.id, user.company_id)
+    client.post("/api/expenses/bulk", json=[{"title": "Power", "amount": 10, "expense_date": "2025-01-20"}])
+
+    invoice.payment_status = "paid"  # moves the receivable to cash
+    invoice.notes = "thanks"
+    session.commit()
+    invoice.notes = "no posting for this"
+    session.commit()
+    session.delete(purchase)
+    session.commit()
+
+    assert balances(session, user.company_id) == {
+        ledger.CASH: 65.0,
+        ledger.ACCOUNTS_RECEIVABLE: 0.0,
+        ledger.SALES_REVENUE: 100.0,
+        ledger.INVENTORY: 0.0,
+        ledger.ACCOUNTS_PAYABLE: 0.0,
+        ledger.OPERATING_EXPENSES: 35.0,
+    }
+    # 1 invoice + 1 purchase + 2 expenses + paid re-post (2) + purchase reversal, two lines each
+    assert session.query(sql_models.JournalEntry).count() == 14
+    debit, credit = session.query(func.sum(sql_models.JournalEntry.debit), func.sum(sql_models.JournalEntry.credit)).one()
+    assert debit == credit
+
+    trial = client.get("/api/accounting/trial_balance").json()
+    assert trial["balanced"] is True
+    assert trial["total_debit"] == 100.0
+    assert {line["name"]: (line["debit"], line["credit"]) for line in trial["lines"]}[ledger.SALES_REVENUE] == (0, 100.0)
+
+
+def test_account_ledger_pages(client, session, user):
+    session.add_all([
+        sql_models.Expense(company_id=user.company_id, user_id=user.id, title=f"E{i}", amount=1 + i, expense_date=date(2025, 2, 1 + i))
+        for i in range(5)
+    ])
+    session.commit()
+    cash = session.query(sql_models.Account).filter_by(company_id=user.company_id, name=ledger.CASH).one()
+
+    pages, cursor = [], None
+    while True:
+        response = client.get(f"/api/accounting/accounts/{cash.id}/ledger", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        pages.append([entry["credit"] for entry in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert pages == [[1.0, 2.0], [3.0, 4.0], [5.0]]
+    assert client.get(f"/api/accounting/accounts/{uuid4()}/ledger").status_code == 404
+
+
+def test_post_missing_backfills_once(session, user):
+    session.execute(insert(sql_models.Invoice).values(id=uuid4(), company_id=user.company_id, user_id=user.id, invoice_date=date(2024, 12, 1), total_amount=30.0))
+    session.commit()
+    assert session.query(sql_models.JournalEntry).count() == 0
+
+    assert ledger.post_missing(session.connection()) == 1
+    session.commit()
+    assert ledger.post_missing(session.connection()) == 0
+    assert balances(session, user.company_id) == {ledger.ACCOUNTS_RECEIVABLE: 30.0, ledger.SALES_REVENUE: 30.0}
+
+
+def test_lock_ledgers_locks_companies_in_a_fixed_order():
+    class Recorder:
+        def __init__(self, dialect):
+            self.dialect = type("Dialect", (), {"name": dialect})()
+            self.calls = []
+
+        def execute(self, statement, params):
+            self.calls.append((str(statement), params))
+
+    companies = [uuid4() for _ in range(3)]
+    first, second = Recorder("postgresql"), Recorder("postgresql")
+    ledger.lock_ledgers(first, companies)
+    ledger.lock_ledgers(second, list(reversed(companies)))
+    assert first.calls == second.calls
+    assert [params["key"] for _, params in first.calls] == [ledger._lock_key(c) for c in sorted(companies, key=str)]
+    assert all("pg_advisory_xact_lock" in sql and params["namespace"] == ledger.LEDGER_LOCK_NAMESPACE for sql, params in first.calls)
+
+    sqlite = Recorder("sqlite")
+    ledger.lock_ledgers(sqlite, companies)
+    assert sqlite.calls == []
+
+
+def test_account_created_concurrently_is_reused(session, user, monkeypatch):
+    existing = sql_models.Account(id=uuid4(), company_id=user.company_id, user_id=user.id, name=ledger.CASH, type=ledger.ASSET, balance=0.0)
+    session.add(existing)
+    session.commit()
+    # Our first select ran before the other transaction committed the account
+    select_accounts, calls = ledger._select_accounts, []
+
+    def stale_first_select(*args):
+        calls.append(args)
+        return {} if len(calls) == 1 else select_accounts(*args)
+
+    monkeypatch.setattr(ledger, "_select_accounts", stale_first_select)
+
+    accounts = ledger._account_ids(session.connection(), user.company_id, user.id, [ledger.CASH])
+
+    assert accounts == {ledger.CASH: (existing.id, ledger.ASSET)}
+    assert session.query(sql_models.Account).filter_by(company_id=user.company_id).count() == 1
@@ -0,0 +1,122 @@
+import sys
+import os
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from migrations import applied_versions, discover, pending, run_migrations
+from migrations.m0001_hot_path_indexes import INDEXES as HOT_PATH_INDEXES
+from migrations.m0003_analytics_indexes import INDEXES as ANALYTICS_INDEXES
+from migrations.m0004_ledger_indexes import INDEXES as LEDGER_INDEXES
+from migrations.m0005_period_close_indexes import INDEXES as PERIOD_CLOSE_INDEXES
+from migrations.m0006_unique_account_names import DROPPED as UNIQUE_ACCOUNT_DROPPED, INDEXES as UNIQUE_ACCOUNT_INDEXES
+from migrations.m0007_whatsapp_log_order import DROPPED as WHATSAPP_LOG_DROPPED, INDEXES as WHATSAPP_LOG_INDEXES
+import daily_metrics
+import sql_models
+import pytest
+
+DROPPED = UNIQUE_ACCOUNT_DROPPED + WHATSAPP_LOG_DROPPED
+# Indexes the migrations leave behind
+INDEXES = [index for index in HOT_PATH_INDEXES + ANALYTICS_INDEXES + LEDGER_INDEXES + PERIOD_CLOSE_INDEXES + UNIQUE_ACCOUNT_INDEXES + WHATSAPP_LOG_INDEXES
+           if index[0] not in DROPPED]
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def index_names(engine):
+    # sqlite_master rather than inspect(): the inspector skips expression indexes
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+
+
+def test_model_indexes_match_migration():
+    declared = {index.name for table in sql_models.Base.metadata.tables.values() for index in table.indexes}
+    assert {name for name, _, _ in INDEXES} <= declared
+
+
+def test_migrations_upgrade_existing_database(engine):
+    # An existing database: tables created before the index pack existed
+    sql_models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name, _, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    assert not {name for name, _, _ in INDEXES} & index_names(engine)
+
+    applied = run_migrations(engine)
+
+    assert applied == [f"{version:04d}_{name}" for version, name, _ in discover()]
+    assert {name for name, _, _ in INDEXES} <= index_names(engine)
+    assert not set(DROPPED) & index_names(engine)
+    assert applied_versions(engine) == {version for version, _, _ in discover()}
+
+
+def test_migrations_are_applied_once(engine):
+    sql_models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    assert pending(engine) == []
+    assert run_migrations(engine) == []
+
+
+def test_unique_account_names_merges_duplicates(engine):
+    sql_models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_accounts_company_name"))
+    company, first, second = uuid4(), uuid4(), uuid4()
+    keep, duplicate = sorted([first, second], key=str)
+    with Session(engine) as session:
+        session.add(sql_models.Company(id=company, name="Dup Co"))
+        session.add_all([
+            sql_models.Account(id=account_id, company_id=company, name="Cash", type="Asset", balance=balance)
+            for account_id, balance in ((keep, 10.0), (duplicate, -4.0))
+        ])
+        session.add_all([
+            sql_models.JournalEntry(id=uuid4(), company_id=company, account_id=account_id, date=date(2025, 1, 5), debit=debit, credit=credit)
+            for account_id, debit, credit in ((keep, 10.0, 0.0), (duplicate, 0.0, 4.0))
+        ])
+        session.add_all([
+            sql_models.AccountPeriodBalance(account_id=keep, period=date(2025, 1, 1), company_id=company, debit=10.0, credit=0.0, closing_balance=10.0),
+            sql_models.AccountPeriodBalance(account_id=duplicate, period=date(2025, 1, 1), company_id=company, debit=0.0, credit=4.0, closing_balance=-4.0),
+        ])
+        session.commit()
+
+    run_migrations(engine)
+
+    with Session(engine) as session:
+        assert [(a.id, a.balance) for a in session.query(sql_models.Account)] == [(keep, 6.0)]
+        assert {e.account_id for e in session.query(sql_models.JournalEntry)} == {keep}
+        snapshot = session.query(sql_models.AccountPeriodBalance).one()
+        assert (snapshot.account_id, snapshot.debit, snapshot.credit, snapshot.closing_balance) == (keep, 10.0, 4.0, 6.0)
+        session.add(sql_models.Account(id=uuid4(), company_id=company, name="Cash", type="Asset", balance=0.0))
+        with pytest.raises(IntegrityError):
+            session.commit()
+
+
+def test_existing_whatsapp_logs_stay_undated(engine):
+    sql_models.Base.metadata.create_all(bind=engine)
+    company = uuid4()
+    with Session(engine) as session:
+        session.add(sql_models.Company(id=company, name="Old Co"))
+        session.commit()
+    # Logs written before the column existed: no created_at, not even the model default
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO whatsapp_logs (id, company_id, phone, message) VALUES (:id, :company, '923001234567', 'hi')"),
+                     [{"id": uuid4().hex, "company": company.hex} for _ in range(3)])
+
+    run_migrations(engine)
+
+    with Session(engine) as session:
+        assert {log.created_at for log in session.query(sql_models.WhatsappLog)} == {None}
+        rollup = [(row.day, row.metric, row.count) for row in session.query(sql_models.CompanyDailyMetric)]
+        assert rollup == [(daily_metrics.UNDATED, daily_metrics.WHATSAPP_MESSAGE, 3)]
@@ -0,0 +1,135 @@
+import sys
+import os
+import json
+import time
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_redis import FakeRedis
+import ocr_cache
+import ocr_processing
+import redis_client
+import pytest
+
+
+class CountingEngine:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def detect_text(self, content=None, uri=None, feature=None):
+        self.calls += 1
+        return self.text
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(monkeypatch):
+    engine = CountingEngine("Invoice Date: 2025-01-10\nWidget 2 5.00 10.00\nTotal: 10.00")
+    monkeypatch.setattr(ocr_processing.ocr_engine, "get_engine", lambda: engine)
+    return engine
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", fake)
+    monkeypatch.setattr(redis_client, "_redis_unavailable_until", 0.0)
+    return fake
+
+
+def test_repeat_upload_skips_vision_and_parsing(engine, redis, monkeypatch):
+    cache = ocr_cache.OcrCache(ocr_cache.RedisStore())
+    monkeypatch.setattr(ocr_cache, "_cache", cache)
+    parses = []
+    real_parse = ocr_processing._parse_invoice_text
+    monkeypatch.setattr(ocr_processing, "_parse_invoice_text", lambda text: parses.append(text) or real_parse(text))
+
+    first = ocr_processing.parse_invoice_text(ocr_processing.extract_text_from_file(b"%PDF same bytes"))
+    again = ocr_processing.parse_invoice_text(ocr_processing.extract_text_from_file(b"%PDF same bytes"))
+    assert again == first
+    assert (engine.calls, len(parses)) == (1, 1)
+    assert f"ocr:text:{ocr_cache.TEXT_VERSION}:{ocr_cache.digest(b'%PDF same bytes')}" in redis.values
+
+    ocr_processing.extract_text_from_file(b"another file")
+    assert engine.calls == 2
+    assert cache.stats()["text"] == {"hits": 1, "misses": 2, "hit_rate": 0.333}
+    assert cache.stats()["parsed"]["hit_rate"] == 0.5
+
+
+def test_disk_store_evicts_least_recently_used(tmp_path):
+    store = ocr_cache.DiskStore(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    value = "x" * 50  # ~100 bytes per entry with the envelope
+    store.put("text:a", value)
+    store.put("text:b", value)
+    assert store.get("text:a") == value  # a is now more recent than b
+    store.put("text:c", value)
+
+    assert store.get("text:b") is None
+    assert store.get("text:a") == value
+    assert store.get("text:c") == value
+
+    # A fresh store rebuilds its index from the directory
+    assert ocr_cache.DiskStore(str(tmp_path), max_bytes=250, ttl_seconds=60).get("text:c") == value
+
+
+def test_disk_stores_share_one_directory(tmp_path):
+    # Two app workers with one cache directory
+    first = ocr_cache.DiskStore(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    second = ocr_cache.DiskStore(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    value = "x" * 50  # ~100 bytes per entry with the envelope
+    first.put("text:a", value)
+    assert second.get("text:b") is None  # second has indexed the directory now
+    first.put("text:b", value)
+    assert second.get("text:b") == value
+
+    second.put("text:c", value)
+    assert len(os.listdir(tmp_path)) == 2
+    assert first.get("text:a") is None
+    assert first.get("text:b") == second.get("text:c") == value
+
+
+def test_disk_store_rescans_only_near_the_limit(tmp_path, monkeypatch):
+    value = "x" * 50
+    entry_size = len(json.dumps({"stored_at": time.time(), "value": value}))
+    max_bytes = 9 * entry_size + entry_size // 2
+    store = ocr_cache.DiskStore(str(tmp_path), max_bytes=max_bytes, ttl_seconds=60, scan_seconds=3600)
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(ocr_cache.os, "scandir", lambda path: scans.append(path) or scandir(path))
+    for n in range(9):
+        store.put(f"text:{n}", value)
+    assert len(scans) == 1  # the first put loads the index, the next eight only count their bytes
+
+    store.put("text:9", value)  # over the limit, so the directory is counted
+    assert len(scans) == 2
+    assert sum(entry.stat().st_size for entry in scandir(tmp_path)) <= max_bytes * 0.9
+
+
+def test_entry_evicted_during_get_is_a_miss(tmp_path, engine, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "_cache", ocr_cache.OcrCache(ocr_cache.DiskStore(str(tmp_path), max_bytes=10_000, ttl_seconds=60)))
+    ocr_processing.extract_text_from_file(b"invoice")
+
+    def evicted(path):
+        os.remove(path)  # another worker evicts the file between the read and the touch
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(ocr_cache.os, "utime", evicted)
+    assert ocr_processing.extract_text_from_file(b"invoice") == engine.text
+    assert engine.calls == 2
+
+
+def test_failing_store_does_not_fail_extraction(tmp_path, engine):
+    cache_dir = tmp_path / "not-a-directory"
+    cache_dir.write_text("")
+    cache = ocr_cache.OcrCache(ocr_cache.DiskStore(str(cache_dir), max_bytes=10_000, ttl_seconds=60))
+    assert cache.get_text(b"invoice") is None
+    cache.put_text(b"invoice", "text")
+    assert cache.stats()["text"]["misses"] == 1
+
+
+def test_disk_store_expires_entries(tmp_path, monkeypatch):
+    store = ocr_cache.DiskStore(str(tmp_path), max_bytes=10_000, ttl_seconds=60)
+    store.put("parsed:1:abc", '{"line_items": []}')
+    now = time.time()
+    monkeypatch.setattr(ocr_cache.time, "time", lambda: now + 61)
+    assert store.get("parsed:1:abc") is None
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,168 @@
+import sys
+import os
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.cloud import vision
+from PyPDF2 import PdfWriter
+import ocr_cache
+import ocr_engine
+import ocr_processing
+import ocr_tasks
+import pytest
+
+
+class FakeVisionClient:
+    """Answers every call with the same annotate response and records the calls."""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+        self.pdf_pages = 0
+
+    def document_text_detection(self, image):
+        self.calls.append(("document", image))
+        return self.response
+
+    def text_detection(self, image):
+        self.calls.append(("text", image))
+        return self.response
+
+    def batch_annotate_files(self, requests):
+        # Without explicit pages Vision reads the first pages of the file
+        pages = list(requests[0].pages) or [1, 2]
+        self.calls.append(("pdf", pages))
+        time.sleep(0.1)
+        return vision.BatchAnnotateFilesResponse(responses=[vision.AnnotateFileResponse(
+            responses=[annotate(full_text=f"page {page}") for page in pages],
+            total_pages=self.pdf_pages,
+        )])
+
+    def batch_annotate_images(self, requests):
+        self.calls.append(("batch", requests))
+        return vision.BatchAnnotateImagesResponse(responses=[
+            annotate(error="bad image") if r.image.content == b"bad" else annotate(full_text=r.image.content.decode())
+            for r in requests
+        ])
+
+
+def annotate(full_text="", texts=(), error=""):
+    return vision.AnnotateImageResponse(
+        full_text_annotation=vision.TextAnnotation(text=full_text),
+        text_annotations=[vision.EntityAnnotation(description=t) for t in texts],
+        error={"message": error},
+    )
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(monkeypatch):
+    client = FakeVisionClient(annotate())
+    engine = ocr_engine.OcrEngine(client_factory=lambda: client)
+    engine.fake = client
+    monkeypatch.setattr(ocr_engine, "_engine", engine)
+    monkeypatch.setattr(ocr_cache, "_cache", ocr_cache.OcrCache(None))
+    return engine
+
+
+def test_client_is_created_once_across_threads():
+    created = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        created.append(1)
+        return object()
+
+    engine = ocr_engine.OcrEngine(client_factory=factory)
+    clients = []
+
+    def use():
+        barrier.wait()
+        clients.append(engine.client)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert len({id(c) for c in clients}) == 1
+
+
+def test_document_detection_reads_text_annotations_without_second_call(engine):
+    engine.fake.response = annotate(full_text="", texts=["INVOICE 42"])
+    assert engine.detect_text(b"img") == "INVOICE 42"
+    assert [feature for feature, _ in engine.fake.calls] == ["document"]
+
+    engine.fake.response = annotate(full_text="Item A 2 10.00", texts=["ignored"])
+    assert engine.detect_text(b"img") == "Item A 2 10.00"
+    assert engine.timings()["document"]["count"] == 2
+
+
+def test_api_error_raises_and_is_still_timed(engine):
+    engine.fake.response = annotate(error="quota exceeded")
+    with pytest.raises(ocr_engine.OcrError):
+        engine.detect_text(b"img", feature=ocr_engine.TEXT)
+    assert engine.timings()["text"]["count"] == 1
+
+
+def test_modules_share_the_engine(engine):
+    engine.fake.response = annotate(full_text="Total: 50.00")
+    assert "Total" in ocr_processing.extract_text_from_file(b"img")
+
+    ocr_tasks.process_invoice_image_gcp(image_uri="gs://bucket/invoice.jpg")
+    feature, image = engine.fake.calls[-1]
+    assert feature == "text"
+    assert image.source.image_uri == "gs://bucket/invoice.jpg"
+    assert len(engine.fake.calls) == 2
+
+
+def test_batches_respect_the_vision_limit_and_isolate_errors(engine):
+    images = [f"invoice {i}".encode() for i in range(20)]
+    images[3] = b"bad"
+    texts = engine.detect_texts(images)
+
+    assert [len(requests) for _, requests in engine.fake.calls] == [16, 4]
+    assert isinstance(texts[3], ocr_engine.OcrError)
+    assert texts[:3] + texts[4:] == [f"invoice {i}" for i in range(20) if i != 3]
+    assert engine.timings()["document_batch"]["count"] == 2
+
+    # Only the failed file falls back; the others are cleaned up and cached
+    assert ocr_processing.extract_texts_from_files([b"invoice A", b"bad"]) == ["invoice A", ""]
+
+
+def pdf_with_pages(count: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(count):
+        writer.add_blank_page(width=200, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_pdf_pages_are_read_concurrently_in_page_order(engine):
+    engine.fake.pdf_pages = 12
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        started = time.perf_counter()
+        pages = engine.detect_pdf_pages(b"%PDF-", page_count=12, executor=executor)
+        elapsed = time.perf_counter() - started
+    assert pages == [f"page {n}" for n in range(1, 13)]
+    assert sorted(pages for _, pages in engine.fake.calls) == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11, 12]]
+    assert elapsed < 0.25  # three 100ms requests, not run one after another
+
+    # Unknown page count: Vision's default pages first, then the rest from total_pages
+    engine.fake.calls.clear()
+    assert engine.detect_pdf_pages(b"%PDF-") == [f"page {n}" for n in range(1, 13)]
+    assert [pages for _, pages in engine.fake.calls] == [[1, 2], [3, 4, 5, 6, 7], [8, 9, 10, 11, 12]]
+
+
+def test_extract_text_reads_every_pdf_page(engine):
+    engine.fake.pdf_pages = 7
+    text = ocr_processing.extract_text_from_file(pdf_with_pages(7))
+    positions = [text.index(f"page {n}") for n in range(1, 8)]
+    assert positions == sorted(positions)
+    assert all(feature == "pdf" for feature, _ in engine.fake.calls)
@@ -0,0 +1,111 @@
+import sys
+import os
+import math
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from google.cloud import vision
+import ocr_engine
+import ocr_layout
+import ocr_processing
+
+CHAR = 10  # px per character
+LINE = 30  # px between rows
+
+
+def word(text, x, y, skew=0):
+    right = x + CHAR * len(text)
+    return vision.Word(
+        bounding_box=vision.BoundingPoly(vertices=[
+            {"x": x, "y": y + skew}, {"x": right, "y": y + skew},
+            {"x": right, "y": y + skew + 20}, {"x": x, "y": y + skew + 20},
+        ]),
+        symbols=[vision.Symbol(text=c) for c in text],
+    )
+
+
+def block(*words):
+    return vision.Block(paragraphs=[vision.Paragraph(words=list(words))])
+
+
+def invoice_response():
+    """
+    A three-column invoice table where Vision returns the description column
+    as one block and the numbers as another, so the plain text lists every
+    description before any number. Rows are slightly skewed.
+    """
+    rows = [("Blue", "Widget", "2", "5.00"), ("Red", "Gadget", "1", "12.50"), ("Steel", "Cable", "4", "2.25")]
+    header = block(word("Item", 0, 0), word("Qty", 300, 0), word("Price", 400, 0))
+    names, numbers = [], []
+    for n, (first, second, qty, price) in enumerate(rows, start=1):
+        y = n * LINE
+        names += [word(first, 0, y), word(second, CHAR * (len(first) + 1), y, skew=2)]
+        numbers += [word(qty, 300, y, skew=3), word(price, 400, y, skew=-2)]
+    total = block(word("Total:", 300, 4 * LINE), word("29.50", 400, 4 * LINE))
+    flat = "Item Qty Price\nBlue Widget\nRed Gadget\nSteel Cable\n2\n5.00\n1\n12.50\n4\n2.25\nTotal: 29.50"
+    return vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(
+        text=flat,
+        pages=[vision.Page(blocks=[header, block(*names), block(*numbers), total])],
+    ))
+
+
+def test_rows_and_cells_from_word_boxes():
+    assert ocr_layout.response_rows(invoice_response()) == [
+        ["Item", "Qty", "Price"],
+        ["Blue Widget", "2", "5.00"],
+        ["Red Gadget", "1", "12.50"],
+        ["Steel Cable", "4", "2.25"],
+        ["Total:", "29.50"],
+    ]
+
+
+def test_layout_text_parses_into_line_items():
+    text = ocr_engine.response_text(invoice_response())
+    assert text.splitlines()[1] == "Blue Widget  2  5.00"
+
+    parsed = ocr_processing._parse_invoice_text(text)
+    assert parsed["total_amount"] == 29.5
+    assert {(item["name"], item["quantity"]) for item in parsed["line_items"]} >= {("Blue Widget", 2), ("Red Gadget", 1), ("Steel Cable", 4)}
+
+
+def test_words_from_text_detection_annotations():
+    response = vision.AnnotateImageResponse(text_annotations=[
+        vision.EntityAnnotation(description="ignored full text"),
+        *[vision.EntityAnnotation(description=w.symbols[0].text if len(w.symbols) == 1 else "".join(s.text for s in w.symbols), bounding_poly=w.bounding_box)
+          for w in [word("Widget", 0, 0), word("3", 300, 2), word("Bolt", 0, LINE), word("7", 300, LINE)]],
+    ])
+    assert ocr_layout.layout_text(response) == "Widget  3\nBolt  7"
+
+
+def tilted_word(text, x, y, degrees):
+    """word() rotated about the page origin, as on a scan fed in at an angle."""
+    sin, cos = math.sin(math.radians(degrees)), math.cos(math.radians(degrees))
+    corners = [(x, y), (x + CHAR * len(text), y), (x + CHAR * len(text), y + 20), (x, y + 20)]
+    return vision.Word(
+        bounding_box=vision.BoundingPoly(vertices=[{"x": round(cx * cos - cy * sin), "y": round(cx * sin + cy * cos)} for cx, cy in corners]),
+        symbols=[vision.Symbol(text=c) for c in text],
+    )
+
+
+def test_rows_survive_skew():
+    # 1500px wide: a 1 degree tilt moves a row by most of a line across the page
+    for degrees in (1, -1):
+        words = [tilted_word(f"r{row}c{column}", 700 * column, 100 + LINE * row, degrees) for row in range(20) for column in range(3)]
+        response = vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(pages=[vision.Page(blocks=[block(*words)])]))
+        assert ocr_layout.response_rows(response) == [[f"r{row}c{column}" for column in range(3)] for row in range(20)]
+
+
+def test_long_page_keeps_every_row():
+    # 3000 rows close together: each word is only compared with the rows around it
+    boxes = np.asarray([[300 * column, 300 * column + 70, LINE * row, LINE * row + 20] for row in range(3000) for column in range(3)], dtype=float)
+    texts = [f"r{row}c{column}" for row in range(3000) for column in range(3)]
+    rows = ocr_layout.layout_rows(boxes, texts)
+    assert len(rows) == 3000
+    assert rows[1234] == ["r1234c0", "r1234c1", "r1234c2"]
+
+
+def test_empty_page_has_no_rows():
+    response = vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(pages=[vision.Page()]))
+    assert ocr_layout.response_rows(response) == []
@@ -0,0 +1,143 @@
+import sys
+import os
+from datetime import date, datetime
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from database import get_db, TestingSessionLocal, test_engine
+from dependencies import get_current_admin, get_current_user
+from pagination import INVOICE_KEYSET, NEXT_CURSOR_HEADER, WHATSAPP_LOG_KEYSET
+import crud
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_admin] = lambda: sql_models.User(id=uuid4(), email="admin@bizzauto.com", role="admin")
+
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def walk(client, url, limit):
+    """Follows X-Next-Cursor until the last page and returns every row seen."""
+    rows, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        rows.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows
+
+
+def test_cursor_walks_every_client_once(client, session, user):
+    session.add_all([sql_models.Client(company_id=user.company_id, user_id=user.id, name=f"Client {i}") for i in range(7)])
+    session.commit()
+
+    rows = walk(client, "/api/clients", limit=3)
+    assert len(rows) == 7
+    assert len({row["id"] for row in rows}) == 7
+
+    # skip/limit keeps working and agrees with the cursor order
+    response = client.get("/api/clients", params={"skip": 3, "limit": 3})
+    assert [row["id"] for row in response.json()] == [row["id"] for row in rows[3:6]]
+
+
+def test_invoice_cursor_orders_by_date_with_nulls_last(session, user):
+    dates = [date(2025, 1, 1), date(2025, 3, 1), date(2025, 3, 1), date(2025, 2, 1), None, None]
+    for invoice_date in dates:
+        session.add(sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=invoice_date, total_amount=1.0))
+    session.commit()
+
+    rows, cursor = [], None
+    while True:
+        page = crud.get_invoices(session, user_id=user.id, limit=2, cursor=cursor)
+        rows.extend(page)
+        cursor = INVOICE_KEYSET.next_cursor(page, 2)
+        if not cursor:
+            break
+
+    assert [row.invoice_date for row in rows] == [date(2025, 3, 1), date(2025, 3, 1), date(2025, 2, 1), date(2025, 1, 1), None, None]
+    assert len({row.id for row in rows}) == len(dates)
+
+
+def test_whatsapp_logs_page_newest_first(session, user):
+    sent = [datetime(2025, 1, 1, 9), datetime(2025, 1, 3, 9), datetime(2025, 1, 2, 9), datetime(2025, 1, 3, 9)]
+    session.add_all([
+        sql_models.WhatsappLog(company_id=user.company_id, user_id=user.id, phone="923001234567", message="hi", created_at=created_at)
+        for created_at in sent
+    ])
+    session.commit()
+    # Logged before created_at existed
+    undated = sql_models.WhatsappLog(company_id=user.company_id, user_id=user.id, phone="923001234567", message="old")
+    session.add(undated)
+    session.flush()
+    session.query(sql_models.WhatsappLog).filter_by(id=undated.id).update({"created_at": None})
+    session.commit()
+
+    rows, cursor = [], None
+    while True:
+        page = crud.get_whatsapp_logs(session, user_id=user.id, company_id=user.company_id, limit=2, cursor=cursor)
+        rows.extend(page)
+        cursor = WHATSAPP_LOG_KEYSET.next_cursor(page, 2)
+        if not cursor:
+            break
+
+    assert [row.created_at for row in rows] == sorted(sent, reverse=True) + [None]
+    assert len({row.id for row in rows}) == len(sent) + 1
+
+
+def test_admin_billing_cursor(client, session, user):
+    for day in range(1, 6):
+        session.add(sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, day), total_amount=1.0))
+    session.commit()
+
+    rows = walk(client, "/api/admin/billing", limit=2)
+    assert [row["invoice_date"] for row in rows] == [f"2025-01-0{day}" for day in range(5, 0, -1)]
+
+
+def test_crud_cursor_matches_offset(session, user):
+    for month in range(1, 5):
+        session.add(sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, month, 1)))
+    session.commit()
+
+    first = crud.get_invoices(session, user_id=user.id, limit=2)
+    cursor = INVOICE_KEYSET.next_cursor(first, 2)
+    assert crud.get_invoices(session, user_id=user.id, limit=2, cursor=cursor) == crud.get_invoices(session, user_id=user.id, skip=2, limit=2)
+
+
+def test_invalid_cursor_is_rejected(client, user):
+    response = client.get("/api/clients", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
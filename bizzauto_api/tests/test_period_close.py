@@ -0,0 +1,168 @@
+import sys
+import os
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from database import get_db, get_read_db, TestingSessionLocal, test_engine
+from dependencies import get_current_user, set_rls_context
+import ledger
+import period_close
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[set_rls_context] = lambda: session
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def add_documents(session, user):
+    session.add_all([
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=100.0),
+        sql_models.Expense(company_id=user.company_id, user_id=user.id, title="Rent", amount=30.0, expense_date=date(2025, 1, 31)),
+        sql_models.Purchase(company_id=user.company_id, user_id=user.id, purchase_date=date(2025, 2, 3), total_amount=40.0),
+        sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 3, 20), total_amount=50.0, payment_status="paid"),
+    ])
+    session.commit()
+
+
+def named(session, balances):
+    names = dict(session.query(sql_models.Account.id, sql_models.Account.name))
+    return {names[account_id]: round(balance, 2) for account_id, balance in balances.items()}
+
+
+def test_as_of_balances_match_full_replay(session, user):
+    add_documents(session, user)
+    days = [date(2024, 12, 31), date(2025, 1, 15), date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 1), date(2025, 4, 30)]
+    replayed = {day: named(session, period_close.balances_as_of(session.connection(), user.company_id, day)) for day in days}
+
+    assert period_close.close_through(session.connection(), user.company_id, date(2025, 2, 14)) == [date(2025, 1, 1), date(2025, 2, 1)]
+    session.commit()
+    for day in days:
+        assert named(session, period_close.balances_as_of(session.connection(), user.company_id, day)) == replayed[day]
+
+    assert replayed[date(2025, 1, 31)][ledger.ACCOUNTS_RECEIVABLE] == 100.0
+    assert replayed[date(2025, 1, 31)][ledger.CASH] == -30.0
+    assert replayed[date(2025, 4, 30)][ledger.CASH] == 20.0
+    # The latest as-of balance is the running balance
+    accounts = session.query(sql_models.Account).filter_by(company_id=user.company_id).all()
+    assert replayed[date(2025, 4, 30)] == {account.name: round(account.balance, 2) for account in accounts}
+
+
+def test_postings_into_closed_month_land_on_first_open_day(session, user):
+    add_documents(session, user)
+    period_close.close_through(session.connection(), user.company_id, date(2025, 2, 1))
+    session.commit()
+
+    late = sql_models.Expense(company_id=user.company_id, user_id=user.id, title="Late bill", amount=5.0, expense_date=date(2025, 1, 20))
+    session.add(late)
+    session.commit()
+    dates = {entry.date for entry in session.query(sql_models.JournalEntry).filter_by(expense_id=late.id)}
+    assert dates == {date(2025, 3, 1)}
+    snapshot = named(session, period_close.balances_as_of(session.connection(), user.company_id, date(2025, 2, 28)))
+    assert snapshot[ledger.OPERATING_EXPENSES] == 30.0
+
+
+def test_reopen_and_close_again_rebuilds_snapshots(session, user):
+    add_documents(session, user)
+    period_close.close_through(session.connection(), user.company_id, date(2025, 3, 1))
+    session.commit()
+
+    def snapshots():
+        return sorted(
+            (row.period, str(row.account_id), row.debit, row.credit, row.closing_balance)
+            for row in session.query(sql_models.AccountPeriodBalance)
+        )
+
+    before = snapshots()
+
+    assert period_close.reopen(session.connection(), user.company_id, date(2025, 2, 10)) == [date(2025, 2, 1), date(2025, 3, 1)]
+    session.commit()
+    assert {row[0] for row in snapshots()} == {date(2025, 1, 1)}
+    assert period_close.last_closed(session.connection(), user.company_id) == date(2025, 1, 1)
+
+    period_close.close_through(session.connection(), user.company_id, date(2025, 3, 31))
+    session.commit()
+    assert snapshots() == before
+
+
+def test_reopened_month_takes_corrections_into_rebuilt_snapshots(session, user):
+    add_documents(session, user)
+    period_close.close_through(session.connection(), user.company_id, date(2025, 3, 1))
+    session.commit()
+    period_close.reopen(session.connection(), user.company_id, date(2025, 2, 1))
+    session.commit()
+
+    fix = sql_models.Expense(company_id=user.company_id, user_id=user.id, title="Missed bill", amount=7.0, expense_date=date(2025, 2, 12))
+    session.add(fix)
+    session.commit()
+    assert {entry.date for entry in session.query(sql_models.JournalEntry).filter_by(expense_id=fix.id)} == {date(2025, 2, 12)}
+
+    assert period_close.close_through(session.connection(), user.company_id, date(2025, 3, 1)) == [date(2025, 2, 1), date(2025, 3, 1)]
+    session.commit()
+    for day, expenses in ((date(2025, 1, 31), 30.0), (date(2025, 2, 28), 37.0), (date(2025, 3, 31), 37.0)):
+        assert named(session, period_close.balances_as_of(session.connection(), user.company_id, day))[ledger.OPERATING_EXPENSES] == expenses
+
+
+def test_close_due_periods_waits_for_grace_days(session, user):
+    add_documents(session, user)
+    assert period_close.close_due_periods(session.connection(), date(2025, 4, period_close.LEDGER_CLOSE_GRACE_DAYS)) == {}
+    closed = period_close.close_due_periods(session.connection(), date(2025, 4, period_close.LEDGER_CLOSE_GRACE_DAYS + 1))
+    assert closed == {user.company_id: [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]}
+
+
+def test_period_endpoints(client, session, user):
+    add_documents(session, user)
+    assert client.post("/api/accounting/periods/close", params={"through": "2025-01-31"}).json() == {"closed": ["2025-01-01"]}
+    assert [p["period"] for p in client.get("/api/accounting/periods").json()] == ["2025-01-01"]
+
+    cash = session.query(sql_models.Account).filter_by(company_id=user.company_id, name=ledger.CASH).one()
+    response = client.get(f"/api/accounting/accounts/{cash.id}/balance", params={"as_of": "2025-02-28"})
+    assert response.json()["balance"] == -30.0
+    assert client.get(f"/api/accounting/accounts/{uuid4()}/balance", params={"as_of": "2025-02-28"}).status_code == 404
+
+    trial = client.get("/api/accounting/trial_balance", params={"as_of": "2025-01-31"}).json()
+    assert trial["balanced"] is True
+    assert trial["total_debit"] == 130.0
+
+    assert client.post("/api/accounting/periods/reopen", params={"period": "2025-01-01"}).json() == {"reopened": ["2025-01-01"]}
+    assert client.get("/api/accounting/periods").json() == []
+
+
+def test_close_rejects_current_and_future_months(client, session, user):
+    add_documents(session, user)
+    for through in (date.today(), date.today().replace(day=1), date(2030, 1, 1)):
+        response = client.post("/api/accounting/periods/close", params={"through": through.isoformat()})
+        assert response.status_code == 400
+    assert client.get("/api/accounting/periods").json() == []
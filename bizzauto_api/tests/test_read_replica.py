@@ -0,0 +1,82 @@
+import sys
+import os
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from main import app
+from database import ReplicaHealth, get_db, TestingSessionLocal, test_engine
+from dependencies import get_current_user
+import database
+import sql_models
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="replica")
+def replica_fixture(tmp_path, monkeypatch):
+    """A second SQLite database standing in for the replica."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    sql_models.Base.metadata.create_all(bind=engine)
+    health = ReplicaHealth(max_lag_seconds=5, ttl_seconds=60)
+    health.target_engine = engine
+    monkeypatch.setattr(database, "ReplicaSessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(database, "replica_health", health)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_replica_health_is_cached(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    health = ReplicaHealth(max_lag_seconds=5, ttl_seconds=60)
+    assert health.is_healthy() is False  # no replica configured
+
+    health.target_engine = engine
+    assert health.is_healthy() is True
+    assert health.snapshot()["lag_seconds"] == 0.0
+
+    engine.dispose()
+    health.target_engine = create_engine("sqlite:////nonexistent-dir/replica.db")
+    assert health.is_healthy() is True  # still within the cache interval
+    health._checked_at = 0
+    assert health.is_healthy() is False
+    assert health.snapshot()["error"]
+
+
+def test_list_reads_from_replica_and_falls_back(client, session, replica):
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user, sql_models.Client(company_id=company.id, user_id=user.id, name="On primary")])
+    session.commit()
+    with replica() as replica_db:
+        replica_db.add(sql_models.Client(company_id=company.id, user_id=user.id, name="On replica"))
+        replica_db.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    response = client.get("/api/clients")
+    assert [row["name"] for row in response.json()] == ["On replica"]
+
+    database.replica_health.mark_down("replica unreachable")
+    response = client.get("/api/clients")
+    assert [row["name"] for row in response.json()] == ["On primary"]
@@ -0,0 +1,96 @@
+import sys
+import os
+from datetime import date
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import insert
+from database import get_db, get_async_db, get_async_test_db, TestingSessionLocal, test_engine
+from dependencies import get_current_user, set_rls_context
+from models import Product as PydanticProduct
+from fake_redis import FakeRedis
+import crud
+import redis_client
+import sql_models
+import pytest
+
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", fake)
+    monkeypatch.setattr(redis_client, "_redis_unavailable_until", 0.0)
+    return fake
+
+@pytest.fixture(name="client")
+def client_fixture(session, redis):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[set_rls_context] = lambda: session
+    app.dependency_overrides[get_async_db] = get_async_test_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="user")
+def user_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    user = sql_models.User(id=uuid4(), company_id=company.id, email="owner@test.com", full_name="Owner", role="user")
+    session.add_all([company, user])
+    session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+def test_stock_summary_is_cached_until_crud_write(client, session, user, redis):
+    crud.create_product(session, PydanticProduct(company_id=user.company_id, name="Tea", stock_quantity=3), user.id, user.company_id)
+    assert client.get("/api/inventory/stock-summary").json() == [{"name": "Tea", "stock_quantity": 3}]
+
+    # A write that bypasses the ORM is not seen: the cached response is served
+    session.execute(insert(sql_models.Product).values(id=uuid4(), company_id=user.company_id, user_id=user.id, name="Hidden", stock_quantity=1))
+    session.commit()
+    assert len(client.get("/api/inventory/stock-summary").json()) == 1
+
+    crud.create_product(session, PydanticProduct(company_id=user.company_id, name="Sugar", stock_quantity=7), user.id, user.company_id)
+    assert sorted(row["name"] for row in client.get("/api/inventory/stock-summary").json()) == ["Hidden", "Sugar", "Tea"]
+
+
+def test_dashboard_and_expense_report_invalidation(client, session, user, redis):
+    assert client.get("/dashboard/summary").json()["stats"]["total_revenue"] == 0
+    assert client.get("/api/accounting/expense_report").json() == []
+    assert f"cache:company:{user.company_id}" in redis.hashes
+
+    session.add(sql_models.Invoice(company_id=user.company_id, user_id=user.id, invoice_date=date(2025, 1, 10), total_amount=80.0, payment_status="paid"))
+    session.commit()
+    assert redis.hashes == {}
+    assert client.get("/dashboard/summary").json()["stats"]["total_revenue"] == 80.0
+
+    # Core bulk inserts invalidate too
+    client.get("/api/accounting/expense_report")
+    response = client.post("/api/expenses/bulk", json=[{"title": "Rent", "category": "office", "amount": 500, "expense_date": "2025-01-01"}])
+    assert response.json()["created"] == 1
+    assert client.get("/api/accounting/expense_report").json() == [{"category": "office", "sum": 500.0}]
+
+
+def test_write_to_another_company_keeps_cache(client, session, user, redis):
+    client.get("/dashboard/summary")
+    other = uuid4()
+    session.add(sql_models.Client(company_id=other, user_id=user.id, name="Elsewhere"))
+    session.commit()
+    assert f"cache:company:{user.company_id}" in redis.hashes
@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from database import set_rls_claims
+import pytest
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def sqlite_engine():
+    """
+    A single-connection pooled SQLite engine with set_config()/current_setting()
+    emulating Postgres transaction-local settings: values set with
+    is_local=true are dropped when the transaction ends.
+    """
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1, max_overflow=0)
+
+    @event.listens_for(engine, "connect")
+    def register(dbapi_connection, connection_record):
+        settings = connection_record.info.setdefault("settings", {})
+
+        def set_config(name, value, is_local):
+            settings[name] = value
+            return value
+
+        dbapi_connection.create_function("set_config", 3, set_config)
+        dbapi_connection.create_function("current_setting", 2, lambda name, missing_ok: settings.get(name))
+
+    def end_transaction(conn):
+        conn.connection.info.get("settings", {}).clear()
+
+    event.listen(engine, "commit", end_transaction)
+    event.listen(engine, "rollback", end_transaction)
+    event.listen(engine.pool, "reset", lambda dbapi_connection, record, reset_state: record.info.get("settings", {}).clear())
+    return engine
+
+
+def current_settings(db):
+    row = db.execute(text(
+        "SELECT current_setting('request.jwt.claims', true), "
+        "current_setting('app.current_user_id', true), "
+        "current_setting('app.current_company_id', true)"
+    )).one()
+    return tuple(value or None for value in row)
+
+
+def assert_no_bleed(engine):
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    tenant_a = (uuid4(), uuid4())
+    tenant_b = (uuid4(), uuid4())
+
+    with SessionLocal() as db:
+        set_rls_claims(db, *tenant_a)
+        claims, user_id, company_id = current_settings(db)
+        assert json.loads(claims) == {"sub": str(tenant_a[0]), "company_id": str(tenant_a[1])}
+        assert (user_id, company_id) == (str(tenant_a[0]), str(tenant_a[1]))
+
+        # Claims survive into the next transaction on the same session
+        db.commit()
+        assert current_settings(db)[1:] == (str(tenant_a[0]), str(tenant_a[1]))
+
+    # Same pooled connection, no claims: nothing left over from tenant A
+    with SessionLocal() as db:
+        assert current_settings(db) == (None, None, None)
+
+    with SessionLocal() as db:
+        set_rls_claims(db, *tenant_b)
+        assert current_settings(db)[1:] == (str(tenant_b[0]), str(tenant_b[1]))
+        db.rollback()
+
+    with SessionLocal() as db:
+        assert current_settings(db) == (None, None, None)
+
+
+def test_rls_context_does_not_bleed_between_tenants():
+    assert_no_bleed(sqlite_engine())
+
+
+def test_rls_context_is_one_statement_per_transaction():
+    engine = sqlite_engine()
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "set_config" in statement:
+            statements.append(statement)
+
+    db = sessionmaker(bind=engine)()
+    db.execute(text("SELECT 1"))  # claims set mid-transaction apply immediately
+    set_rls_claims(db, uuid4(), uuid4())
+    db.execute(text("SELECT 1"))
+    assert len(statements) == 1
+
+    db.commit()
+    db.execute(text("SELECT 1"))
+    db.execute(text("SELECT 1"))
+    assert len(statements) == 2
+    db.close()
+
+    # Claims set before the transaction starts are applied exactly once too
+    statements.clear()
+    db = sessionmaker(bind=engine)()
+    set_rls_claims(db, uuid4())
+    db.execute(text("SELECT 1"))
+    assert len(statements) == 1
+    assert "app.current_company_id" not in statements[0]
+    db.close()
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+def test_rls_context_does_not_bleed_on_postgres():
+    engine = create_engine(TEST_POSTGRES_URL, poolclass=QueuePool, pool_size=1, max_overflow=0)
+    try:
+        assert_no_bleed(engine)
+    finally:
+        engine.dispose()
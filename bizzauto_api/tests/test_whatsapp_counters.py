@@ -0,0 +1,101 @@
+import sys
+import os
+from datetime import datetime
+from uuid import uuid4
+
+# Add the parent directory of this test file (bizzauto_api) to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from main import app
+from database import get_db, TestingSessionLocal, test_engine
+from dependencies import get_current_admin
+from models import WhatsappLog as PydanticWhatsappLog
+from fake_redis import FakeRedis
+import crud
+import redis_client
+import sql_models
+import whatsapp_counters
+import pytest
+
+# Setup test database
+@pytest.fixture(name="session")
+def session_fixture():
+    sql_models.Base.metadata.create_all(bind=test_engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    sql_models.Base.metadata.drop_all(bind=test_engine)
+
+@pytest.fixture(name="redis")
+def redis_fixture(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", fake)
+    monkeypatch.setattr(redis_client, "_redis_unavailable_until", 0.0)
+    return fake
+
+@pytest.fixture(name="client")
+def client_fixture(session, redis):
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_admin] = lambda: sql_models.User(id=uuid4(), email="admin@bizzauto.com", role="admin")
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+@pytest.fixture(name="company")
+def company_fixture(client, session):
+    # Created after the client starts: the TESTING startup hook recreates all tables
+    company = sql_models.Company(id=uuid4(), name="Test Co")
+    session.add(company)
+    session.commit()
+    return company
+
+
+def log(company, status="sent", message_id=None):
+    return PydanticWhatsappLog(company_id=company.id, user_id=uuid4(), phone="923001234567", message="hi", status=status, whatsapp_message_id=message_id)
+
+
+def test_counters_follow_writes_and_match_reconcile(client, session, company, redis):
+    other = sql_models.Company(id=uuid4(), name="Other Co")
+    session.add(other)
+    session.commit()
+    crud.create_whatsapp_log(session, log(company, message_id="wamid.1"))
+    crud.create_whatsapp_log(session, log(company, message_id="wamid.2"))
+    failed = crud.create_whatsapp_log(session, log(other, status="failed"))
+    session.add(sql_models.ScheduledWhatsappMessage(company_id=company.id, phone="1", message="later", scheduled_at=datetime(2030, 1, 1)))
+    session.commit()
+
+    # Status callbacks: sent -> delivered is still "sent"; sent -> failed moves buckets
+    crud.update_whatsapp_log(session, "wamid.1", PydanticWhatsappLog.model_construct(status="delivered"))
+    crud.update_whatsapp_log(session, "wamid.2", PydanticWhatsappLog.model_construct(status="failed"))
+    crud.delete_whatsapp_log(session, failed.id)
+
+    live = {key: {status: n for status, n in counts.items() if n != "0"} for key, counts in redis.hashes.items()}
+    assert whatsapp_counters.reconcile(session)
+    assert {key: counts for key, counts in live.items() if counts} == redis.hashes
+
+    assert whatsapp_counters.stats() == {"total_sent": 1, "total_failed": 1, "scheduled_pending": 1}
+    assert whatsapp_counters.stats(other.id) == {"total_sent": 0, "total_failed": 0, "scheduled_pending": 0}
+    assert whatsapp_counters.stats_from_db(session) == whatsapp_counters.stats()
+    assert whatsapp_counters.stats_from_db(session, company.id) == whatsapp_counters.stats(company.id)
+
+
+def test_rolled_back_writes_are_not_counted(client, session, company, redis):
+    session.add(sql_models.WhatsappLog(company_id=company.id, status="sent"))
+    session.flush()
+    session.rollback()
+    assert whatsapp_counters.counter_key("logs") not in redis.hashes
+
+
+def test_stats_endpoint_falls_back_to_db_until_reconciled(client, session, company, redis):
+    crud.create_whatsapp_log(session, log(company))
+    redis.hashes[whatsapp_counters.counter_key("logs")] = {"sent": "99"}  # drifted, never reconciled
+
+    assert client.get("/api/admin/whatsapp-stats").json() == {"total_sent": 1, "total_failed": 0, "scheduled_pending": 0}
+
+    whatsapp_counters.reconcile(session)
+    crud.create_whatsapp_log(session, log(company, status="read"))
+    assert client.get("/api/admin/whatsapp-stats", params={"company_id": str(company.id)}).json()["total_sent"] == 2
@@ -0,0 +1,175 @@
+"""
+Live WhatsApp message counters per company and status, kept in Redis.
+
+/api/admin/whatsapp-stats reads a couple of Redis hashes instead of running
+COUNT(*) over whatsapp_logs and scheduled_whatsapp_messages, which grow
+without bound. Each hash maps status -> count:
+
+    wa:counts:logs:<company_id>       wa:counts:logs:all
+    wa:counts:scheduled:<company_id>  wa:counts:scheduled:all
+
+A Session hook turns every ORM insert, status change and delete of a log or
+scheduled message into HINCRBY deltas, applied after the transaction commits.
+Writes that bypass SQLAlchemy (the worker updates scheduled messages through
+the Supabase client) and increments lost while Redis was down make the
+counters drift; reconcile() rewrites them from one GROUP BY per table and is
+run periodically by the worker. Until the first reconcile, or whenever Redis
+is unreachable, stats() returns None and callers use stats_from_db().
+"""
+import os
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from daily_metrics import previous_values
+from redis_client import redis_call
+from sql_models import ScheduledWhatsappMessage, WhatsappLog
+
+WHATSAPP_COUNTER_RECONCILE_SECONDS = float(os.getenv("WHATSAPP_COUNTER_RECONCILE_SECONDS", "300"))
+
+SENT_STATUSES = ("sent", "delivered", "read")
+
+# model -> counter kind used in the key
+KINDS = {WhatsappLog: "logs", ScheduledWhatsappMessage: "scheduled"}
+
+ALL = "all"
+READY_KEY = "wa:counts:ready"
+_PENDING_KEY = "whatsapp_counters_pending"
+
+
+def counter_key(kind: str, scope=ALL) -> str:
+    return f"wa:counts:{kind}:{scope}"
+
+
+def _add(deltas: dict, obj_kind: str, company_id, status, sign: int):
+    status = status or ""
+    for scope in (ALL, company_id or "none"):
+        key = (counter_key(obj_kind, scope), status)
+        deltas[key] = deltas.get(key, 0) + sign
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(_PENDING_KEY, {})
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_previous(session, flush_context, instances):
+    deltas = _pending(session)
+    for obj in session.dirty:
+        kind = KINDS.get(type(obj))
+        if kind and session.is_modified(obj):
+            old = previous_values(session, obj, ("company_id", "status"))
+            _add(deltas, kind, old["company_id"], old["status"], -1)
+    for obj in session.deleted:
+        kind = KINDS.get(type(obj))
+        if kind:
+            _add(deltas, kind, obj.company_id, obj.status, -1)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_current(session, flush_context):
+    deltas = _pending(session)
+    for obj in list(session.new) + [o for o in session.dirty if type(o) in KINDS and session.is_modified(o)]:
+        kind = KINDS.get(type(obj))
+        if kind:
+            _add(deltas, kind, obj.company_id, obj.status, +1)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    deltas = {key: delta for key, delta in session.info.pop(_PENDING_KEY, {}).items() if delta}
+    if not deltas:
+        return
+
+    def apply(r):
+        pipe = r.pipeline(transaction=False)
+        for (key, status), delta in deltas.items():
+            pipe.hincrby(key, status, delta)
+        pipe.execute()
+    redis_call(apply)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _group_counts(db: Session, model) -> dict:
+    """{scope: {status: count}} from one GROUP BY."""
+    counts = {ALL: {}}
+    rows = db.execute(select(model.company_id, model.status, func.count()).group_by(model.company_id, model.status))
+    for company_id, status, count in rows:
+        status = status or ""
+        for scope in (ALL, str(company_id) if company_id else "none"):
+            bucket = counts.setdefault(scope, {})
+            bucket[status] = bucket.get(status, 0) + count
+    return counts
+
+
+def reconcile(db: Session) -> bool:
+    """
+    Rewrites every counter from the database. Deltas committed while it runs
+    can be lost or counted twice; the next run corrects them.
+    Returns False if Redis is unavailable.
+    """
+    snapshot = {kind: _group_counts(db, model) for model, kind in KINDS.items()}
+
+    def store(r):
+        stale = [key for kind in KINDS.values() for key in r.scan_iter(match=counter_key(kind, "*"))]
+        pipe = r.pipeline(transaction=True)
+        if stale:
+            pipe.delete(*stale)
+        for kind, scopes in snapshot.items():
+            for scope, statuses in scopes.items():
+                if statuses:
+                    pipe.hset(counter_key(kind, scope), mapping=statuses)
+        pipe.set(READY_KEY, int(time.time()))
+        pipe.execute()
+        return True
+    return bool(redis_call(store, default=False))
+
+
+def _summarize(log_counts: dict, scheduled_counts: dict) -> dict:
+    return {
+        "total_sent": sum(int(log_counts.get(status, 0)) for status in SENT_STATUSES),
+        "total_failed": int(log_counts.get("failed", 0)),
+        "scheduled_pending": int(scheduled_counts.get("pending", 0)),
+    }
+
+
+def stats(company_id=None):
+    """Admin stats from Redis, or None if the counters are not available."""
+    scope = str(company_id) if company_id else ALL
+
+    def read(r):
+        pipe = r.pipeline(transaction=False)
+        pipe.get(READY_KEY)
+        pipe.hgetall(counter_key("logs", scope))
+        pipe.hgetall(counter_key("scheduled", scope))
+        return pipe.execute()
+    result = redis_call(read)
+    if not result or not result[0]:
+        return None
+    _, log_counts, scheduled_counts = result
+    return _summarize(log_counts, scheduled_counts)
+
+
+def stats_from_db(db: Session, company_id=None) -> dict:
+    """The same stats from the database in a single FILTER-aggregate statement."""
+    log_filters = [WhatsappLog.company_id == company_id] if company_id else []
+    scheduled_filters = [ScheduledWhatsappMessage.company_id == company_id] if company_id else []
+    scheduled_pending = (
+        select(func.count())
+        .select_from(ScheduledWhatsappMessage)
+        .where(ScheduledWhatsappMessage.status == "pending", *scheduled_filters)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(
+            func.count().filter(WhatsappLog.status.in_(SENT_STATUSES)),
+            func.count().filter(WhatsappLog.status == "failed"),
+            scheduled_pending,
+        ).select_from(WhatsappLog).where(*log_filters)
+    ).one()
+    return {"total_sent": row[0], "total_failed": row[1], "scheduled_pending": row[2]}
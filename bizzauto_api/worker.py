@@ -11,9 +11,12 @@ from dotenv import load_dotenv
 
 # --- IMPORTS FROM YOUR PROJECT ---
 from redis_client import redis_client
-from ocr_tasks import process_invoice_image_gcp 
+from ocr_tasks import process_invoice_image_gcp
 from database import SessionLocal
 import crud
+import whatsapp_counters
+import period_close
+import invoice_jobs
 from models import ScheduledWhatsappMessage as PydanticScheduledWhatsappMessage
 from sql_models import Setting, Company, ScheduledWhatsappMessage
 
@@ -172,17 +175,54 @@ def send_daily_stock_summary():
         db.close()
 
 # --- JOB 1: THE SCHEDULER LOOP ---
+def reconcile_whatsapp_counters():
+    """
+    Rewrites the Redis WhatsApp counters from the database. Scheduled message
+    statuses are updated above through Supabase, which the counters' Session
+    hook never sees, so this also picks those up.
+    """
+    db: Session = SessionLocal()
+    try:
+        if whatsapp_counters.reconcile(db):
+            print("WhatsApp counters reconciled.", flush=True)
+    finally:
+        db.close()
+
+def close_ledger_periods():
+    """
+    Closes last month's ledger period for every company once the grace days
+    have passed. Each company is closed in its own transaction, so its
+    ledger lock is only held while that company is closed.
+    """
+    through = period_close.due_period(datetime.utcnow().date())
+    if through is None:
+        return
+    db: Session = SessionLocal()
+    try:
+        for company_id in period_close.ledger_companies(db.connection()):
+            periods = period_close.close_through(db.connection(), company_id, through)
+            db.commit()
+            if periods:
+                print(f"Closed ledger periods {[p.isoformat() for p in periods]} for company {company_id}", flush=True)
+    finally:
+        db.close()
+
 def run_scheduler_loop():
     print("⏰ Scheduler Thread Started...", flush=True)
     last_summary_sent_date = None
+    last_reconciled_at = 0.0
     
     while True:
         try:
             current_date = datetime.now().date()
             if current_date != last_summary_sent_date:
                 send_daily_stock_summary()
+                close_ledger_periods()
                 last_summary_sent_date = current_date
             process_pending_messages()
+            if time.monotonic() - last_reconciled_at >= whatsapp_counters.WHATSAPP_COUNTER_RECONCILE_SECONDS:
+                reconcile_whatsapp_counters()
+                last_reconciled_at = time.monotonic()
         except Exception as e:
             print(f"Error in Scheduler Thread: {e}", flush=True)
         time.sleep(60)
@@ -210,39 +250,42 @@ def run_ocr_redis_listener():
                     
                     if gcs_uri and company_id_str:
                         print(f"⚙️ Processing OCR for: {gcs_uri}", flush=True)
-                        process_invoice_image_gcp(gcs_uri, UUID(company_id_str))
-                        print(f"✅ Finished OCR for: {gcs_uri}", flush=True)
+                        parsed = process_invoice_image_gcp(image_uri=gcs_uri)
+                        print(f"✅ Finished OCR for: {gcs_uri} (company {UUID(company_id_str)}): {len(parsed['items'])} items, total {parsed['total_amount']}", flush=True)
                 except Exception as e:
                     print(f"❌ Error processing OCR job: {e}", flush=True)
         except Exception as e:
             print(f"⚠️ Redis Listener Error: {e}", flush=True)
             time.sleep(5)
 
+# --- JOB 3: ASYNC INVOICE UPLOADS (see invoice_jobs.py) ---
+def run_invoice_job_listener():
+    print(f"📄 Invoice Job Listener Started ({threading.current_thread().name})...", flush=True)
+    if not supabase_admin:
+        print("❌ Supabase Admin Client not available. Cannot process invoice jobs.", flush=True)
+        return
+
+    while True:
+        try:
+            result = redis_client.blpop(invoice_jobs.QUEUE_KEY, timeout=10)
+            if result:
+                _, job_id = result
+                print(f"📥 Processing invoice job: {job_id}", flush=True)
+                invoice_jobs.process(job_id, supabase_admin, SessionLocal)
+        except Exception as e:
+            print(f"⚠️ Invoice Job Listener Error: {e}", flush=True)
+            time.sleep(5)
+
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
-    # --- Google Cloud Credentials Setup (Mirrors main.py) ---
-    try:
-        if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
-            print("✅ Using GOOGLE_APPLICATION_CREDENTIALS from environment.", flush=True)
-        else:
-            creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-            if not creds_json:
-                print("⚠️ Env var GOOGLE_APPLICATION_CREDENTIALS_JSON is not set for worker. OCR may fail.", flush=True)
-            else:
-
-                creds_dict = json.loads(creds_json)
-                creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
-
-                with open("/tmp/sa_worker.json", "w") as f:
-                    json.dump(creds_dict, f)
-
-                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/tmp/sa_worker.json"
-                print("✅ Google Cloud Vision API credentials configured for worker.", flush=True)
-    except Exception as e:
-        print(f"❌ Error configuring Google Cloud Vision API credentials for worker: {e}", flush=True)
-    # --- End of Credentials Setup ---
+    # Google Cloud Vision credentials are read by ocr_engine on first use
+    # (GOOGLE_APPLICATION_CREDENTIALS or GOOGLE_APPLICATION_CREDENTIALS_JSON).
+    if not (os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")):
+        print("⚠️ No Google Cloud credentials set for worker. OCR may fail.", flush=True)
 
     print("🚀 Starting Unified Worker Service...", flush=True)
     scheduler_thread = threading.Thread(target=run_scheduler_loop, daemon=True)
     scheduler_thread.start()
+    for i in range(invoice_jobs.INVOICE_JOB_WORKERS):
+        threading.Thread(target=run_invoice_job_listener, name=f"invoice-jobs-{i}", daemon=True).start()
     run_ocr_redis_listener()